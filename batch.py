@@ -0,0 +1,232 @@
+"""Headless bulk processing of transcript PDFs.
+
+Usage:
+    python batch.py TRANSCRIPTS_DIR_OR_MANIFEST --output-dir results [--concurrency 8]
+
+The input is either a directory (searched recursively for *.pdf) or a manifest
+file listing one PDF path per line (relative paths are resolved against the
+manifest's directory). Each PDF goes through the same pipeline as the app
+(``extract_transcript``: cache, text layer, chunking and top-ups) and gets a
+``<name>_processed.json`` in the output directory; ``summary.json`` and
+``gpa_summary.csv`` (term and cumulative GPA per transcript) are written at
+the end, along with per-stage latency, token and cost metrics
+(``metrics.json`` and ``metrics.prom``).
+Successful results are also recorded in the local results store
+(``results_store.py``) for cross-transcript queries.
+Inputs whose output already exists with status "ok" are skipped, so an
+interrupted run can simply be started again.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import anthropic
+
+from course_catalog import CourseCatalog
+from extraction_cache import ExtractionCache, sha256_hex
+from gpa import summarize_many
+from pipeline import (
+    CATALOG_PATH,
+    EXTRACTION_CACHE_MAX_BYTES,
+    EXTRACTION_CACHE_PATH,
+    EXTRACTION_CACHE_TTL_SECONDS,
+    MODEL,
+    PROMPT,
+    RESULTS_DB_PATH,
+    RATE_LIMIT_ITPM,
+    RATE_LIMIT_RPM,
+    ExtractionError,
+    describe_api_error,
+    extract_transcript,
+)
+from rate_limit import RateLimiter
+from results_store import ResultsStore
+import telemetry
+from usage import UsageTotals
+
+
+def collect_inputs(source: str):
+    """Return (pdf path, output name) pairs for a directory or manifest."""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        base = source
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+        paths = [
+            line if os.path.isabs(line) else os.path.join(base, line)
+            for line in lines
+            if line and not line.startswith("#")
+        ]
+    inputs = []
+    for path in sorted(paths):
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(base))
+        if relative.startswith(os.pardir):
+            relative = os.path.basename(path)
+        name = os.path.splitext(relative)[0].replace(os.sep, "__")
+        inputs.append((path, f"{name}_processed.json"))
+    return inputs
+
+
+def write_json_atomic(path: str, data):
+    """Write JSON so that an interrupted run never leaves a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def load_result(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+async def process_one(client, semaphore, executor, cache, usage_totals, pdf_path, output_path, model, catalog=None,
+                      limiter=None):
+    """Run the extraction pipeline for one PDF and write its result file."""
+    result = {"source": pdf_path, "model": model}
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        # Read inside the semaphore so at most ``concurrency`` PDFs are in memory at once
+        async with semaphore:
+            with open(pdf_path, "rb") as f:
+                pdf_bytes = f.read()
+            result["sha256"] = sha256_hex(pdf_bytes)
+            extraction = await loop.run_in_executor(executor, functools.partial(
+                extract_transcript, client, pdf_bytes, PROMPT, model, cache=cache, catalog=catalog, limiter=limiter
+            ))
+            del pdf_bytes
+        if extraction["usage"]:
+            usage_totals.add(extraction["usage"])
+        result.update(
+            status="ok", cached=extraction["cached"], method=extraction["method"], usage=extraction["usage"],
+            data=extraction["json_data"], missing=extraction["missing"], scale=extraction["scale"],
+        )
+    except ExtractionError as e:
+        result.update(status="error", error=str(e))
+    except OSError as e:
+        result.update(status="error", error=f"Could not read PDF: {e}")
+    except Exception as e:
+        result.update(status="error", error=describe_api_error(e))
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    write_json_atomic(output_path, result)
+    status = result["status"] if result["status"] == "ok" else f"error: {result['error']}"
+    print(f"{os.path.basename(pdf_path)}: {status} ({result['seconds']}s)", flush=True)
+    return result
+
+
+async def run_batch(inputs, output_dir: str, concurrency: int = 8, model: str = MODEL, use_cache: bool = True,
+                    results_db: str = RESULTS_DB_PATH):
+    """Process inputs concurrently and return the run summary (``results_db=None`` skips the results store)."""
+    os.makedirs(output_dir, exist_ok=True)
+    cache = None
+    if use_cache:
+        cache = ExtractionCache(
+            EXTRACTION_CACHE_PATH,
+            max_bytes=EXTRACTION_CACHE_MAX_BYTES,
+            ttl_seconds=EXTRACTION_CACHE_TTL_SECONDS,
+        )
+    catalog = CourseCatalog(CATALOG_PATH)
+    usage_totals = UsageTotals()
+    semaphore = asyncio.Semaphore(concurrency)
+    # Chunked transcripts fan out into parallel chunk requests; the shared limiter keeps the
+    # number of Claude requests in flight at ``concurrency`` across all transcripts
+    limiter = RateLimiter(RATE_LIMIT_RPM, RATE_LIMIT_ITPM, max_in_flight=concurrency)
+    # extract_transcript is synchronous; each in-flight transcript gets its own thread
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+    started = time.perf_counter()
+
+    pending, skipped = [], []
+    for pdf_path, output_name in inputs:
+        output_path = os.path.join(output_dir, output_name)
+        previous = load_result(output_path)
+        if previous and previous.get("status") == "ok":
+            skipped.append(previous)
+        else:
+            pending.append((pdf_path, output_path))
+    if skipped:
+        print(f"Skipping {len(skipped)} already processed transcript(s)", flush=True)
+
+    client = anthropic.Anthropic(max_retries=0)
+    try:
+        results = await asyncio.gather(*(
+            process_one(client, semaphore, executor, cache, usage_totals, pdf_path, output_path, model, catalog, limiter)
+            for pdf_path, output_path in pending
+        ))
+    finally:
+        executor.shutdown(wait=False)
+        client.close()
+
+    all_results = skipped + list(results)
+    summary = {
+        "model": model,
+        "inputs": len(inputs),
+        "processed": len(results),
+        "skipped": len(skipped),
+        "succeeded": sum(1 for r in all_results if r.get("status") == "ok"),
+        "failed": [{"source": r["source"], "error": r.get("error")} for r in all_results if r.get("status") != "ok"],
+        "cache_hits": sum(1 for r in results if r.get("cached")),
+        "catalog": catalog.stats(),
+        "usage": usage_totals.snapshot(),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    write_json_atomic(os.path.join(output_dir, "summary.json"), summary)
+    # Term and cumulative GPA for every transcript, computed in one vectorized pass per grade scale
+    succeeded = [r for r in all_results if r.get("status") == "ok"]
+    gpa_summary = summarize_many(
+        {r["source"]: r["data"] for r in succeeded}, scales={r["source"]: r.get("scale") for r in succeeded}
+    )
+    gpa_summary.to_csv(os.path.join(output_dir, "gpa_summary.csv"), index=False)
+    if results_db:
+        store = ResultsStore(results_db)
+        for r in results:
+            if r.get("status") == "ok":
+                store.record(r["sha256"], r["data"], os.path.basename(r["source"]), r["method"], r["scale"])
+        store.close()
+    write_json_atomic(os.path.join(output_dir, "metrics.json"), telemetry.snapshot())
+    with open(os.path.join(output_dir, "metrics.prom"), "w", encoding="utf-8") as f:
+        f.write(telemetry.render_prometheus())
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract course data from a batch of transcript PDFs.")
+    parser.add_argument("source", help="Directory of PDFs or a manifest file with one PDF path per line")
+    parser.add_argument("--output-dir", default="batch_output", help="Where to write per-transcript JSON and summary.json")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum transcripts processed (and held in memory) and Claude requests in flight at once")
+    parser.add_argument("--model", default=MODEL, help="Claude model name")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local extraction cache")
+    parser.add_argument("--results-db", default=RESULTS_DB_PATH, help="Results store to record into ('' to skip)")
+    args = parser.parse_args(argv)
+
+    if not os.environ.get("ANTHROPIC_API_KEY"):
+        parser.error("ANTHROPIC_API_KEY must be set")
+    inputs = collect_inputs(args.source)
+    if not inputs:
+        parser.error(f"No PDF files found in {args.source}")
+
+    summary = asyncio.run(run_batch(
+        inputs, args.output_dir, concurrency=max(1, args.concurrency), model=args.model, use_cache=not args.no_cache,
+        results_db=args.results_db or None,
+    ))
+    print(
+        f"Done: {summary['succeeded']}/{summary['inputs']} succeeded, "
+        f"{len(summary['failed'])} failed, ${summary['usage']['total_cost']:.4f} spent"
+    )
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
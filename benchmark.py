@@ -0,0 +1,305 @@
+"""Offline performance benchmark for the extraction pipeline.
+
+Runs every stage against synthetic transcript PDFs with in-process fakes of
+the Anthropic, Drive and Sheets clients, so no API calls (and no spend) are
+involved. Each stage is timed over several repetitions and its peak traced
+memory recorded; results are written as JSON and can be compared against a
+previous run to catch regressions.
+
+Usage:
+    python benchmark.py --output bench.json [--repeat 5] [--latency 0.05]
+    python benchmark.py --baseline bench.json --tolerance 0.25
+    python benchmark.py --responses recorded/   # replay recorded Claude responses
+"""
+import argparse
+import base64
+import copy
+import glob
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from compact_schema import compact_term
+from drive_upload import upload_pdf
+from fakes import FakeAnthropic, FakeDriveService, FakeWorksheet
+from pipeline import (
+    PROMPT,
+    course_table,
+    extract_transcript,
+    parse_json_response,
+    plan_pdf_chunks,
+    post_process_transcript_data,
+    request_extraction,
+)
+from rate_limit import RateLimiter
+from sheets_sink import SheetsWriteBehind
+
+SIZES = {"small": 2, "medium": 8, "large": 24}
+SUBJECTS = ["CS", "MATH", "PHYS", "CHEM", "ENG", "HIST", "ECON", "BIOL"]
+GRADES = ["A", "A-", "B+", "B", "B-", "C+", "C", "P", "W"]
+TITLE_WORDS = ["Introduction", "Advanced", "Topics", "Systems", "Analysis", "Theory", "Methods", "Design",
+               "Applied", "Principles", "Computational", "Modern", "Seminar", "Laboratory", "Research"]
+
+
+# ==== SYNTHETIC TRANSCRIPTS ====
+
+def synthetic_terms(term_count: int, courses_per_term: int = 5):
+    """Deterministic transcript data with ``term_count`` terms."""
+    seasons = ["Fall", "Spring", "Summer"]
+    terms = []
+    for index in range(term_count):
+        courses = []
+        for offset in range(courses_per_term):
+            n = index * courses_per_term + offset
+            words = [TITLE_WORDS[(n + k * 7) % len(TITLE_WORDS)] for k in range(2 + n % 6)]
+            code = f"{SUBJECTS[n % len(SUBJECTS)]}{(1 + index // 3) % 7}{n % 10}{(n * 3) % 10}{offset}"
+            grade = GRADES[n % len(GRADES)]
+            credits = 3 + n % 2
+            courses.append({
+                "course_code": code,
+                "division": "GRAD" if code[len(code.rstrip("0123456789"))] in "56" else "UNDG",
+                "title": " ".join(words),
+                "short_title": " ".join(words)[:40].strip(),
+                "credits": credits,
+                "grade": grade,
+                "points": "",
+            })
+        terms.append({"term": seasons[index % 3], "year": str(2015 + index // 3), "courses": courses})
+    return terms
+
+
+def make_pdf(pages) -> bytes:
+    """Write a minimal PDF whose pages contain the given lines of text."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    font_id = 3 + 2 * len(pages)
+    for i, lines in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+        content = "BT /F1 9 Tf 40 760 Td 11 TL " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>")
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def synthetic_pdf(terms, columnar: bool = True, terms_per_page: int = 3) -> bytes:
+    """Render terms as a transcript PDF.
+
+    ``columnar`` PDFs use the layout text_layer can parse locally; the others
+    put each course on a free-form line so extraction has to go to Claude.
+    """
+    pages = [["TRANSCRIPT EXPLANATION", "Grades: A=4.0 B=3.0 C=2.0 D=1.0 F=0.0; +/- adjust by 0.3."]]
+    for start in range(0, len(terms), terms_per_page):
+        lines = ["STATE UNIVERSITY - OFFICIAL ACADEMIC TRANSCRIPT"]
+        if columnar:
+            lines.append(f"{'COURSE':<10}  {'COURSE TITLE':<60}  {'CRED':>5}  {'GRADE':<5}  POINTS")
+        for term in terms[start:start + terms_per_page]:
+            lines.append(f"{term['term']} {term['year']}")
+            for course in term["courses"]:
+                if columnar:
+                    lines.append(
+                        f"{course['course_code']:<10}  {course['title']:<60}  {course['credits']:>5.2f}  "
+                        f"{course['grade']:<5}"
+                    )
+                else:
+                    lines.append(
+                        f"{course['course_code']} / {course['title']} / grade {course['grade']} / "
+                        f"{course['credits']} credit hours"
+                    )
+        pages.append(lines)
+    return make_pdf(pages)
+
+
+def fenced_response(terms) -> str:
+    """Claude-style response carrying ``terms`` in the compact wire format."""
+    compact = ",\n".join(json.dumps(compact_term(term)) for term in terms)
+    return "Here is the extracted transcript data:\n\n```json\n[\n" + compact + "\n]\n```"
+
+
+# ==== MEASUREMENT ====
+
+def measure(fn, repeat: int):
+    """Run ``fn`` ``repeat`` times; return timing stats, peak memory and the last result.
+
+    tracemalloc slows allocation-heavy code several-fold, so the timed runs
+    go without it and peak memory comes from one extra traced run.
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    timings.sort()
+    return {
+        "min_ms": round(timings[0] * 1000, 3),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))] * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+    }, result
+
+
+def load_recorded_responses(directory: str):
+    """Load recorded response texts (*.txt, or *.json with a "text" field)."""
+    responses = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        if path.endswith(".json"):
+            content = json.loads(content)["text"]
+        responses.append(content)
+    if not responses:
+        raise SystemExit(f"No recorded responses found in {directory}")
+    return responses
+
+
+def run_size(name: str, term_count: int, args, recorded=None):
+    terms = synthetic_terms(term_count)
+    freeform_pdf = synthetic_pdf(terms, columnar=False)
+    columnar_pdf = synthetic_pdf(terms, columnar=True)
+    response_text = fenced_response(terms)
+    if recorded:
+        cycle = itertools.cycle(recorded)
+        respond = lambda kwargs: next(cycle)  # noqa: E731
+    else:
+        respond = lambda kwargs: response_text  # noqa: E731
+    client = FakeAnthropic(respond, base_latency=args.latency, token_latency=args.token_latency)
+    # The fake has no account limits; pacing requests would only time the limiter
+    limiter = RateLimiter(0, 0)
+    repeat = args.repeat
+    stages = {}
+
+    stages["base64_encode"], _ = measure(lambda: base64.b64encode(freeform_pdf).decode("utf-8"), repeat)
+    stages["prepare_pdf"], _ = measure(lambda: plan_pdf_chunks(freeform_pdf), repeat)
+    stages["analyze_pdf"], (text, _) = measure(
+        lambda: request_extraction(client, freeform_pdf, PROMPT, limiter=limiter), repeat
+    )
+    stages["extract_json"], parsed = measure(lambda: parse_json_response(text), repeat)
+    stages["post_process"], processed = measure(
+        lambda: post_process_transcript_data(copy.deepcopy(parsed)), repeat
+    )
+    stages["display_prep"], _ = measure(lambda: [course_table(term["courses"]) for term in processed], repeat)
+
+    # A fresh service per run, so every run uploads instead of hitting the dedup lookup
+    stages["persist_drive"], _ = measure(
+        lambda: upload_pdf(FakeDriveService(latency=args.io_latency), freeform_pdf, f"{name}.pdf", "benchmark-folder"),
+        repeat,
+    )
+    drive = FakeDriveService(latency=args.io_latency)
+    upload_pdf(drive, freeform_pdf, f"{name}.pdf", "benchmark-folder")
+    stages["persist_drive_dedup"], _ = measure(
+        lambda: upload_pdf(drive, freeform_pdf, f"{name}.pdf", "benchmark-folder"), repeat
+    )
+    with tempfile.TemporaryDirectory() as journal_dir:
+        worksheet = FakeWorksheet(latency=args.io_latency)
+        sink = SheetsWriteBehind(lambda: worksheet, os.path.join(journal_dir, "journal.sqlite3"),
+                                 flush_interval=3600)
+
+        def persist_sheet():
+            sink.enqueue(["https://drive.example/file", json.dumps(processed), "benchmark"])
+            return sink.flush()
+
+        stages["persist_sheets"], _ = measure(persist_sheet, repeat)
+        sink.close(flush=False)
+
+    stages["end_to_end_llm"], result = measure(
+        lambda: extract_transcript(client, freeform_pdf, limiter=limiter), repeat
+    )
+    stages["end_to_end_llm"]["method"] = result["method"]
+    stages["end_to_end_local"], result = measure(
+        lambda: extract_transcript(client, columnar_pdf, limiter=limiter), repeat
+    )
+    stages["end_to_end_local"]["method"] = result["method"]
+
+    return {
+        "terms": term_count,
+        "courses": sum(len(term["courses"]) for term in terms),
+        "pdf_bytes": len(freeform_pdf),
+        "llm_calls": client.calls,
+        "stages": stages,
+    }
+
+
+def compare(results, baseline, tolerance: float):
+    """Return regressions where a stage's median grew by more than ``tolerance``."""
+    regressions = []
+    for size, result in results["sizes"].items():
+        for stage, stats in result["stages"].items():
+            before = baseline.get("sizes", {}).get(size, {}).get("stages", {}).get(stage)
+            if not before or not before.get("median_ms"):
+                continue
+            ratio = stats["median_ms"] / before["median_ms"]
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    f"{size}/{stage}: {before['median_ms']}ms -> {stats['median_ms']}ms ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the transcript extraction pipeline.")
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"Comma-separated subset of {list(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per stage")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake Claude base latency in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Fake Claude seconds per output token")
+    parser.add_argument("--io-latency", type=float, default=0.0, help="Fake Drive/Sheets latency in seconds")
+    parser.add_argument("--responses", help="Directory of recorded Claude responses to replay")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed median slowdown vs baseline")
+    args = parser.parse_args(argv)
+
+    recorded = load_recorded_responses(args.responses) if args.responses else None
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "settings": {"repeat": args.repeat, "latency": args.latency, "token_latency": args.token_latency,
+                     "io_latency": args.io_latency, "recorded": bool(recorded)},
+        "sizes": {},
+    }
+    for size in args.sizes.split(","):
+        results["sizes"][size] = run_size(size, SIZES[size], args, recorded)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Compact wire format for Claude's output and its local expansion.
+
+Instead of repeating every key on every course, Claude returns one object
+per term with short keys and one positional array per course:
+
+    {"t": "Fall", "y": "2023", "c": [["CS101", "Calculus I", "", 3, "A", "12.0"], ...]}
+
+``expand_term`` turns that back into the verbose structure the rest of the
+app uses. It derives ``division`` from the course code and fills in
+``short_title`` when Claude left it empty, which it does for titles that
+are already short. Terms already in the verbose format pass through with
+only the derived fields filled in.
+"""
+from text_layer import division_for, short_title_for
+
+# Position of each course field in a compact course row
+COURSE_COLUMNS = ("course_code", "title", "short_title", "credits", "grade", "points")
+
+
+def expand_course(row):
+    """Turn a compact course row (or verbose course dict) into a verbose course dict."""
+    if isinstance(row, (list, tuple)):
+        values = list(row[:len(COURSE_COLUMNS)]) + [""] * (len(COURSE_COLUMNS) - len(row))
+        course = dict(zip(COURSE_COLUMNS, values))
+    elif isinstance(row, dict):
+        course = dict(row)
+    else:
+        return row
+    if not course.get("division"):
+        course["division"] = division_for(str(course.get("course_code") or ""))
+    if not course.get("short_title") and isinstance(course.get("title"), str):
+        course["short_title"] = short_title_for(course["title"])
+    return course
+
+
+def expand_term(term):
+    """Expand a compact term object; verbose terms only get their derived fields filled in."""
+    if not isinstance(term, dict):
+        return term
+    if "c" in term and "courses" not in term:
+        term = {"term": term.get("t", ""), "year": term.get("y", ""), "courses": term["c"]}
+    courses = term.get("courses")
+    if not isinstance(courses, list):
+        return term
+    return {**term, "courses": [expand_course(course) for course in courses]}
+
+
+def compact_term(term) -> dict:
+    """Inverse of ``expand_term``: the compact form of a verbose term."""
+    return {
+        "t": term.get("term", ""),
+        "y": term.get("year", ""),
+        "c": [
+            [
+                course.get("course_code", ""),
+                course.get("title", ""),
+                course.get("short_title", "") if len(course.get("title", "")) >= 40 else "",
+                course.get("credits", ""),
+                course.get("grade", ""),
+                course.get("points", ""),
+            ]
+            for course in term.get("courses", [])
+        ],
+    }
@@ -0,0 +1,223 @@
+"""Persistent catalog of courses seen in past extractions.
+
+Entries are keyed by institution, normalized course code and a fingerprint
+of the title, so a code that is reused for a different course at the same
+institution gets its own entry. The first short title recorded for a course
+is kept, which makes short titles consistent across students. Known courses
+are listed in the request so Claude can leave their short title empty; the
+catalog fills it back in locally. A code is only listed when the text shows
+the catalogued title next to it, since a short title left empty for a course
+the catalog cannot match would be regenerated by truncation.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import telemetry
+from results_store import normalize_code
+from text_layer import division_for
+
+# Lines near the top of a transcript that name the institution
+INSTITUTION_LINE = re.compile(r"\b(University|College|Institute|Academy|School)\b", re.I)
+INSTITUTION_SEARCH_LINES = 40
+# Course codes as they appear in a transcript's text layer ("MATH 5001", "CS-101A")
+COURSE_CODE = re.compile(r"\b[A-Z]{2,5}\s?-?\d{3,4}[A-Z]?\b")
+# Claude only writes short titles for titles at least this long (see PROMPT)
+LONG_TITLE = 40
+# SQLite's default limit on query parameters is 999
+_QUERY_BATCH = 500
+
+
+def institution_for(text: str) -> str:
+    """Institution key from the transcript text (the first line naming a university, college, ...)."""
+    for line in (text or "").splitlines()[:INSTITUTION_SEARCH_LINES]:
+        # Layout text puts columns side by side; keep the column that names the institution
+        for cell in re.split(r"\s{2,}|\s[-|]\s", line.strip()):
+            if INSTITUTION_LINE.search(cell):
+                return " ".join(re.findall(r"[a-z0-9&]+", cell.lower()))
+    return ""
+
+
+def _title_words(title) -> tuple:
+    return tuple(re.findall(r"[a-z0-9]+", str(title or "").lower()))
+
+
+def title_fingerprint(title) -> str:
+    """Stable fingerprint of a course title, ignoring case, punctuation and spacing."""
+    words = " ".join(_title_words(title))
+    return hashlib.sha1(words.encode("utf-8")).hexdigest()[:16]
+
+
+def titles_after_codes(text: str) -> dict:
+    """Map each course code in ``text`` to the title words in the column after each occurrence.
+
+    In layout text the title column ends at the next run of two or more
+    spaces; a title that wraps onto the next line leaves only its first part.
+    """
+    titles = {}
+    for match in COURSE_CODE.finditer(text or ""):
+        line_end = text.find("\n", match.end())
+        rest = text[match.end():line_end if line_end >= 0 else len(text)]
+        cell = re.split(r"\s{2,}", rest.strip())[0]
+        titles.setdefault(normalize_code(match.group()), []).append(_title_words(cell))
+    return titles
+
+
+def catalog_hint(codes) -> str:
+    """Instruction telling Claude which courses need no short title."""
+    if not codes:
+        return ""
+    return (
+        "Short titles for these courses are already known, so leave their short title empty: "
+        + ", ".join(codes) + "."
+    )
+
+
+class CourseCatalog:
+    """SQLite catalog of (institution, course code, title) -> short title and division."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS catalog (
+                institution TEXT NOT NULL,
+                code_key TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                course_code TEXT NOT NULL,
+                title TEXT NOT NULL,
+                short_title TEXT NOT NULL,
+                division TEXT NOT NULL,
+                curated INTEGER NOT NULL DEFAULT 0,
+                seen INTEGER NOT NULL DEFAULT 1,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (institution, code_key, fingerprint)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _entries(self, institution: str, code_keys) -> dict:
+        """Map (code_key, fingerprint) -> row for the given codes at an institution."""
+        code_keys = sorted(set(code_keys))
+        entries = {}
+        for start in range(0, len(code_keys), _QUERY_BATCH):
+            batch = code_keys[start:start + _QUERY_BATCH]
+            rows = self._conn.execute(
+                "SELECT code_key, fingerprint, course_code, title, short_title, division FROM catalog "
+                f"WHERE institution = ? AND code_key IN ({', '.join('?' * len(batch))})",
+                [institution, *batch],
+            ).fetchall()
+            for code_key, fingerprint, *entry in rows:
+                entries[(code_key, fingerprint)] = entry
+        return entries
+
+    def apply(self, json_data, institution: str = "", count: bool = True):
+        """Fill in short titles and divisions of known courses in place; return the number of hits."""
+        courses = [course for term in json_data or [] for course in term.get("courses", [])]
+        with self._lock:
+            entries = self._entries(institution, (normalize_code(c.get("course_code")) for c in courses))
+        hits = 0
+        for course in courses:
+            entry = entries.get((normalize_code(course.get("course_code")), title_fingerprint(course.get("title"))))
+            if entry is None:
+                continue
+            _, _, short_title, division = entry
+            course["short_title"] = short_title
+            course["division"] = division or course.get("division", "")
+            hits += 1
+        if count:
+            with self._lock:
+                self.hits += hits
+                self.misses += len(courses) - hits
+            telemetry.increment("catalog_lookups_total", hits, result="hit")
+            telemetry.increment("catalog_lookups_total", len(courses) - hits, result="miss")
+        return hits
+
+    def learn(self, json_data, institution: str = ""):
+        """Record the courses of an extraction; existing entries keep their short title."""
+        now = time.time()
+        rows = [
+            (institution, normalize_code(course.get("course_code")), title_fingerprint(course.get("title")),
+             str(course.get("course_code")), str(course.get("title")), str(course.get("short_title") or ""),
+             str(course.get("division") or division_for(str(course.get("course_code")))), now, now)
+            for term in json_data or []
+            for course in term.get("courses", [])
+            if normalize_code(course.get("course_code")) and str(course.get("title") or "").strip()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO catalog (institution, code_key, fingerprint, course_code, title, short_title, division, "
+                "first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(institution, code_key, fingerprint) DO UPDATE SET seen = seen + 1, "
+                "last_seen = excluded.last_seen, "
+                "short_title = CASE WHEN short_title = '' THEN excluded.short_title ELSE short_title END",
+                rows,
+            )
+
+    def override(self, institution: str, course_code: str, title: str, short_title: str, division: str = None):
+        """Set a course's short title (and division) by hand; learning never replaces it."""
+        now = time.time()
+        division = division if division is not None else division_for(course_code)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO catalog (institution, code_key, fingerprint, course_code, title, short_title, division, "
+                "curated, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT(institution, code_key, fingerprint) DO UPDATE SET short_title = excluded.short_title, "
+                "division = excluded.division, curated = 1, last_seen = excluded.last_seen",
+                (institution, normalize_code(course_code), title_fingerprint(title), course_code, title,
+                 short_title, division, now, now),
+            )
+
+    def known_codes(self, institution: str, text: str) -> list:
+        """Codes in ``text`` whose long titles already have a short title in the catalog.
+
+        A code is listed only when the catalog has a single entry for it and
+        every occurrence in ``text`` is followed by that entry's title (or its
+        first part), so ``apply`` is sure to find the course again.
+        """
+        titles = titles_after_codes(text)
+        if not titles:
+            return []
+        with self._lock:
+            entries = self._entries(institution, titles)
+        by_code = {}
+        for (code_key, _), entry in entries.items():
+            by_code.setdefault(code_key, []).append(entry)
+        known = set()
+        for code_key, code_entries in by_code.items():
+            if len(code_entries) != 1:
+                continue
+            course_code, title, short_title, _ = code_entries[0]
+            words = _title_words(title)
+            if short_title and len(title) >= LONG_TITLE and all(
+                cell and words[:len(cell)] == cell for cell in titles[code_key]
+            ):
+                known.add(course_code)
+        return sorted(known)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for course lookups and the number of catalog entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,65 @@
+from googleapiclient.http import MediaIoBaseUpload
+
+from extraction_cache import sha256_hex
+import telemetry
+from upload_store import as_stream
+
+# Resumable upload chunk size; Drive requires a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+FILE_FIELDS = "id, name, webViewLink"
+
+
+def find_file_by_hash(drive_service, folder_id: str, digest: str):
+    """Return the file in a folder tagged with this content hash, or None."""
+    query = (
+        f"'{folder_id}' in parents and trashed = false and "
+        f"appProperties has {{ key='sha256' and value='{digest}' }}"
+    )
+    response = drive_service.files().list(
+        q=query,
+        fields=f"files({FILE_FIELDS})",
+        pageSize=1,
+        supportsAllDrives=True,
+        includeItemsFromAllDrives=True,
+    ).execute()
+    files = response.get("files", [])
+    return files[0] if files else None
+
+
+def upload_pdf(drive_service, pdf_bytes, filename: str, folder_id: str, digest: str = None):
+    """Upload PDF bytes to a Drive folder unless identical content is already there.
+
+    The bytes (or a memoryview of them) are streamed in resumable chunks
+    without copying, and the file is tagged with its SHA-256 in
+    ``appProperties``. Returns (file, deduplicated) where ``file`` has id,
+    name and webViewLink.
+    """
+    with telemetry.stage("drive_upload"):
+        return _upload_pdf(drive_service, pdf_bytes, filename, folder_id, digest)
+
+
+def _upload_pdf(drive_service, pdf_bytes, filename: str, folder_id: str, digest: str = None):
+    digest = digest or sha256_hex(pdf_bytes)
+    existing = find_file_by_hash(drive_service, folder_id, digest)
+    if existing:
+        telemetry.increment("drive_dedup_hits_total")
+        return existing, True
+
+    file_metadata = {
+        "name": filename,
+        "mimeType": "application/pdf",
+        "parents": [folder_id],
+        "appProperties": {"sha256": digest},
+    }
+    with as_stream(pdf_bytes) as stream:
+        media = MediaIoBaseUpload(stream, mimetype="application/pdf", chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+        request = drive_service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields=FILE_FIELDS,
+            supportsAllDrives=True,
+        )
+        response = None
+        while response is None:
+            _, response = request.next_chunk()
+    return response, False
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def sha256_hex(data) -> str:
+    """Return the hex SHA-256 digest of bytes or a string."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class ExtractionCache:
+    """Persistent, size-bounded LRU cache of Claude extraction results.
+
+    Entries are keyed by the PDF content hash, the prompt hash and the model
+    name, so changing any of them naturally invalidates old results. Each entry
+    stores the raw model response and the post-processed JSON.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl_seconds: float = 30 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                raw_response TEXT NOT NULL,
+                json_data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_last_access ON extractions(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(pdf_bytes, prompt: str, model: str) -> str:
+        """Build the cache key for a PDF, prompt and model combination."""
+        return f"{sha256_hex(pdf_bytes)}:{sha256_hex(prompt)}:{model}"
+
+    def get(self, key: str):
+        """Return {"raw_response", "json_data"} for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT raw_response, json_data, created_at FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            raw_response, json_data, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE extractions SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return {"raw_response": raw_response, "json_data": json.loads(json_data)}
+
+    def put(self, key: str, raw_response: str, json_data):
+        """Store an extraction result and evict least-recently-used entries."""
+        json_str = json.dumps(json_data)
+        size = len(raw_response.encode("utf-8")) + len(json_str.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, raw_response, json_data, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, raw_response, json_str, size, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the oldest entries until under max_bytes."""
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM extractions WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM extractions ORDER BY last_access ASC"
+        ).fetchall():
+            self._conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current cache occupancy."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": total,
+            }
+
+    def clear(self):
+        """Remove every cached entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM extractions")
+            self._conn.commit()
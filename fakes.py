@@ -0,0 +1,102 @@
+"""In-process fakes of the Anthropic, Drive and Sheets clients.
+
+Used by benchmark.py and the tests so neither makes network calls.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+
+class FakeAnthropic:
+    """Stand-in for anthropic.Anthropic that replays canned responses.
+
+    ``respond(request_kwargs)`` returns the response text; latency is
+    ``base_latency + output_tokens * token_latency`` seconds.
+    """
+
+    def __init__(self, respond, base_latency: float = 0.05, token_latency: float = 0.0):
+        self.respond = respond
+        self.base_latency = base_latency
+        self.token_latency = token_latency
+        self.calls = 0
+        self.messages = SimpleNamespace(create=self._create, stream=self._stream)
+
+    def _message(self, kwargs, text):
+        self.calls += 1
+        input_tokens = len(json.dumps(kwargs.get("messages", ""))) // 4
+        usage = SimpleNamespace(
+            input_tokens=input_tokens,
+            output_tokens=len(text) // 4,
+            cache_creation_input_tokens=0,
+            cache_read_input_tokens=len(kwargs.get("system", [{}])[0].get("text", "")) // 4,
+        )
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=usage)
+
+    def _create(self, **kwargs):
+        text = self.respond(kwargs)
+        time.sleep(self.base_latency + len(text) // 4 * self.token_latency)
+        return self._message(kwargs, text)
+
+    @contextmanager
+    def _stream(self, **kwargs):
+        text = self.respond(kwargs)
+        pieces = [text[i:i + 16] for i in range(0, len(text), 16)]
+
+        def text_stream():
+            time.sleep(self.base_latency)
+            for piece in pieces:
+                time.sleep(4 * self.token_latency)
+                yield piece
+
+        yield SimpleNamespace(text_stream=text_stream(), get_final_message=lambda: self._message(kwargs, text))
+
+
+class FakeDriveService:
+    """Just enough of the Drive v3 files() API for drive_upload.upload_pdf."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.files_by_hash = {}
+        self._lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def list(self, q, **kwargs):
+        digest = q.split("value='")[1].split("'")[0]
+
+        def execute():
+            time.sleep(self.latency)
+            found = self.files_by_hash.get(digest)
+            return {"files": [found] if found else []}
+
+        return SimpleNamespace(execute=execute)
+
+    def create(self, body, media_body, **kwargs):
+        def next_chunk():
+            time.sleep(self.latency)
+            size = media_body.size()
+            media_body.getbytes(0, size)
+            file_id = f"file-{len(self.files_by_hash) + 1}"
+            record = {"id": file_id, "name": body["name"], "webViewLink": f"https://drive.example/{file_id}"}
+            with self._lock:
+                self.files_by_hash[body["appProperties"]["sha256"]] = record
+            return None, record
+
+        return SimpleNamespace(next_chunk=next_chunk)
+
+
+class FakeWorksheet:
+    """Records append_rows calls and answers like the Sheets values.append API."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.rows = []
+
+    def append_rows(self, rows, **kwargs):
+        time.sleep(self.latency)
+        start = len(self.rows) + 2
+        self.rows.extend(rows)
+        return {"updates": {"updatedRange": f"Sheet1!A{start}:C{start + len(rows) - 1}"}}
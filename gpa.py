@@ -0,0 +1,194 @@
+"""Columnar post-processing and GPA engine.
+
+The courses of many transcripts are flattened into one DataFrame so grade
+lookups and GPA totals are computed with vectorized operations; batches call
+``summarize_many`` once for all transcripts. A single transcript is too
+small for that to pay off, so the pipeline back-fills its missing credits
+with ``fill_credits`` on the nested dicts.
+
+Grade scales can be tied to institutions (keys from
+course_catalog.institution_for) with ``register_scale(..., institutions=)``
+or an ``"institutions"`` list in the TRANSCRIPTIQ_GRADE_SCALES file.
+"""
+import functools
+import json
+import math
+import os
+import re
+
+import pandas as pd
+
+# Standard 4.0 scale; plus/minus modifiers move a grade by 0.3 (A+ stays 4.0)
+DEFAULT_SCALE = {
+    "A+": 4.0, "A": 4.0, "A-": 3.7,
+    "B+": 3.3, "B": 3.0, "B-": 2.7,
+    "C+": 2.3, "C": 2.0, "C-": 1.7,
+    "D+": 1.3, "D": 1.0, "D-": 0.7,
+    "F": 0.0,
+}
+# Grades outside the GPA: Pass/Satisfactory earn credit, the rest do not
+DEFAULT_CREDIT_ONLY = {"P": True, "S": True, "CR": True, "NP": False, "U": False, "W": False, "I": False, "IP": False}
+
+GRADE_SCALES = {"default": {"points": DEFAULT_SCALE, "credit_only": DEFAULT_CREDIT_ONLY}}
+
+# Institution key -> scale name
+INSTITUTION_SCALES = {}
+# A letter grade with an optional +/- ("B+" in "B+R", but not the "I" of "IP")
+LETTER_GRADE = re.compile(r"^([A-F][+-]?)(?![A-Z])")
+
+COURSE_COLUMNS = ["term_index", "course_index", "term", "year", "course_code", "grade", "credits", "points"]
+
+
+def _institution_key(name: str) -> str:
+    # Same normalization as course_catalog.institution_for
+    return " ".join(re.findall(r"[a-z0-9&]+", (name or "").lower()))
+
+
+def register_scale(name: str, points: dict, credit_only: dict = None, institutions=()):
+    """Add or replace a grade scale, used for transcripts from the given institutions."""
+    GRADE_SCALES[name] = {
+        "points": {grade.upper(): float(value) for grade, value in points.items()},
+        "credit_only": {grade.upper(): bool(earns) for grade, earns in (credit_only or DEFAULT_CREDIT_ONLY).items()},
+    }
+    for institution in institutions:
+        INSTITUTION_SCALES[_institution_key(institution)] = name
+
+
+def load_scales(path: str):
+    """Load scales from a JSON file: {"name": {"points": {...}, "credit_only": {...}, "institutions": [...]}}."""
+    with open(path, encoding="utf-8") as f:
+        for name, scale in json.load(f).items():
+            register_scale(name, scale["points"], scale.get("credit_only"), scale.get("institutions", ()))
+
+
+def scale_for(institution: str) -> str:
+    """Name of the grade scale registered for an institution, else "default"."""
+    return INSTITUTION_SCALES.get(_institution_key(institution), "default")
+
+
+if os.environ.get("TRANSCRIPTIQ_GRADE_SCALES"):
+    load_scales(os.environ["TRANSCRIPTIQ_GRADE_SCALES"])
+
+
+def flatten_courses(json_data, transcript_id=None) -> pd.DataFrame:
+    """Flatten nested term/course dicts into one row per course."""
+    rows = [
+        (term_index, course_index, term.get("term", ""), term.get("year", ""), course.get("course_code", ""),
+         course.get("grade", ""), course.get("credits"), course.get("points"))
+        for term_index, term in enumerate(json_data or [])
+        for course_index, course in enumerate(term.get("courses", []))
+    ]
+    df = pd.DataFrame(rows, columns=COURSE_COLUMNS)
+    if transcript_id is not None:
+        df.insert(0, "transcript_id", transcript_id)
+    return df
+
+
+def normalize_grades(grades: pd.Series) -> pd.Series:
+    """Upper-case grades and reduce letter grades to letter + optional +/-."""
+    cleaned = grades.fillna("").astype(str).str.strip().str.upper()
+    letter = cleaned.str.extract(LETTER_GRADE.pattern, expand=False)
+    return letter.fillna(cleaned)
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_grade(grade) -> str:
+    """Scalar ``normalize_grades``."""
+    cleaned = "" if grade is None else str(grade).strip().upper()
+    letter = LETTER_GRADE.match(cleaned)
+    return letter.group(1) if letter else cleaned
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def fill_credits(json_data, scale: str = "default"):
+    """Back-fill missing credits (points / grade value) in place, with the same rules as ``score_courses``."""
+    grade_points = GRADE_SCALES[scale]["points"]
+    for term in json_data or []:
+        for course in term.get("courses", []):
+            credits = course.get("credits")
+            if not (_number(credits) == 0 or str(credits).strip() in ("", "None", "nan")):
+                continue
+            grade = course.get("grade")
+            grade_value = grade_points.get(normalize_grade(None if grade is None else str(grade)))
+            points = _number(course.get("points"))
+            if points and grade_value:
+                course["credits"] = float(round(points / grade_value, 1))
+    return json_data
+
+
+def _truthy_number(values: pd.Series) -> pd.Series:
+    numbers = pd.to_numeric(values, errors="coerce")
+    return numbers.where(numbers != 0)
+
+
+def score_courses(df: pd.DataFrame, scale: str = "default") -> pd.DataFrame:
+    """Add grade points, back-filled credits and GPA/earned credit columns."""
+    grade_scale = GRADE_SCALES[scale]
+    df = df.copy()
+    df["grade_norm"] = normalize_grades(df["grade"])
+    df["grade_value"] = df["grade_norm"].map(grade_scale["points"])
+
+    raw_credits = df["credits"]
+    credits = pd.to_numeric(raw_credits, errors="coerce")
+    credits_missing = raw_credits.isna() | raw_credits.astype(str).str.strip().isin(["", "None"]) | credits.eq(0)
+    points = _truthy_number(df["points"])
+    # Credits = points / grade value where credits are missing (never divide by an F)
+    fill = credits_missing & points.notna() & df["grade_value"].gt(0)
+    df["credits_filled"] = fill
+    df["credits_num"] = credits.mask(fill, (points / df["grade_value"]).round(1))
+
+    in_gpa = df["grade_value"].notna() & df["credits_num"].notna()
+    credit_only = df["grade_norm"].map(grade_scale["credit_only"])
+    earns = (in_gpa & df["grade_value"].gt(0)) | credit_only.eq(True)
+    df["gpa_credits"] = df["credits_num"].where(in_gpa, 0.0)
+    df["quality_points"] = (df["credits_num"] * df["grade_value"]).where(in_gpa, 0.0)
+    df["earned_credits"] = df["credits_num"].where(earns & df["credits_num"].notna(), 0.0)
+    return df
+
+
+def term_summary(scored: pd.DataFrame) -> pd.DataFrame:
+    """Per-term and cumulative GPA and credit totals, in transcript order."""
+    keys = ["transcript_id", "term_index"] if "transcript_id" in scored.columns else ["term_index"]
+    summary = scored.groupby(keys, sort=True).agg(
+        term=("term", "first"),
+        year=("year", "first"),
+        courses=("course_code", "size"),
+        gpa_credits=("gpa_credits", "sum"),
+        quality_points=("quality_points", "sum"),
+        earned_credits=("earned_credits", "sum"),
+    ).reset_index()
+    totals = ["gpa_credits", "quality_points", "earned_credits"]
+    if len(keys) > 1:
+        running = summary.groupby("transcript_id")[totals].cumsum()
+    else:
+        running = summary[totals].cumsum()
+    for column in totals:
+        summary[f"cumulative_{column}"] = running[column]
+    summary["term_gpa"] = (summary["quality_points"] / summary["gpa_credits"].where(summary["gpa_credits"] > 0)).round(2)
+    summary["cumulative_gpa"] = (
+        summary["cumulative_quality_points"]
+        / summary["cumulative_gpa_credits"].where(summary["cumulative_gpa_credits"] > 0)
+    ).round(2)
+    return summary
+
+
+def summarize_many(transcripts: dict, scale: str = "default", scales: dict = None) -> pd.DataFrame:
+    """Term/cumulative GPA for many transcripts ({id: json_data}) in one vectorized pass.
+
+    ``scales`` maps transcript ids to the scale to use instead of ``scale``.
+    """
+    by_scale = {}
+    for transcript_id, json_data in transcripts.items():
+        transcript_scale = (scales or {}).get(transcript_id) or scale
+        by_scale.setdefault(transcript_scale, []).append(flatten_courses(json_data, transcript_id))
+    if not by_scale:
+        return term_summary(score_courses(flatten_courses([], ""), scale))
+    scored = [score_courses(pd.concat(frames, ignore_index=True), name) for name, frames in by_scale.items()]
+    return term_summary(pd.concat(scored, ignore_index=True))
@@ -0,0 +1,161 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class JobLimitError(Exception):
+    """Raised when an owner already has the maximum number of active jobs."""
+
+
+class Job:
+    """A unit of background work and its observable progress."""
+
+    def __init__(self, owner: str, label: str = ""):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.label = label
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.result = None
+        self.partial = []
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, progress: float = None, message: str = None):
+        """Report progress from inside the job function."""
+        with self._lock:
+            if progress is not None:
+                self.progress = max(0.0, min(1.0, progress))
+            if message is not None:
+                self.message = message
+
+    def add_partial(self, item):
+        """Publish an intermediate result (e.g. one extracted term) to pollers."""
+        with self._lock:
+            self.partial.append(item)
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in ACTIVE_STATUSES
+
+    def snapshot(self) -> dict:
+        """Return a consistent copy of the job's public state."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "owner": self.owner,
+                "label": self.label,
+                "status": self.status,
+                "progress": self.progress,
+                "message": self.message,
+                "result": self.result,
+                "partial": list(self.partial),
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """Runs jobs on a shared worker pool with a per-owner cap on active jobs.
+
+    Jobs live in process memory, so they outlive the Streamlit script run (and
+    the session rerun) that submitted them. Finished jobs are forgotten after
+    ``retention_seconds``.
+    """
+
+    def __init__(self, max_workers: int = 4, max_active_per_owner: int = 2, retention_seconds: float = 3600):
+        self.max_active_per_owner = max_active_per_owner
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcript-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, fn, *args, label: str = "", **kwargs) -> str:
+        """Queue ``fn(job, *args, **kwargs)`` and return the new job id.
+
+        The function's return value becomes ``job.result``; an exception marks
+        the job failed with ``str(exception)`` as its error.
+        """
+        with self._lock:
+            self._prune()
+            active = sum(1 for job in self._jobs.values() if job.owner == owner and not job.finished)
+            if active >= self.max_active_per_owner:
+                raise JobLimitError(
+                    f"You already have {active} transcript(s) processing. Please wait for one to finish."
+                )
+            job = Job(owner, label)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job: Job, fn, args, kwargs):
+        with job._lock:
+            if job.status == CANCELLED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.message = "Started"
+        try:
+            result = fn(job, *args, **kwargs)
+        except Exception as e:
+            with job._lock:
+                job.status = FAILED
+                job.error = str(e)
+                job.message = "Failed"
+                job.finished_at = time.time()
+            return
+        with job._lock:
+            job.status = DONE
+            job.result = result
+            job.progress = 1.0
+            job.message = "Completed"
+            job.finished_at = time.time()
+
+    def get(self, job_id: str):
+        """Return the job with this id, or None if unknown or pruned."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, owner: str):
+        """Return an owner's jobs, newest first."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet."""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        with job._lock:
+            if job.status != QUEUED:
+                return False
+            job.status = CANCELLED
+            job.message = "Cancelled"
+            job.finished_at = time.time()
+        return True
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at and job.finished_at < cutoff
+        ]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
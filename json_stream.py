@@ -0,0 +1,132 @@
+import json
+import re
+
+# Start of the term array: "[" followed by an object (or "]" for an empty transcript)
+ARRAY_START = re.compile(r"\[\s*[{\]]")
+# A key missing its closing quote ({"short_title: "..."); only fixed in an object that failed to
+# parse, since in valid JSON the same text can be a string value ending in ":" ("Topics:", "")
+KEY_MISSING_QUOTE = re.compile(r'([{,]\s*)"(\w+):\s*"')
+TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+TERM_FIELD = re.compile(r'"(?:term|t)"\s*:\s*"([^"]*)"')
+YEAR_FIELD = re.compile(r'"(?:year|y)"\s*:\s*"?(\d{4})')
+
+
+class TermStreamParser:
+    """Incrementally pull complete term objects out of a partial JSON array.
+
+    Feed response text as it arrives; every time a top-level object in the
+    array closes, it is parsed and returned. Text before the array (prose or a
+    ```json fence) is skipped. Objects that still fail to parse after
+    ``repair_object`` are kept in ``rejected``, with the number of terms
+    parsed before each one in ``rejected_at``; ``pending`` holds the text of
+    an object that has not closed yet (e.g. output cut off at max_tokens).
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.terms = []
+        self.rejected = []
+        self.rejected_at = []
+        self._pos = 0
+        self._array_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+        self._done = False
+
+    def feed(self, text: str):
+        """Add more response text and return the terms completed by it."""
+        self.buffer += text
+        if self._array_start is None and not self._find_array_start():
+            return []
+        completed = []
+        buffer = self.buffer
+        end = len(buffer)
+        i = self._pos
+        while i < end and not self._done:
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._depth == 1:
+                    self._object_start = i
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._depth == 1 and self._object_start is not None:
+                    term = self._parse_object(buffer[self._object_start:i + 1])
+                    if term is not None:
+                        completed.append(term)
+                    else:
+                        self.rejected.append(buffer[self._object_start:i + 1])
+                        self.rejected_at.append(len(self.terms) + len(completed))
+                    self._object_start = None
+                elif self._depth == 0:
+                    self._done = True
+            i += 1
+        self._pos = i
+        self.terms.extend(completed)
+        return completed
+
+    def _find_array_start(self) -> bool:
+        fence = self.buffer.find("```json")
+        search_from = fence + len("```json") if fence != -1 else 0
+        match = ARRAY_START.search(self.buffer, search_from)
+        if match is None:
+            return False
+        start = match.start()
+        self._array_start = start
+        self._pos = start
+        return True
+
+    @staticmethod
+    def _parse_object(text: str):
+        term = repair_object(text)
+        return term if isinstance(term, dict) else None
+
+    @property
+    def pending(self):
+        """Text of the top-level object still open at the end of the input, if any."""
+        if self._done or self._object_start is None:
+            return None
+        return self.buffer[self._object_start:]
+
+    @property
+    def found(self) -> bool:
+        """True once the start of the term array has been seen."""
+        return self._array_start is not None
+
+    @property
+    def complete(self) -> bool:
+        """True once the closing bracket of the array has been seen."""
+        return self._done
+
+
+def repair_object(text: str):
+    """Parse a JSON object, fixing missing key quotes or trailing commas if it does not parse as is."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    repaired = TRAILING_COMMA.sub(r"\1", KEY_MISSING_QUOTE.sub(r'\1"\2": "', text))
+    try:
+        return json.loads(repaired)
+    except json.JSONDecodeError:
+        return None
+
+
+def term_label(text: str):
+    """Best-effort (term, year) from the text of a broken or truncated term object."""
+    term = TERM_FIELD.search(text or "")
+    year = YEAR_FIELD.search(text or "")
+    if term is None and year is None:
+        return None
+    return (term.group(1) if term else "", year.group(1) if year else "")
@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+# Drive upload done and the sheet row journaled, waiting for the sink to write it
+QUEUED = "queued"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+
+class PersistenceOutbox:
+    """Durable queue of "save this transcript to Drive and Sheets" intents.
+
+    ``record`` only writes to a local SQLite journal, so callers never wait on
+    Google APIs. A background thread delivers each intent in two steps (Drive
+    upload, then the Sheets row), storing each step's outcome before moving on
+    so a retry resumes where the last attempt stopped. Intents are keyed, so
+    recording the same transcript twice is a no-op.
+
+    ``deliver_drive(filename, pdf_bytes)`` must return the Drive file URL and
+    ``deliver_sheet(key, file_url, json_data, comment)`` a sheet ticket; both
+    should be idempotent (content-hash dedup and a sink dedupe key). When
+    ``sheet_written(ticket)`` is given, an intent stays QUEUED until it
+    reports the row as written to the sheet, and only then becomes DELIVERED.
+    ``sheet_failed(ticket)`` returns the error of a row the sink gave up on,
+    which fails the intent; ``retry`` then hands the row to ``deliver_sheet``
+    again.
+    """
+
+    def __init__(self, path: str, deliver_drive, deliver_sheet, max_attempts: int = 8,
+                 poll_interval: float = 2.0, max_retry_delay: float = 600.0, sheet_written=None, sheet_failed=None):
+        self.deliver_drive = deliver_drive
+        self.deliver_sheet = deliver_sheet
+        self.sheet_written = sheet_written
+        self.sheet_failed = sheet_failed
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.max_retry_delay = max_retry_delay
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS intents (
+                key TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                pdf_bytes BLOB,
+                json_data TEXT NOT NULL,
+                comment TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                drive_url TEXT,
+                sheet_ticket INTEGER,
+                created_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                delivered_at REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_intents_due ON intents(status, next_attempt_at)")
+        self._conn.commit()
+        self._thread = threading.Thread(target=self._run, name="persistence-outbox", daemon=True)
+        self._thread.start()
+
+    def record(self, key: str, filename: str, pdf_bytes, json_data, comment: str) -> bool:
+        """Record an intent to persist a transcript; return False if already recorded."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO intents "
+                "(key, filename, pdf_bytes, json_data, comment, status, created_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, filename, bytes(pdf_bytes), json.dumps(json_data), comment, PENDING, now, now),
+            )
+            self._conn.commit()
+        self._wakeup.set()
+        return cursor.rowcount == 1
+
+    def status(self, key: str):
+        """Return the delivery status of an intent, or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error, drive_url, sheet_ticket, delivered_at FROM intents WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, attempts, last_error, drive_url, sheet_ticket, delivered_at = row
+        return {
+            "status": status,
+            "attempts": attempts,
+            "last_error": last_error,
+            "drive_url": drive_url,
+            "sheet_ticket": sheet_ticket,
+            "delivered_at": delivered_at,
+        }
+
+    def retry(self, key: str):
+        """Put a failed intent back in the queue (its sheet row is enqueued again)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE intents SET status = ?, attempts = 0, sheet_ticket = NULL, next_attempt_at = ? "
+                "WHERE key = ? AND status = ?",
+                (PENDING, time.time(), key, FAILED),
+            )
+            self._conn.commit()
+        self._wakeup.set()
+
+    def deliver_due(self) -> int:
+        """Deliver every intent whose next attempt is due; return how many succeeded."""
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(
+                "SELECT key FROM intents WHERE status IN (?, ?) AND next_attempt_at <= ? ORDER BY created_at",
+                (PENDING, QUEUED, time.time()),
+            )]
+        return sum(1 for key in keys if self._deliver(key))
+
+    def _deliver(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename, pdf_bytes, json_data, comment, attempts, drive_url, sheet_ticket "
+                "FROM intents WHERE key = ?",
+                (key,),
+            ).fetchone()
+        filename, pdf_bytes, json_data, comment, attempts, drive_url, sheet_ticket = row
+        try:
+            if drive_url is None:
+                drive_url = self.deliver_drive(filename, pdf_bytes)
+                self._update(key, drive_url=drive_url)
+            if sheet_ticket is None:
+                sheet_ticket = self.deliver_sheet(key, drive_url, json.loads(json_data), comment)
+                self._update(key, sheet_ticket=sheet_ticket)
+        except Exception as e:
+            attempts += 1
+            delay = min(self.max_retry_delay, self.poll_interval * (2 ** attempts))
+            self._update(
+                key,
+                attempts=attempts,
+                last_error=str(e),
+                status=FAILED if attempts >= self.max_attempts else PENDING,
+                next_attempt_at=time.time() + delay,
+            )
+            return False
+        sheet_error = self.sheet_failed(sheet_ticket) if self.sheet_failed is not None else None
+        if sheet_error:
+            self._update(key, status=FAILED, last_error=f"Google Sheets rejected the row: {sheet_error}")
+            return False
+        if self.sheet_written is not None and not self.sheet_written(sheet_ticket):
+            # The PDF is in Drive now, so drop the local copy; check the row again on the next poll
+            self._update(key, status=QUEUED, last_error=None, pdf_bytes=None)
+            return False
+        self._update(key, status=DELIVERED, last_error=None, pdf_bytes=None, delivered_at=time.time())
+        return True
+
+    def _update(self, key: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE intents SET {assignments} WHERE key = ?", [*fields.values(), key])
+            self._conn.commit()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self.deliver_due()
+            except Exception:
+                # Leave intents pending; the next poll retries them
+                pass
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=self.poll_interval + 1)
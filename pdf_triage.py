@@ -0,0 +1,152 @@
+import io
+import re
+
+from pypdf import PdfReader, PdfWriter
+
+from text_layer import TERM_HEADING, TRANSFER_END_MARKERS, TRANSFER_MARKERS, is_usable_text, page_layout_text
+from upload_store import as_stream
+
+# Phrases that mark a transcript key / grading legend page
+LEGEND_MARKERS = (
+    "transcript explanation",
+    "explanation of transcript",
+    "key to transcript",
+    "transcript key",
+    "transcript legend",
+    "explanation of grades",
+    "grading system",
+    "grading scale",
+)
+# Something that looks like a course line: a subject code and number
+COURSE_CODE = re.compile(r"\b[A-Z]{2,5}\s?-?\d{3,4}[A-Z]?\b")
+# Fewer course-like matches than this on a legend page means it is legend-only
+MAX_LEGEND_COURSE_MATCHES = 3
+
+
+def page_texts(reader: PdfReader):
+    """Return the text layer of each page ("" where extraction fails)."""
+    texts = []
+    for page in reader.pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception:
+            texts.append("")
+    return texts
+
+
+def is_legend_only(text: str) -> bool:
+    """True for an explanation/legend page that lists no actual courses."""
+    lowered = text.lower()
+    if not any(marker in lowered for marker in LEGEND_MARKERS):
+        return False
+    return len(COURSE_CODE.findall(text)) < MAX_LEGEND_COURSE_MATCHES
+
+
+def plan_chunks(texts, pages_per_chunk: int):
+    """Group the indexes of non-legend pages into consecutive chunks."""
+    kept = [index for index, text in enumerate(texts) if not is_legend_only(text)]
+    if not kept:
+        kept = list(range(len(texts)))
+    return [kept[i:i + pages_per_chunk] for i in range(0, len(kept), pages_per_chunk)]
+
+
+def section_context(texts) -> dict:
+    """Where the given pages leave off: the open term (``"Fall 2023"`` or None) and whether a transfer section is open.
+
+    Term headings inside a transfer section belong to the transferred
+    courses, so they do not count as the open term.
+    """
+    term, in_transfer = None, False
+    for text in texts:
+        for line in text.splitlines():
+            lowered = line.lower()
+            if in_transfer and any(marker in lowered for marker in TRANSFER_END_MARKERS):
+                in_transfer = False
+            elif any(marker in lowered for marker in TRANSFER_MARKERS):
+                term, in_transfer = None, True
+            elif not in_transfer and (heading := TERM_HEADING.search(line)):
+                term = f"{heading.group(1).title()} {heading.group(2)}"
+    return {"term": term, "transfer": in_transfer}
+
+
+def first_page_layout_text(pdf_bytes) -> str:
+    """Layout text of the first non-legend page ("" without a usable text layer or readable PDF)."""
+    try:
+        with as_stream(pdf_bytes) as stream:
+            for page in PdfReader(stream).pages:
+                if is_legend_only(page.extract_text() or ""):
+                    continue
+                text = page_layout_text(page)
+                return text if is_usable_text(text) else ""
+    except Exception:
+        pass
+    return ""
+
+
+def build_chunk_pdf(reader: PdfReader, pages) -> bytes:
+    """Write the given pages of a PDF into a new PDF."""
+    writer = PdfWriter()
+    for index in pages:
+        writer.add_page(reader.pages[index])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def split_pdf(pdf_bytes, pages_per_chunk: int, use_text_layer: bool = False):
+    """Drop legend-only pages and split the rest into chunks.
+
+    Returns a list of dicts with ``pages`` (indexes), ``pdf_bytes``, ``text``
+    and ``context`` (``section_context`` of the pages before the chunk). With
+    ``use_text_layer``, chunks whose pages all have a usable text layer carry
+    the layout-preserving text (and no PDF bytes); the others carry a PDF of
+    just their pages. ``pages_per_chunk <= 0`` keeps all pages
+    in one chunk. A single chunk covering every page reuses the original
+    buffer, which may be a memoryview from the upload store.
+    """
+    with as_stream(pdf_bytes) as stream:
+        return _split_reader(PdfReader(stream), pdf_bytes, pages_per_chunk, use_text_layer)
+
+
+def _split_reader(reader: PdfReader, pdf_bytes, pages_per_chunk: int, use_text_layer: bool):
+    texts = page_texts(reader)
+    chunk_size = pages_per_chunk if pages_per_chunk > 0 else max(1, len(texts))
+    chunks = []
+    for pages in plan_chunks(texts, chunk_size):
+        text = None
+        if use_text_layer:
+            layout_texts = [page_layout_text(reader.pages[index]) for index in pages]
+            if all(is_usable_text(page_text) for page_text in layout_texts):
+                text = "\n\n".join(
+                    f"--- Page {index + 1} ---\n{page_text}" for index, page_text in zip(pages, layout_texts)
+                )
+        if text is not None:
+            chunk_bytes = None
+        elif len(pages) == len(texts):
+            chunk_bytes = pdf_bytes
+        else:
+            chunk_bytes = build_chunk_pdf(reader, pages)
+        context = section_context(texts[:pages[0]])
+        chunks.append({"pages": pages, "pdf_bytes": chunk_bytes, "text": text, "context": context})
+    return chunks
+
+
+def term_key(term_data):
+    return (str(term_data.get("term", "")).strip().lower(), str(term_data.get("year", "")).strip())
+
+
+def merge_terms(chunk_results):
+    """Merge per-chunk term lists, joining terms split across chunk boundaries.
+
+    Terms are matched on (term, year) and their courses concatenated in
+    chunk (page) order. Chunks never share pages, so a course that appears
+    in two chunks was listed twice and keeps both rows.
+    """
+    merged = {}
+    for terms in chunk_results:
+        for term_data in terms or []:
+            key = term_key(term_data)
+            if key not in merged:
+                merged[key] = {**term_data, "courses": []}
+            merged[key]["courses"].extend(term_data.get("courses", []))
+    return list(merged.values())
@@ -0,0 +1,686 @@
+import base64
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import anthropic
+import pandas as pd
+
+from compact_schema import expand_term
+from course_catalog import catalog_hint, institution_for
+from gpa import INSTITUTION_SCALES, fill_credits, scale_for
+from json_stream import TermStreamParser, term_label
+from pdf_triage import first_page_layout_text, merge_terms, split_pdf, term_key
+from rate_limit import RateLimiter, RetryPolicy, call_with_retries
+import telemetry
+from text_layer import parse_known_layout
+from transcript_schema import normalize_term
+from usage import sum_usage, usage_from_message
+
+MODEL = "claude-3-7-sonnet-latest"
+MAX_TOKENS = 4000
+# Local extraction cache (repeat uploads of the same PDF skip the Claude call)
+EXTRACTION_CACHE_PATH = os.environ.get("TRANSCRIPTIQ_CACHE_PATH", ".cache/extractions.sqlite3")
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPTIQ_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+EXTRACTION_CACHE_TTL_SECONDS = float(os.environ.get("TRANSCRIPTIQ_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+# Normalized term/course rows of every processed transcript, for cross-transcript queries
+RESULTS_DB_PATH = os.environ.get("TRANSCRIPTIQ_RESULTS_DB", ".cache/results.sqlite3")
+# Short titles and divisions of courses seen before, reused instead of regenerated
+CATALOG_PATH = os.environ.get("TRANSCRIPTIQ_CATALOG_PATH", ".cache/catalog.sqlite3")
+# Long PDFs are split into chunks of this many pages and extracted in parallel (0 disables)
+CHUNK_PAGES = int(os.environ.get("TRANSCRIPTIQ_CHUNK_PAGES", 3))
+CHUNK_WORKERS = int(os.environ.get("TRANSCRIPTIQ_CHUNK_WORKERS", 8))
+# Send the PDF's text layer instead of the document when it is usable (born-digital PDFs)
+USE_TEXT_LAYER = os.environ.get("TRANSCRIPTIQ_USE_TEXT_LAYER", "1") != "0"
+# Account rate limits shared by every Claude request in this process (0, the default, disables
+# a limit); set them to the account's tier to pace requests instead of relying on 429 retries
+RATE_LIMIT_RPM = int(os.environ.get("TRANSCRIPTIQ_RATE_LIMIT_RPM", 0))
+RATE_LIMIT_ITPM = int(os.environ.get("TRANSCRIPTIQ_RATE_LIMIT_ITPM", 0))
+MAX_RETRIES = int(os.environ.get("TRANSCRIPTIQ_MAX_RETRIES", 5))
+# Secondary model used while the primary one keeps returning 529 overloaded (unset disables)
+FALLBACK_MODEL = os.environ.get("TRANSCRIPTIQ_FALLBACK_MODEL") or None
+# Follow-up requests allowed for terms missing from a truncated or partly invalid response
+TOP_UP_ROUNDS = int(os.environ.get("TRANSCRIPTIQ_TOP_UP_ROUNDS", 2))
+# Rough input cost of one PDF page (text plus page image) for rate-limit reservations
+PDF_TOKENS_PER_PAGE = 2500
+# Prompt caching ignores a prefix shorter than this many tokens (2048 for Haiku models)
+MIN_CACHEABLE_PROMPT_TOKENS = 1024
+LIMITER = RateLimiter(RATE_LIMIT_RPM, RATE_LIMIT_ITPM)
+RETRY_POLICY = RetryPolicy(max_retries=MAX_RETRIES, fallback_model=FALLBACK_MODEL)
+DEFAULT_INSTRUCTION = "Extract the transcript data from this PDF following the instructions."
+TEXT_INSTRUCTION = (
+    "Extract the transcript data from the transcript text above following the instructions. "
+    "The text was taken from the PDF's text layer with its column layout preserved."
+)
+
+
+class ExtractionError(Exception):
+    """Raised when Claude's response cannot be turned into transcript data."""
+
+    def __init__(self, message: str, raw_response: str = None):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+
+def build_request(pdf_data_bytes, prompt: str, model: str = MODEL, instruction: str = DEFAULT_INSTRUCTION,
+                  document_text: str = None) -> dict:
+    """Build the messages.create keyword arguments for one transcript PDF.
+
+    With ``document_text`` the extracted text is sent instead of the PDF.
+    """
+    # The static instructions go first, as a system block with a cache breakpoint,
+    # so every request after the first reads them from the prompt cache.
+    system_payload = [
+        {
+            "type": "text",
+            "text": prompt,
+            "cache_control": {"type": "ephemeral"}
+        }
+    ]
+    if document_text is not None:
+        document = {
+            "type": "text",
+            "text": f"<transcript_text>\n{document_text}\n</transcript_text>"
+        }
+    else:
+        with telemetry.stage("encode"):
+            encoded = base64.b64encode(pdf_data_bytes).decode("utf-8")
+        document = {
+            "type": "document",
+            "source": {
+                "type": "base64",
+                "media_type": "application/pdf",
+                "data": encoded
+            }
+        }
+    messages_payload = [
+        {
+            "role": "user",
+            "content": [
+                document,
+                {
+                    "type": "text",
+                    "text": instruction
+                }
+            ]
+        }
+    ]
+    return {
+        "model": model,
+        "max_tokens": MAX_TOKENS,
+        "system": system_payload,
+        "messages": messages_payload,
+    }
+
+def describe_api_error(e: Exception) -> str:
+    """Turn an Anthropic client exception into a user-facing message."""
+    if isinstance(e, anthropic.AuthenticationError):
+        return "⚠️ Authentication to Claude API failed. Please contact the administrator to check API credentials."
+    if isinstance(e, anthropic.APIStatusError):
+        if e.status_code == 529:
+            return "⚠️ Claude is currently experiencing high demand. Please try again in a few minutes."
+        elif e.status_code == 429:
+            return "⚠️ API rate limit exceeded. Please wait a moment before trying again."
+        elif e.status_code >= 500:
+            return "⚠️ Claude service is temporarily unavailable. Please try again later."
+        return f"⚠️ API Error: {str(e)}"
+    if isinstance(e, anthropic.APITimeoutError):
+        return "⚠️ The request to Claude timed out. This PDF may be too complex or the service is busy. Please try again later."
+    if isinstance(e, anthropic.APIConnectionError):
+        return "⚠️ Connection to Claude API failed. Please check your internet connection and try again."
+    return f"⚠️ An unexpected error occurred: {str(e)}"
+
+def estimate_input_tokens(pdf_data_bytes, document_text: str = None, instruction: str = "") -> int:
+    """Guess a request's uncached input tokens before sending it (the prompt itself is cached)."""
+    if document_text is not None:
+        return (len(document_text) + len(instruction)) // 4
+    pages = len(re.findall(rb"/Type\s*/Page(?![a-zA-Z])", pdf_data_bytes)) or 1
+    return pages * PDF_TOKENS_PER_PAGE + len(instruction) // 4
+
+def _counted_tokens(usage: dict) -> int:
+    # Prompt-cache reads do not count towards the input-tokens-per-minute limit
+    return usage["input_tokens"] + usage["cache_creation_input_tokens"]
+
+def _finish_message(message, model: str):
+    usage = usage_from_message(message)
+    telemetry.record_usage(usage, model)
+    return (message.content[0].text, usage), _counted_tokens(usage)
+
+_checked_prompts = set()
+_checked_prompts_lock = threading.Lock()
+
+def check_prompt_cacheable(client, prompt: str, model: str = MODEL):
+    """Count the cached system block once per model and prompt; warn if it is too short to be cached.
+
+    Returns the token count, or None when the prompt was already checked or
+    could not be counted (the count includes a one-token user message).
+    """
+    with _checked_prompts_lock:
+        if (model, prompt) in _checked_prompts:
+            return None
+        _checked_prompts.add((model, prompt))
+    try:
+        tokens = client.messages.count_tokens(
+            model=model, system=[{"type": "text", "text": prompt}], messages=[{"role": "user", "content": "."}]
+        ).input_tokens
+    except Exception:
+        # Counting is advisory: fakes without count_tokens, or a network error, skip the check
+        return None
+    minimum = 2 * MIN_CACHEABLE_PROMPT_TOKENS if "haiku" in model else MIN_CACHEABLE_PROMPT_TOKENS
+    if tokens < minimum:
+        telemetry.logger.warning(json.dumps({"event": "prompt_not_cacheable", "model": model, "tokens": tokens,
+                                             "minimum": minimum}))
+    return tokens
+
+def request_extraction(client, pdf_data_bytes, prompt: str, model: str = MODEL,
+                       instruction: str = DEFAULT_INSTRUCTION, document_text: str = None, limiter=None):
+    """Call Claude synchronously and return (response text, usage dict).
+
+    Requests go through ``limiter`` (the process-wide LIMITER by default) and
+    transient failures are retried (see rate_limit); ``model`` may be swapped
+    for FALLBACK_MODEL. The first request per model checks that the prompt
+    is long enough to be cached (see check_prompt_cacheable).
+    """
+    request = build_request(pdf_data_bytes, prompt, model, instruction, document_text)
+
+    def call(model_name):
+        with telemetry.stage("api_call", model=model_name):
+            message = client.messages.create(**{**request, "model": model_name})
+        return _finish_message(message, model_name)
+
+    check_prompt_cacheable(client, prompt, model)
+    estimate = estimate_input_tokens(pdf_data_bytes, document_text, instruction)
+    result, _ = call_with_retries(call, model, estimate, limiter or LIMITER, RETRY_POLICY)
+    return result
+
+def request_extraction_stream(client, pdf_data_bytes, prompt: str, model: str = MODEL, on_text=None,
+                              instruction: str = DEFAULT_INSTRUCTION, document_text: str = None, limiter=None):
+    """Stream Claude's response, passing each text delta to ``on_text``.
+
+    Returns (full response text, usage dict) once the stream completes. A
+    failure before the first delta is retried like ``request_extraction``; one
+    after text has been passed on raises ExtractionError with the partial text.
+    """
+    request = build_request(pdf_data_bytes, prompt, model, instruction, document_text)
+
+    def call(model_name):
+        start = time.perf_counter()
+        received = []
+        try:
+            with telemetry.stage("api_call", model=model_name), \
+                    client.messages.stream(**{**request, "model": model_name}) as stream:
+                for text in stream.text_stream:
+                    if not received:
+                        telemetry.observe("api_first_token", time.perf_counter() - start, model=model_name)
+                    received.append(text)
+                    if on_text:
+                        on_text(text)
+                message = stream.get_final_message()
+        except Exception as e:
+            if not received:
+                raise
+            raise ExtractionError(
+                f"Claude's response was interrupted: {describe_api_error(e)}", raw_response="".join(received)
+            ) from e
+        return _finish_message(message, model_name)
+
+    check_prompt_cacheable(client, prompt, model)
+    estimate = estimate_input_tokens(pdf_data_bytes, document_text, instruction)
+    result, _ = call_with_retries(call, model, estimate, limiter or LIMITER, RETRY_POLICY)
+    return result
+
+def recover_response(text):
+    """Recover every usable term from a response, fenced or not, complete or not.
+
+    Returns a dict with ``found`` (a term array was present), ``terms`` (the
+    complete objects that pass schema validation), ``redo`` ((term, year)
+    labels of objects that were malformed, invalid or cut off),
+    ``truncated`` (the array never closed) and ``order`` (the term_key of
+    every object with a label, usable or not, in response order).
+    """
+    with telemetry.stage("extract_json"):
+        parser = TermStreamParser()
+        parser.feed(text or "")
+        terms, redo, order = [], [], []
+        rejected = list(zip(parser.rejected_at, parser.rejected))
+
+        def broken(object_text):
+            label = term_label(object_text)
+            if label:
+                redo.append(label)
+                order.append(term_key({"term": label[0], "year": label[1]}))
+
+        for index, term in enumerate(parser.terms):
+            while rejected and rejected[0][0] <= index:
+                broken(rejected.pop(0)[1])
+            term, problems = normalize_term(expand_term(term))
+            order.append(term_key(term))
+            if problems:
+                redo.append((str(term.get("term", "")), term["year"]))
+            else:
+                terms.append(term)
+        for _, object_text in rejected:
+            broken(object_text)
+        broken(parser.pending)
+        return {"found": parser.found, "terms": terms, "redo": redo,
+                "truncated": parser.found and not parser.complete, "order": order}
+
+def parse_json_response(text):
+    """Extract the transcript terms from Claude's response text.
+
+    Accepts fenced or bare JSON and keeps every complete, valid term of a
+    truncated or partly malformed array; raises ExtractionError only when no
+    term can be recovered.
+    """
+    recovered = recover_response(text)
+    if not recovered["found"]:
+        raise ExtractionError("Could not find JSON data in Claude's response.")
+    if not recovered["terms"] and (recovered["redo"] or recovered["truncated"]):
+        raise ExtractionError("Failed to parse JSON output from Claude.")
+    return recovered["terms"]
+
+def _label(term, year):
+    return f"{term} {year}".strip()
+
+class TopUp:
+    """Terms recovered from one extraction plus the follow-up requests that fill its gaps.
+
+    Instead of re-running a whole extraction when the response was cut off at
+    MAX_TOKENS or had malformed terms, ``next_instruction`` asks Claude for
+    only the missing and invalid terms; ``add`` merges each follow-up
+    response. At most TOP_UP_ROUNDS follow-ups are made, and a round that adds
+    nothing ends the loop.
+    """
+
+    def __init__(self, response_text: str, usage: dict, instruction: str):
+        recovered = recover_response(response_text)
+        self.found = recovered["found"]
+        self.terms = recovered["terms"]
+        self.redo = self._unresolved(recovered["redo"])
+        self.truncated = recovered["truncated"]
+        self.order = recovered["order"]
+        self.instruction = instruction
+        self.texts = [response_text]
+        self.usages = [usage]
+        self.rounds = 0
+        self.stalled = False
+
+    def _unresolved(self, labels):
+        have = {term_key(term) for term in self.terms}
+        unresolved = []
+        for term, year in labels:
+            label = {"term": term, "year": year}
+            if term_key(label) not in have and (term, year) not in unresolved:
+                unresolved.append((term, year))
+        return unresolved
+
+    def _in_order(self, terms):
+        """Put re-extracted terms back where the first response had them; terms it never reached go last."""
+        rank = {}
+        for key in self.order:
+            rank.setdefault(key, len(rank))
+        return sorted(terms, key=lambda term: rank.get(term_key(term), len(rank)))
+
+    @property
+    def needed(self) -> bool:
+        return (self.found and not self.stalled and self.rounds < TOP_UP_ROUNDS
+                and bool(self.redo or self.truncated))
+
+    def next_instruction(self) -> str:
+        have = ", ".join(_label(term.get("term", ""), term.get("year", "")) for term in self.terms) or "none"
+        parts = [
+            self.instruction,
+            f"An earlier extraction of this transcript already returned these terms: {have}. Do not repeat them.",
+        ]
+        if self.redo:
+            redo = ", ".join(_label(term, year) for term, year in self.redo)
+            parts.append(f"Extract these terms again, because their earlier output was cut off or invalid: {redo}.")
+        if self.truncated:
+            parts.append("The earlier output was cut off, so also extract every term that comes after those.")
+        parts.append("Return only these terms as a JSON array in the same format, or [] if there are none.")
+        self.rounds += 1
+        telemetry.increment("top_up_requests_total", reason="truncated" if self.truncated else "invalid")
+        return " ".join(parts)
+
+    def add(self, response_text: str, usage: dict):
+        recovered = recover_response(response_text)
+        self.texts.append(response_text)
+        self.usages.append(usage)
+        before = (len(self.terms), len(self.redo), self.truncated)
+        # A follow-up may repeat terms it was told it already has; the first, valid copy stays
+        have = {term_key(term) for term in self.terms}
+        for term in recovered["terms"]:
+            if term_key(term) not in have:
+                have.add(term_key(term))
+                self.terms.append(term)
+        self.terms = self._in_order(self.terms)
+        # A label with a garbled year cannot be matched to its corrected term, so it is asked for once
+        checkable = [(term, year) for term, year in self.redo if len(year) == 4 and year.isdigit()]
+        self.redo = self._unresolved(checkable + recovered["redo"])
+        # A follow-up without any array leaves the earlier truncation unresolved
+        self.truncated = recovered["truncated"] if recovered["found"] else self.truncated
+        self.stalled = (len(self.terms), len(self.redo), self.truncated) == before
+
+    def result(self):
+        """Return (combined response text, summed usage, terms, labels still missing)."""
+        response_text = "\n\n".join(self.texts)
+        if not self.found:
+            raise ExtractionError("Could not find JSON data in Claude's response.", raw_response=response_text)
+        if not self.terms and (self.redo or self.truncated):
+            raise ExtractionError("Failed to parse JSON output from Claude.", raw_response=response_text)
+        missing = [_label(term, year) for term, year in self.redo]
+        if self.truncated:
+            missing.append("terms after the last one extracted (output was cut off)")
+        return response_text, sum_usage(self.usages), self.terms, missing
+
+def complete_extraction(client, response_text, usage, pdf_data_bytes, prompt: str, model: str = MODEL,
+                        instruction: str = DEFAULT_INSTRUCTION, document_text: str = None, limiter=None):
+    """Recover a response's terms and top up missing or invalid ones (see TopUp)."""
+    top_up = TopUp(response_text, usage, instruction)
+    while top_up.needed:
+        top_up.add(*request_extraction(
+            client, pdf_data_bytes, prompt, model, top_up.next_instruction(), document_text, limiter
+        ))
+    return top_up.result()
+
+def post_process_transcript_data(json_data, scale: str = "default"):
+    """Post-process the JSON data to ensure credits are correctly calculated."""
+    with telemetry.stage("post_process"):
+        return fill_credits(json_data, scale)
+
+def course_table(courses) -> pd.DataFrame:
+    """Build the display table for one term's courses."""
+    return pd.DataFrame([
+        {
+            "Course Code": course.get("course_code", ""),
+            "Division": course.get("division", ""),
+            "Title": course.get("title", ""),
+            "Short Title": course.get("short_title", ""),
+            "Credit": course.get("credits", ""),
+            "Grade": course.get("grade", "")
+        }
+        for course in courses
+    ])
+
+def plan_pdf_chunks(pdf_data_bytes, pages_per_chunk: int = None):
+    """Prepare the chunks to send for one PDF.
+
+    Legend-only pages are dropped and the rest split into ``pages_per_chunk``
+    page ranges; each chunk carries either usable layout text or its own PDF
+    (see pdf_triage.split_pdf). Falls back to the whole document as a single
+    chunk when the PDF cannot be read locally.
+    """
+    pages_per_chunk = CHUNK_PAGES if pages_per_chunk is None else pages_per_chunk
+    try:
+        with telemetry.stage("prepare_pdf"):
+            return split_pdf(pdf_data_bytes, pages_per_chunk, use_text_layer=USE_TEXT_LAYER)
+    except Exception:
+        return [{"pages": None, "pdf_bytes": pdf_data_bytes, "text": None, "context": None}]
+
+def chunk_instruction(chunk, chunked: bool, catalog=None, institution: str = "") -> str:
+    instruction = TEXT_INSTRUCTION if chunk["text"] is not None else DEFAULT_INSTRUCTION
+    if catalog and chunk["text"] is not None:
+        # Courses whose short title the catalog already has need none from Claude
+        hint = catalog_hint(catalog.known_codes(institution, chunk["text"]))
+        instruction = f"{instruction} {hint}" if hint else instruction
+    if not chunked:
+        return instruction
+    first, last = chunk["pages"][0] + 1, chunk["pages"][-1] + 1
+    context = chunk.get("context") or {}
+    carried = ""
+    if context.get("transfer"):
+        carried = (
+            "The previous pages end inside a transfer credit section: courses at the top of these pages "
+            "belong to it and must be skipped until that section ends. "
+        )
+    elif context.get("term"):
+        carried = (
+            f"The previous pages end inside the {context['term']} term: courses at the top of these pages, "
+            f"before any new term heading, belong to {context['term']}. "
+        )
+    return (
+        f"These are pages {first}-{last} of a longer transcript (legend pages removed). "
+        "Extract only the terms and courses shown on these pages; a term may continue from earlier pages "
+        f"or into later ones, so include whatever part of it appears here. {carried}{instruction}"
+    )
+
+def extract_chunks(client, chunks, prompt: str, model: str = MODEL, progress=None, catalog=None,
+                   institution: str = "", limiter=None):
+    """Extract several page chunks in parallel and merge their terms.
+
+    Returns (combined response text, summed usage, merged terms, labels of
+    terms still missing).
+    """
+    def run(chunk):
+        instruction = chunk_instruction(chunk, True, catalog, institution)
+        response_text, usage = request_extraction(
+            client, chunk["pdf_bytes"], prompt, model, instruction, chunk["text"], limiter
+        )
+        pages = chunk["pages"]
+        try:
+            return complete_extraction(
+                client, response_text, usage, chunk["pdf_bytes"], prompt, model, instruction, chunk["text"],
+                limiter
+            )
+        except ExtractionError as e:
+            raise ExtractionError(f"Pages {pages[0] + 1}-{pages[-1] + 1}: {e}", raw_response=e.raw_response)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(chunks), CHUNK_WORKERS))) as pool:
+        futures = [pool.submit(run, chunk) for chunk in chunks]
+        for done, future in enumerate(as_completed(futures), start=1):
+            future.result()
+            if progress:
+                progress(0.1 + 0.8 * done / len(futures), f"Extracted {done} of {len(futures)} page ranges")
+        results = [future.result() for future in futures]
+
+    response_text = "\n\n".join(text for text, _, _, _ in results)
+    usage = sum_usage(usage for _, usage, _, _ in results)
+    missing = [label for _, _, _, labels in results for label in labels]
+    return response_text, usage, merge_terms(terms for _, _, terms, _ in results), missing
+
+def extract_transcript(client, pdf_data_bytes, prompt: str = None, model: str = MODEL, cache=None, progress=None,
+                       on_term=None, catalog=None, limiter=None):
+    """Run the full extraction pipeline for one PDF.
+
+    Checks the extraction cache, then prepares the PDF locally: legend-only
+    pages are dropped, born-digital pages are sent as layout text instead of
+    the PDF, and transcripts in a known layout are parsed without calling
+    Claude at all. PDFs longer than CHUNK_PAGES are extracted as parallel
+    page-range requests whose terms are merged. ``progress(fraction,
+    message)`` is called between stages. When ``on_term`` is given a single
+    request is streamed and each post-processed term is passed to it as soon
+    as its JSON object closes (otherwise terms are reported once complete).
+    Terms missing from a truncated or partly invalid response are fetched
+    with small follow-up requests (see TopUp). With a ``catalog``
+    (course_catalog.CourseCatalog) known courses get their short title and
+    division from it, Claude is told which ones it can skip, and the
+    extracted courses are added to it. Claude requests go through
+    ``limiter`` (rate_limit.RateLimiter), or the process-wide LIMITER.
+
+    Credits are back-filled with the grade scale registered for the
+    transcript's institution (gpa.scale_for).
+
+    Returns a dict with ``raw_response``, ``json_data``, ``usage`` (None when
+    Claude was not called), ``cached``, ``method``, ``missing`` (labels of
+    terms that could not be recovered; such results are not cached) and
+    ``scale``.
+    """
+    prompt = prompt or PROMPT
+
+    def report(fraction, message):
+        if progress:
+            progress(fraction, message)
+
+    def finish(response_text, json_data, usage, method, missing=(), streamed=()):
+        if catalog:
+            catalog.apply(json_data, institution)
+        json_data = post_process_transcript_data(json_data, scale)
+        if catalog:
+            catalog.learn(json_data, institution)
+        if on_term:
+            for term in json_data:
+                if term_key(term) not in streamed:
+                    on_term(term)
+        if cache and not missing:
+            cache.put(cache_key, response_text, json_data)
+        telemetry.increment("extractions_total", method=method.split(":")[0])
+        return {"raw_response": response_text, "json_data": json_data, "usage": usage, "cached": False,
+                "method": method, "missing": list(missing), "scale": scale}
+
+    cache_key = cache.make_key(pdf_data_bytes, prompt, model) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached:
+        telemetry.increment("extractions_total", method="cache")
+        if on_term:
+            for term in cached["json_data"]:
+                on_term(term)
+        # Only look for the institution when some scale depends on it
+        scale = scale_for(institution_for(first_page_layout_text(pdf_data_bytes))) if INSTITUTION_SCALES else "default"
+        return {"raw_response": cached["raw_response"], "json_data": cached["json_data"], "usage": None,
+                "cached": True, "method": "cache", "missing": [], "scale": scale}
+
+    report(0.05, "Reading PDF...")
+    chunks = plan_pdf_chunks(pdf_data_bytes)
+    institution = institution_for(next((chunk["text"] for chunk in chunks if chunk["text"]), ""))
+    scale = scale_for(institution)
+    if all(chunk["text"] is not None for chunk in chunks):
+        # Known transcript layout: parse the text layer deterministically
+        with telemetry.stage("layout_parse"):
+            parsed = parse_known_layout("\n\n".join(chunk["text"] for chunk in chunks))
+        if parsed:
+            layout_name, terms = parsed
+            return finish(f"Parsed locally with the '{layout_name}' layout.", terms, None, f"layout:{layout_name}")
+
+    if len(chunks) > 1:
+        report(0.1, f"Analyzing {len(chunks)} page ranges in parallel...")
+        response_text, usage, json_data, missing = extract_chunks(
+            client, chunks, prompt, model, progress=report, catalog=catalog, institution=institution,
+            limiter=limiter
+        )
+        return finish(response_text, json_data, usage, "chunked", missing)
+
+    # Short transcript: one request with its text layer or PDF (minus legend-only pages)
+    chunk = chunks[0]
+    instruction = chunk_instruction(chunk, False, catalog, institution)
+    report(0.1, "Analyzing transcript with Claude...")
+    streamed = set()
+    if on_term:
+        parser = TermStreamParser()
+
+        def on_text(text):
+            for term in parser.feed(text):
+                term, problems = normalize_term(expand_term(term))
+                if problems:
+                    continue
+                if catalog:
+                    catalog.apply([term], institution, count=False)
+                on_term(post_process_transcript_data([term], scale)[0])
+                streamed.add(term_key(term))
+                report(min(0.85, 0.1 + 0.05 * len(parser.terms)),
+                       f"Extracted {term.get('term', '')} {term.get('year', '')}".strip())
+
+        response_text, usage = request_extraction_stream(
+            client, chunk["pdf_bytes"], prompt, model, on_text=on_text,
+            instruction=instruction, document_text=chunk["text"], limiter=limiter
+        )
+    else:
+        response_text, usage = request_extraction(
+            client, chunk["pdf_bytes"], prompt, model, instruction, chunk["text"], limiter
+        )
+    method = "text" if chunk["text"] is not None else "document"
+    report(0.9, "Parsing extracted data...")
+    response_text, usage, json_data, missing = complete_extraction(
+        client, response_text, usage, chunk["pdf_bytes"], prompt, model, instruction, chunk["text"], limiter
+    )
+    return finish(response_text, json_data, usage, method, missing, streamed)
+
+# Prompt template for Claude
+PROMPT = """
+# Transcript Data Extraction Prompt
+
+## **Objective**
+Extract the following information from the provided PDF transcript file.
+
+## **Reading the Input**
+- The transcript arrives either as a PDF document or as text taken from the PDF's text layer, inside `<transcript_text>` tags.
+- Text-layer input keeps the column layout: each course is normally one line with its code, title, credits, grade and points in columns. Lines such as `--- Page 2 ---` mark page breaks and are not part of the transcript.
+- A title too long for its column wraps onto the next line, indented under the title column; join the pieces with a single space.
+- Headers and footers repeated on every page (institution name, student name or ID, "Page 2 of 4", "continued") are not courses and do not start a new term.
+- A term that runs across a page break continues on the next page: keep adding its courses to the same term.
+
+## **Instructions**
+
+### **Step 1: Check for a "Transcript Explanation" Page**
+- If the document contains a "Transcript Explanation" page, refer to it before extracting any data.
+- Use this page to correctly interpret the structure, grading system, and any special formatting rules in the transcript.
+
+### **Step 2: Check for sections titled "TRANSFER CREDIT ACCEPTED BY THE INSTITUTION", "Transfer Coursework", "Transfer Credit", "Transferred Courses", or any similar wording that indicates transfer credits**.
+- These are NOT part of the student's earned credits at this institution and must not be included in the extracted data.
+- Do not extract courses from these sections even if they look like normal course listings.
+- Only extract courses that were taken and completed **at the issuing institution**.
+- A transfer section can contain its own term headings (the terms in which the credit was earned elsewhere); skip those headings and their courses too.
+- The transfer section ends at a heading for the institution's own record, such as "INSTITUTION CREDIT" or "Beginning of Undergraduate Record".
+
+### **Step 3: Extract the Required Information**
+For each term, extract the following details:
+
+- **Term:** Identify the academic term (Fall, Spring, Summer, Winter or Autumn) as printed, without words such as "Semester", "Term" or "Quarter".
+- **Year:** Extract the 4-digit academic year. If a term spans two calendar years ("Winter 2023-24"), use the year printed first.
+- **Courses:** A list of courses within that term, with the following attributes:
+  - **Course Code:** Extract exactly as shown under "COURSE."
+  - **Title:** Extract exactly as shown under "COURSE TITLE."
+  - **Short Title:** Only for titles of 40 characters or more: a meaningful short version (<= 40 characters) that preserves essential context. For shorter titles leave it as an empty string ("").
+  - **Credits:** 
+            - If "CRED" or "CREDIT" column exists, extract directly from there.
+            - If missing, calculate credits by dividing "GRADE POINTS" or "POINTS" by the numerical value of the grade.
+            - Example: If Points = 12 and Grade = A (4.0), then Credits = 12/4 = 3.
+  - **Grade:** Extract what is listed under "GRADE."
+  - **Points:** Extract what is listed under "GRADE POINTS" or "POINTS" if available.
+- Do not output the division (undergraduate/graduate); it is derived from the course code afterwards.
+
+### **Step 4: Output Format**
+Return the extracted data as a compact **JSON array** with one object per term, in transcript order:
+- `"t"`: term, `"y"`: year, `"c"`: the term's courses.
+- Each course is an array of exactly six values, in this order:
+  `[course_code, title, short_title, credits, grade, points]`
+
+```json
+[
+  {"t": "Fall", "y": "2023", "c": [
+    ["CS101", "Real-Time Text and voice output enabled traffic sign detection system using deep learning", "Real-Time Traffic Sign Detection", 3, "A", "12.0"],
+    ["MATH202", "Calculus II", "", 4, "B+", "13.2"]
+  ]},
+  {"t": "Spring", "y": "2024", "c": [
+    ["MATH5001", "Advanced Calculus", "", 4, "A-", "14.8"]
+  ]}
+]
+```
+
+## **Course Rows**
+- One row per course line, in the order printed. A course listed more than once in a term (a repeated course, several sections of independent study or research) gets one row per line.
+- Copy the course code with its spacing as printed ("CS 101" or "CS101").
+- Credits are a number (3, 4, 1.5); points are a string as printed ("12.0"), or "" when not shown.
+- Term totals, GPA lines, honors, academic standing and other notes are not courses.
+
+## **Grade Values**
+- A+ = 4.0, A = 4.0, A- = 3.7, B+ = 3.3, B = 3.0, B- = 2.7, C+ = 2.3, C = 2.0, C- = 1.7, D+ = 1.3, D = 1.0, D- = 0.7, F = 0.0.
+- Copy grades exactly as printed, including repeat or forgiveness marks ("B+R", "A*").
+- P, S, CR, NP, U, W, I and IP have no grade value: never compute credits from points for them, and leave credits as "" when they are not printed.
+
+## **Partial Requests**
+The request that follows the transcript may narrow the task. Follow it and keep the same output format:
+- "These are pages X-Y of a longer transcript": extract only the terms and courses on those pages. When told that the previous pages end inside a term, the courses before the first term heading belong to that term; when told they end inside a transfer credit section, skip courses until that section ends.
+- "An earlier extraction ... already returned these terms" or "Extract these terms again": return only the requested terms, plus the terms after the last one returned when the earlier output was cut off, or [] if there are none.
+- "Short titles for these courses are already known": leave the short title of those courses as "".
+
+## **Additional Considerations**
+- If "CRED" is missing, calculate credits using: CRED = Points/Grade where grade values are A=4.0, B=3.0, C=2.0, D=1.0, F=0.0
+- Plus/minus modifiers adjust by 0.3 (e.g., A- = 3.7, B+ = 3.3)
+- Ensure that each course is correctly associated with its respective term and year.
+- Make sure to extract and include the points value in every course row as it's needed for credit calculation.
+- If any required information is missing from a course, leave the value as an empty string ("") rather than omitting it, so every course row keeps all six values.
+- Return exactly one ```json fenced array and nothing after it: no comments, no trailing commas, and every key and string in double quotes.
+"""
@@ -0,0 +1,211 @@
+"""Process-wide Claude rate limiting and retries.
+
+``RateLimiter`` keeps two token buckets sized to the account's requests- and
+input-tokens-per-minute limits. Callers reserve capacity before each request
+and sleep for however long the buckets say; ``max_in_flight`` optionally caps
+how many requests are outstanding at once. A 429 pauses every caller until
+the retry-after time. ``call_with_retries`` retries 429/529/5xx and connection
+errors with exponential backoff and full jitter. When overloads keep coming,
+it switches to a fallback model if one is configured.
+"""
+import contextlib
+import random
+import threading
+import time
+from collections import deque
+
+import anthropic
+
+import telemetry
+
+
+class TokenBucket:
+    """Token bucket that lets callers reserve ahead and wait off their debt."""
+
+    def __init__(self, per_minute: float, burst: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take ``amount`` tokens and return how many seconds to wait before using them."""
+        self._refill(now)
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def refund(self, amount: float, now: float):
+        """Give back (or, if negative, take more) tokens after the real cost is known."""
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """Shared requests-per-minute and input-tokens-per-minute limits.
+
+    A limit of 0 disables that bucket. ``max_in_flight`` bounds concurrent
+    requests across every thread sharing the limiter (0 for no bound).
+    Overloads (529s) are counted over
+    ``overload_window`` seconds; ``overloaded()`` reports sustained overload
+    once ``overload_threshold`` of them have been seen.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, input_tokens_per_minute: float = 0,
+                 overload_threshold: int = 3, overload_window: float = 60.0, max_in_flight: int = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(input_tokens_per_minute) if input_tokens_per_minute else None
+        self._in_flight = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        self.overload_threshold = overload_threshold
+        self.overload_window = overload_window
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+        self._overloads = deque()
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """Reserve one request and its estimated input tokens; return the wait in seconds."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._blocked_until - now)
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens:
+                wait = max(wait, self.tokens.reserve(estimated_tokens, now))
+        return wait
+
+    def acquire(self, estimated_tokens: int):
+        wait = self.reserve(estimated_tokens)
+        if wait:
+            telemetry.observe("rate_limit_wait", wait)
+            time.sleep(wait)
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Hold one of the ``max_in_flight`` request slots for the duration of the block."""
+        if self._in_flight is None:
+            yield
+            return
+        with self._in_flight:
+            yield
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once a response reports the real input size."""
+        if self.tokens:
+            with self._lock:
+                self.tokens.refund(estimated_tokens - actual_tokens, time.monotonic())
+
+    def block_for(self, seconds: float):
+        """Hold every caller back for ``seconds`` (the server told us to slow down)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def record_overload(self):
+        with self._lock:
+            self._overloads.append(time.monotonic())
+
+    def overloaded(self) -> bool:
+        with self._lock:
+            cutoff = time.monotonic() - self.overload_window
+            while self._overloads and self._overloads[0] < cutoff:
+                self._overloads.popleft()
+            return len(self._overloads) >= self.overload_threshold
+
+
+def retry_after_seconds(e: Exception):
+    """Seconds from a response's retry-after header, or None."""
+    response = getattr(e, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, (anthropic.APITimeoutError, anthropic.APIConnectionError)):
+        return True
+    if isinstance(e, anthropic.APIStatusError):
+        return e.status_code in (408, 409, 429) or e.status_code >= 500
+    return False
+
+
+def is_overload(e: Exception) -> bool:
+    return isinstance(e, anthropic.APIStatusError) and e.status_code == 529
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RetryPolicy:
+    """Retry settings plus the model to switch to when overload persists (None to never switch)."""
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 fallback_model: str = None, fallback_after: int = 2):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.fallback_model = fallback_model
+        self.fallback_after = fallback_after
+
+
+class _Attempts:
+    """Retry bookkeeping for one ``call_with_retries`` call."""
+
+    def __init__(self, limiter: RateLimiter, policy: RetryPolicy, model: str):
+        self.limiter = limiter
+        self.policy = policy
+        self.model = model
+        self.attempt = 0
+        self.overloads = 0
+        if policy.fallback_model and limiter.overloaded():
+            self.switch_model("sustained_overload")
+
+    def switch_model(self, reason: str):
+        if self.model != self.policy.fallback_model:
+            telemetry.increment("model_fallbacks_total", model=self.model, fallback=self.policy.fallback_model,
+                                reason=reason)
+            self.model = self.policy.fallback_model
+
+    def delay_after(self, e: Exception) -> float:
+        """Seconds to wait before the next attempt; re-raises once retries are used up."""
+        if not is_retryable(e) or self.attempt >= self.policy.max_retries:
+            raise e
+        telemetry.increment("api_retries_total", code=telemetry.error_code(e), model=self.model)
+        delay = backoff_delay(self.attempt, self.policy.base_delay, self.policy.max_delay)
+        retry_after = retry_after_seconds(e)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.policy.max_delay))
+            if isinstance(e, anthropic.RateLimitError):
+                self.limiter.block_for(delay)
+        if is_overload(e):
+            self.overloads += 1
+            self.limiter.record_overload()
+            if self.policy.fallback_model and self.overloads >= self.policy.fallback_after:
+                self.switch_model("overloaded")
+        self.attempt += 1
+        return delay
+
+
+def call_with_retries(call, model: str, estimated_tokens: int, limiter: RateLimiter, policy: RetryPolicy):
+    """Run ``call(model)`` under the rate limiter, retrying transient failures.
+
+    ``call`` returns (result, actual input tokens); returns (result, model used).
+    """
+    attempts = _Attempts(limiter, policy, model)
+    while True:
+        limiter.acquire(estimated_tokens)
+        try:
+            # The slot is released before any backoff sleep
+            with limiter.slot():
+                result, actual_tokens = call(attempts.model)
+        except Exception as e:
+            time.sleep(attempts.delay_after(e))
+            continue
+        limiter.settle(estimated_tokens, actual_tokens)
+        return result, attempts.model
+
@@ -0,0 +1,130 @@
+"""Process-wide, long-lived API clients.
+
+Clients are created lazily on first use and then shared by every session and
+worker thread, so their connection pools, discovery documents and OAuth tokens
+are reused instead of being rebuilt for each call. Google access tokens are
+refreshed lazily by google-auth when a request finds them expired.
+"""
+import threading
+import weakref
+
+import anthropic
+import google_auth_httplib2
+import httplib2
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+
+DRIVE_SCOPES = ("https://www.googleapis.com/auth/drive",)
+SHEETS_SCOPES = (
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+)
+
+_lock = threading.RLock()
+_anthropic_clients = {}
+_credentials = {}
+_drive_services = {}
+_gspread_clients = {}
+_worksheets = {}
+_thread_local = threading.local()
+
+
+def get_anthropic_client(api_key: str) -> anthropic.Anthropic:
+    """Return the shared Anthropic client for an API key."""
+    with _lock:
+        client = _anthropic_clients.get(api_key)
+        if client is None:
+            # Retries are handled by rate_limit so they share the process-wide limits
+            client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+            _anthropic_clients[api_key] = client
+        return client
+
+
+def get_credentials(service_account_info, scopes=DRIVE_SCOPES):
+    """Return shared service-account credentials for the given scopes."""
+    info = dict(service_account_info)
+    key = (info.get("client_email"), tuple(scopes))
+    with _lock:
+        credentials = _credentials.get(key)
+        if credentials is None:
+            credentials = service_account.Credentials.from_service_account_info(info, scopes=list(scopes))
+            _credentials[key] = credentials
+        return credentials
+
+
+def _thread_http(credentials):
+    """Return this thread's authorized HTTP connection for the credentials.
+
+    httplib2 connections are not thread-safe, so each worker thread keeps its
+    own (and reuses it across requests) while sharing the credentials.
+    """
+    pool = getattr(_thread_local, "http", None)
+    if pool is None:
+        pool = _thread_local.http = weakref.WeakKeyDictionary()
+    http = pool.get(credentials)
+    if http is None:
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+        pool[credentials] = http
+    return http
+
+
+def get_drive_service(service_account_info):
+    """Return the shared Drive v3 service.
+
+    The service is built once from the bundled discovery document; each request
+    executes over the calling thread's own authorized connection.
+    """
+    credentials = get_credentials(service_account_info, DRIVE_SCOPES)
+    key = id(credentials)
+    with _lock:
+        service = _drive_services.get(key)
+        if service is None:
+            def request_builder(http, *args, **kwargs):
+                return HttpRequest(_thread_http(credentials), *args, **kwargs)
+
+            service = build(
+                "drive", "v3",
+                http=_thread_http(credentials),
+                requestBuilder=request_builder,
+                cache_discovery=False,
+                static_discovery=True,
+            )
+            _drive_services[key] = service
+        return service
+
+
+def get_gspread_client(service_account_info):
+    """Return the shared, authorized gspread client."""
+    import gspread
+
+    credentials = get_credentials(service_account_info, SHEETS_SCOPES)
+    key = id(credentials)
+    with _lock:
+        client = _gspread_clients.get(key)
+        if client is None:
+            client = gspread.authorize(credentials)
+            _gspread_clients[key] = client
+        return client
+
+
+def get_worksheet(service_account_info, spreadsheet_id: str, index: int = 0):
+    """Return a shared handle to a worksheet, opening the spreadsheet only once."""
+    client = get_gspread_client(service_account_info)
+    key = (id(client), spreadsheet_id, index)
+    with _lock:
+        worksheet = _worksheets.get(key)
+        if worksheet is None:
+            worksheet = client.open_by_key(spreadsheet_id).get_worksheet(index)
+            _worksheets[key] = worksheet
+        return worksheet
+
+
+def reset():
+    """Drop every cached client (e.g. after rotating credentials)."""
+    with _lock:
+        _anthropic_clients.clear()
+        _credentials.clear()
+        _drive_services.clear()
+        _gspread_clients.clear()
+        _worksheets.clear()
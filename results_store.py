@@ -0,0 +1,279 @@
+"""Local, indexed store of every processed transcript.
+
+Each transcript is saved as normalized rows: one in ``transcripts`` (keyed by
+the PDF's SHA-256), one per term and one per course. Queries across
+transcripts, such as who took a course or a course's grade distribution,
+are then indexed SQLite lookups instead of a scan over sheet cells.
+
+Usage:
+    python results_store.py --course MATH5001
+    python results_store.py --grades MATH5001
+    python results_store.py --export courses.csv   # or .json / .parquet
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from gpa import flatten_courses, score_courses, term_summary
+
+COURSE_EXPORT_QUERY = """
+    SELECT t.file_hash, t.filename, t.file_url, tm.term, tm.year, tm.term_gpa, tm.cumulative_gpa,
+           c.course_code, c.division, c.title, c.short_title, c.credits, c.grade, c.points, c.grade_value
+    FROM courses c
+    JOIN terms tm ON tm.id = c.term_id
+    JOIN transcripts t ON t.id = c.transcript_id
+"""
+# Calendar order of terms within a year, for ordering terms across transcripts
+SEASON_RANK_SQL = (
+    "CASE lower(tm.term) WHEN 'winter' THEN 0 WHEN 'spring' THEN 1 WHEN 'summer' THEN 2 "
+    "WHEN 'fall' THEN 3 WHEN 'autumn' THEN 3 ELSE 4 END"
+)
+
+
+def normalize_code(course_code) -> str:
+    """Course code for matching: upper case without spaces, hyphens or dots ("Math 5001" -> "MATH5001")."""
+    return re.sub(r"[\s\-.]", "", str(course_code or "")).upper()
+
+
+def _number(value):
+    number = pd.to_numeric(value, errors="coerce")
+    return None if pd.isna(number) else float(number)
+
+
+class ResultsStore:
+    """SQLite store of transcripts, terms and courses with indexed queries."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS transcripts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_hash TEXT NOT NULL UNIQUE,
+                filename TEXT,
+                file_url TEXT,
+                comment TEXT,
+                method TEXT,
+                json_data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS terms (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                transcript_id INTEGER NOT NULL REFERENCES transcripts(id) ON DELETE CASCADE,
+                term_index INTEGER NOT NULL,
+                term TEXT NOT NULL,
+                year TEXT NOT NULL,
+                term_gpa REAL,
+                cumulative_gpa REAL,
+                earned_credits REAL
+            );
+            CREATE TABLE IF NOT EXISTS courses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                transcript_id INTEGER NOT NULL REFERENCES transcripts(id) ON DELETE CASCADE,
+                term_id INTEGER NOT NULL REFERENCES terms(id) ON DELETE CASCADE,
+                course_index INTEGER NOT NULL,
+                course_code TEXT NOT NULL,
+                code_key TEXT NOT NULL,
+                division TEXT,
+                title TEXT,
+                short_title TEXT,
+                credits REAL,
+                grade TEXT,
+                points TEXT,
+                grade_value REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_courses_code_grade ON courses(code_key, grade);
+            CREATE INDEX IF NOT EXISTS idx_courses_grade ON courses(grade);
+            CREATE INDEX IF NOT EXISTS idx_courses_transcript ON courses(transcript_id);
+            CREATE INDEX IF NOT EXISTS idx_courses_term ON courses(term_id);
+            DROP INDEX IF EXISTS idx_terms_year_term;
+            CREATE INDEX IF NOT EXISTS idx_terms_year_term_nocase ON terms(year, term COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS idx_terms_transcript ON terms(transcript_id);
+            """
+        )
+        self._conn.commit()
+
+    def record(self, file_hash: str, json_data, filename: str = None, method: str = None,
+               scale: str = "default") -> int:
+        """Save (or replace) a transcript's terms and courses, with GPAs on ``scale``; return its id."""
+        scored = score_courses(flatten_courses(json_data), scale)
+        summary = term_summary(scored).set_index("term_index")
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO transcripts (file_hash, filename, method, json_data, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(file_hash) DO UPDATE SET filename = COALESCE(excluded.filename, filename), "
+                "method = excluded.method, json_data = excluded.json_data, updated_at = excluded.updated_at",
+                (file_hash, filename, method, json.dumps(json_data), now, now),
+            )
+            transcript_id = self._conn.execute(
+                "SELECT id FROM transcripts WHERE file_hash = ?", (file_hash,)
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM terms WHERE transcript_id = ?", (transcript_id,))
+            term_ids = {}
+            for term_index, term_data in enumerate(json_data or []):
+                totals = summary.loc[term_index] if term_index in summary.index else None
+                cursor = self._conn.execute(
+                    "INSERT INTO terms (transcript_id, term_index, term, year, term_gpa, cumulative_gpa, "
+                    "earned_credits) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        transcript_id, term_index, str(term_data.get("term", "")), str(term_data.get("year", "")),
+                        None if totals is None else _number(totals["term_gpa"]),
+                        None if totals is None else _number(totals["cumulative_gpa"]),
+                        None if totals is None else _number(totals["earned_credits"]),
+                    ),
+                )
+                term_ids[term_index] = cursor.lastrowid
+            grade_values = {
+                (term_index, course_index): _number(value)
+                for term_index, course_index, value in scored[["term_index", "course_index", "grade_value"]]
+                .itertuples(index=False)
+            }
+            self._conn.executemany(
+                "INSERT INTO courses (transcript_id, term_id, course_index, course_code, code_key, division, title, "
+                "short_title, credits, grade, points, grade_value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        transcript_id, term_ids[term_index], course_index, str(course.get("course_code", "")),
+                        normalize_code(course.get("course_code")), course.get("division", ""),
+                        course.get("title", ""), course.get("short_title", ""), _number(course.get("credits")),
+                        str(course.get("grade", "")).strip().upper(), str(course.get("points", "")),
+                        grade_values.get((term_index, course_index)),
+                    )
+                    for term_index, term_data in enumerate(json_data or [])
+                    for course_index, course in enumerate(term_data.get("courses", []))
+                ],
+            )
+        return transcript_id
+
+    def annotate(self, file_hash: str, file_url: str = None, comment: str = None):
+        """Attach the Drive URL and/or reviewer comment to a stored transcript."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE transcripts SET file_url = COALESCE(?, file_url), comment = COALESCE(?, comment), "
+                "updated_at = ? WHERE file_hash = ?",
+                (file_url, comment, time.time(), file_hash),
+            )
+
+    def get_transcript(self, file_hash: str):
+        """Return the stored transcript JSON for a PDF hash, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT json_data FROM transcripts WHERE file_hash = ?", (file_hash,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        """Run a read-only SQL query against the store and return a DataFrame."""
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=list(params))
+
+    def courses(self, course_code: str = None, term: str = None, year=None, grade: str = None,
+                file_hash: str = None, limit: int = None) -> pd.DataFrame:
+        """Course rows joined with their term and transcript, filtered on any indexed column."""
+        clauses, params = [], []
+        for column, value in (("c.code_key", normalize_code(course_code) if course_code else None),
+                              ("tm.term", term), ("tm.year", None if year is None else str(year)),
+                              ("c.grade", grade.strip().upper() if grade else None), ("t.file_hash", file_hash)):
+            if value is not None:
+                clauses.append(f"{column} = ? COLLATE NOCASE" if column == "tm.term" else f"{column} = ?")
+                params.append(value)
+        sql = COURSE_EXPORT_QUERY
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY t.id, tm.term_index, c.course_index"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self.query(sql, params)
+
+    def transcripts_with_course(self, course_code: str) -> pd.DataFrame:
+        """Every transcript that includes a course, with the term taken and grade."""
+        return self.query(
+            f"""
+            SELECT t.file_hash, t.filename, t.file_url, tm.term, tm.year, c.course_code, c.grade, c.credits
+            FROM courses c
+            JOIN terms tm ON tm.id = c.term_id
+            JOIN transcripts t ON t.id = c.transcript_id
+            WHERE c.code_key = ?
+            ORDER BY tm.year, {SEASON_RANK_SQL}, t.id, tm.term_index
+            """,
+            (normalize_code(course_code),),
+        )
+
+    def grade_distribution(self, course_code: str = None) -> pd.DataFrame:
+        """Count of each grade, for one course or per course across the store."""
+        if course_code:
+            return self.query(
+                "SELECT grade, COUNT(*) AS count FROM courses WHERE code_key = ? GROUP BY grade ORDER BY grade",
+                (normalize_code(course_code),),
+            )
+        return self.query(
+            "SELECT code_key AS course_code, grade, COUNT(*) AS count FROM courses "
+            "GROUP BY code_key, grade ORDER BY code_key, grade"
+        )
+
+    def export(self, path: str) -> int:
+        """Write every course row to .csv, .json or .parquet (by extension); return the row count."""
+        df = self.courses()
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".csv":
+            df.to_csv(path, index=False)
+        elif extension == ".json":
+            df.to_json(path, orient="records", indent=2)
+        elif extension == ".parquet":
+            # Needs pyarrow or fastparquet
+            df.to_parquet(path, index=False)
+        else:
+            raise ValueError(f"Unsupported export format: {extension or path}")
+        return len(df)
+
+    def stats(self) -> dict:
+        with self._lock:
+            transcripts, terms, courses = (
+                self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("transcripts", "terms", "courses")
+            )
+        return {"transcripts": transcripts, "terms": terms, "courses": courses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    from pipeline import RESULTS_DB_PATH
+
+    parser = argparse.ArgumentParser(description="Query the local transcript results store.")
+    parser.add_argument("--db", default=RESULTS_DB_PATH, help="Results database path")
+    parser.add_argument("--course", help="List transcripts that include this course code")
+    parser.add_argument("--grades", nargs="?", const="", help="Grade distribution (for one course if given)")
+    parser.add_argument("--export", help="Export all course rows to a .csv, .json or .parquet file")
+    args = parser.parse_args(argv)
+
+    store = ResultsStore(args.db)
+    if args.course:
+        print(store.transcripts_with_course(args.course).to_string(index=False))
+    elif args.grades is not None:
+        print(store.grade_distribution(args.grades or None).to_string(index=False))
+    elif args.export:
+        print(f"Exported {store.export(args.export)} course rows to {args.export}")
+    else:
+        print(json.dumps(store.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
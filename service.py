@@ -0,0 +1,281 @@
+"""HTTP API for transcript extraction.
+
+Usage:
+    python service.py [--host 127.0.0.1] [--port 8000] [--workers 4]
+
+Endpoints:
+    POST /extract?filename=NAME[&stream=true]   body: the PDF (Content-Type: application/pdf)
+    GET  /transcripts/{sha256}                  a stored result
+    POST /transcripts/{sha256}/annotations      {"comment": ..., "file_url": ...}
+    GET  /courses?course_code=&term=&year=&grade=&limit=
+    GET  /courses/{course_code}/grades
+    GET  /healthz, /metrics
+
+The service runs on a single host. Its worker processes keep per-process
+clients and share state through local SQLite files (extraction cache, course
+catalog, results store), which cannot be shared safely across machines; run
+one service per host rather than several behind a load balancer. With
+``stream=true`` the response is newline-delimited JSON events: ``progress``,
+one ``term`` per extracted term, then ``result`` or ``error``.
+
+TRANSCRIPTIQ_RATE_LIMIT_RPM/ITPM are the budget of the whole service: each
+worker gets an equal share. Each worker also saves its telemetry to
+TRANSCRIPTIQ_SERVICE_METRICS_DIR every few seconds, and /metrics reports
+the sum over all workers.
+"""
+import argparse
+import asyncio
+import contextlib
+import functools
+import glob
+import json
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from typing import Optional
+
+import anthropic
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from course_catalog import CourseCatalog
+from extraction_cache import ExtractionCache, sha256_hex
+from pipeline import (
+    CATALOG_PATH,
+    EXTRACTION_CACHE_MAX_BYTES,
+    EXTRACTION_CACHE_PATH,
+    EXTRACTION_CACHE_TTL_SECONDS,
+    MODEL,
+    PROMPT,
+    RATE_LIMIT_ITPM,
+    RATE_LIMIT_RPM,
+    RESULTS_DB_PATH,
+    ExtractionError,
+    describe_api_error,
+    extract_transcript,
+)
+from rate_limit import RateLimiter
+from results_store import ResultsStore
+import telemetry
+
+SERVICE_HOST = os.environ.get("TRANSCRIPTIQ_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("TRANSCRIPTIQ_SERVICE_PORT", 8000))
+SERVICE_WORKERS = int(os.environ.get("TRANSCRIPTIQ_SERVICE_WORKERS", os.cpu_count() or 1))
+MAX_PDF_BYTES = int(os.environ.get("TRANSCRIPTIQ_SERVICE_MAX_PDF_BYTES", 64 * 1024 * 1024))
+# Where workers save their telemetry for /metrics to add up, and how often
+METRICS_DIR = os.environ.get("TRANSCRIPTIQ_SERVICE_METRICS_DIR", ".cache/service-metrics")
+METRICS_WRITE_SECONDS = float(os.environ.get("TRANSCRIPTIQ_SERVICE_METRICS_SECONDS", 5))
+
+
+def write_worker_metrics():
+    """Save this worker's telemetry where the other workers can read it."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(telemetry.REGISTRY.dump(), f)
+    os.replace(f"{path}.tmp", path)
+
+
+def service_metrics():
+    """Telemetry of every worker (each as of its last save; this one's is current)."""
+    write_worker_metrics()
+    registry = telemetry.Telemetry()
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                registry.merge(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return registry
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    stop = threading.Event()
+
+    def save_periodically():
+        while not stop.wait(METRICS_WRITE_SECONDS):
+            write_worker_metrics()
+
+    threading.Thread(target=save_periodically, name="metrics-writer", daemon=True).start()
+    try:
+        yield
+    finally:
+        stop.set()
+        write_worker_metrics()
+
+
+app = FastAPI(title="TranscriptIQ extraction service", lifespan=lifespan)
+
+
+class Annotation(BaseModel):
+    comment: Optional[str] = None
+    file_url: Optional[str] = None
+
+
+@functools.lru_cache(maxsize=None)
+def get_resources():
+    """Per-process Claude client, rate limiter and local stores, created on first use in each worker."""
+    workers = max(1, SERVICE_WORKERS)
+    return SimpleNamespace(
+        client=anthropic.Anthropic(max_retries=0),
+        # This worker's share of the service-wide rate limits
+        limiter=RateLimiter(RATE_LIMIT_RPM / workers, RATE_LIMIT_ITPM / workers),
+        cache=ExtractionCache(
+            EXTRACTION_CACHE_PATH,
+            max_bytes=EXTRACTION_CACHE_MAX_BYTES,
+            ttl_seconds=EXTRACTION_CACHE_TTL_SECONDS,
+        ),
+        catalog=CourseCatalog(CATALOG_PATH),
+        results=ResultsStore(RESULTS_DB_PATH),
+    )
+
+
+def run_extraction(pdf_bytes: bytes, filename: str = None, progress=None, on_term=None) -> dict:
+    """Extract one PDF, record it in the results store and return the JSON-ready result."""
+    resources = get_resources()
+    result = extract_transcript(
+        resources.client, pdf_bytes, PROMPT, MODEL, cache=resources.cache, progress=progress,
+        on_term=on_term, catalog=resources.catalog, limiter=resources.limiter
+    )
+    digest = sha256_hex(pdf_bytes)
+    if result["json_data"]:
+        resources.results.record(digest, result["json_data"], filename, result["method"], result["scale"])
+    return {"sha256": digest, **result}
+
+
+def error_response(e: Exception):
+    """Return (HTTP status, body) for an extraction failure."""
+    if isinstance(e, ExtractionError):
+        return 422, {"error": str(e), "raw_response": e.raw_response}
+    if isinstance(e, anthropic.APIStatusError) and e.status_code in (429, 529):
+        return 503, {"error": describe_api_error(e)}
+    if isinstance(e, anthropic.APIError):
+        return 502, {"error": describe_api_error(e)}
+    return 500, {"error": describe_api_error(e)}
+
+
+async def read_pdf(request: Request):
+    """Return the request body as PDF bytes, or an error JSONResponse."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_PDF_BYTES:
+        return JSONResponse({"error": f"PDFs are limited to {MAX_PDF_BYTES / 1e6:.0f} MB."}, status_code=413)
+    pdf_bytes = await request.body()
+    if len(pdf_bytes) > MAX_PDF_BYTES:
+        return JSONResponse({"error": f"PDFs are limited to {MAX_PDF_BYTES / 1e6:.0f} MB."}, status_code=413)
+    if not pdf_bytes[:1024].lstrip().startswith(b"%PDF-"):
+        return JSONResponse({"error": "The request body is not a PDF."}, status_code=400)
+    return pdf_bytes
+
+
+async def stream_extraction(pdf_bytes: bytes, filename: str = None):
+    """Yield NDJSON progress, term and result (or error) events for one extraction."""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def work():
+        try:
+            result = run_extraction(
+                pdf_bytes, filename,
+                progress=lambda fraction, message: emit({"event": "progress", "fraction": fraction,
+                                                         "message": message}),
+                on_term=lambda term: emit({"event": "term", "term": term}),
+            )
+            emit({"event": "result", "result": result})
+        except Exception as e:
+            status, body = error_response(e)
+            emit({"event": "error", "status": status, **body})
+        finally:
+            emit(None)
+
+    # A client that disconnects does not cancel the work; its result is still cached and recorded
+    worker = asyncio.ensure_future(asyncio.to_thread(work))
+    while (event := await events.get()) is not None:
+        yield json.dumps(event) + "\n"
+    await worker
+
+
+@app.post("/extract")
+async def extract(request: Request, filename: Optional[str] = None, stream: bool = False):
+    pdf_bytes = await read_pdf(request)
+    if isinstance(pdf_bytes, JSONResponse):
+        return pdf_bytes
+    if stream:
+        return StreamingResponse(stream_extraction(pdf_bytes, filename), media_type="application/x-ndjson")
+    try:
+        return await asyncio.to_thread(run_extraction, pdf_bytes, filename)
+    except Exception as e:
+        status, body = error_response(e)
+        return JSONResponse(body, status_code=status)
+
+
+@app.get("/transcripts/{sha256}")
+def get_transcript(sha256: str):
+    json_data = get_resources().results.get_transcript(sha256)
+    if json_data is None:
+        return JSONResponse({"error": "No result is stored for this PDF."}, status_code=404)
+    return {"sha256": sha256, "json_data": json_data}
+
+
+@app.post("/transcripts/{sha256}/annotations")
+def annotate_transcript(sha256: str, annotation: Annotation):
+    get_resources().results.annotate(sha256, file_url=annotation.file_url, comment=annotation.comment)
+    return {"sha256": sha256}
+
+
+def _records(df):
+    # Round-trip through pandas' JSON writer so NaN becomes null
+    return json.loads(df.to_json(orient="records"))
+
+
+@app.get("/courses")
+def list_courses(course_code: Optional[str] = None, term: Optional[str] = None, year: Optional[str] = None,
+                 grade: Optional[str] = None, limit: int = 1000):
+    return _records(get_resources().results.courses(course_code, term, year, grade, limit=limit))
+
+
+@app.get("/courses/{course_code}/grades")
+def course_grades(course_code: str):
+    return _records(get_resources().results.grade_distribution(course_code))
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(service_metrics().render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the transcript extraction pipeline over HTTP.")
+    parser.add_argument("--host", default=SERVICE_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Worker processes")
+    args = parser.parse_args(argv)
+
+    if not os.environ.get("ANTHROPIC_API_KEY"):
+        parser.error("ANTHROPIC_API_KEY must be set")
+    import uvicorn
+
+    # Workers read the count to take their share of the rate limits
+    os.environ["TRANSCRIPTIQ_SERVICE_WORKERS"] = str(max(1, args.workers))
+    # Start the summed metrics from zero rather than from the previous run's workers
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        os.remove(path)
+    uvicorn.run(
+        "service:app", host=args.host, port=args.port, workers=max(1, args.workers),
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Client for the extraction service (service.py).
+
+The Streamlit app uses it instead of running the pipeline itself when
+TRANSCRIPTIQ_SERVICE_URL is set. Only the standard library is needed.
+"""
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from pipeline import ExtractionError
+
+
+class ServiceError(Exception):
+    """Raised when the extraction service fails or cannot be reached."""
+
+
+def _raise_for(body: dict, status: int):
+    if status == 422:
+        raise ExtractionError(body.get("error", "Could not extract data from the transcript."),
+                              raw_response=body.get("raw_response"))
+    raise ServiceError(body.get("error") or body.get("detail") or f"Extraction service returned HTTP {status}")
+
+
+def _call(request, timeout: float):
+    """Open a request, turning HTTP and connection errors into ServiceError/ExtractionError."""
+    try:
+        return urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        try:
+            body = json.load(e)
+        except ValueError:
+            body = {}
+        _raise_for(body, e.code)
+    except urllib.error.URLError as e:
+        raise ServiceError(f"Could not reach the extraction service: {e.reason}") from e
+
+
+def extract_remote(base_url: str, pdf_bytes, filename: str = None, progress=None, on_term=None,
+                   timeout: float = 600.0) -> dict:
+    """POST a PDF to /extract and return the same result dict as ``extract_transcript`` (plus ``sha256``).
+
+    With ``progress`` or ``on_term`` the response is streamed and they are
+    called as the service reports progress and extracted terms.
+    """
+    stream = bool(progress or on_term)
+    query = urllib.parse.urlencode({"filename": filename or "", "stream": "true" if stream else "false"})
+    request = urllib.request.Request(
+        f"{base_url.rstrip('/')}/extract?{query}", data=pdf_bytes,
+        headers={"Content-Type": "application/pdf"}, method="POST",
+    )
+    with _call(request, timeout) as response:
+        if not stream:
+            return json.load(response)
+        for line in response:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event["event"] == "progress" and progress:
+                progress(event["fraction"], event["message"])
+            elif event["event"] == "term" and on_term:
+                on_term(event["term"])
+            elif event["event"] == "result":
+                return event["result"]
+            elif event["event"] == "error":
+                _raise_for(event, event.get("status", 500))
+    raise ServiceError("The extraction service closed the connection before sending a result.")
+
+
+def annotate_remote(base_url: str, sha256: str, comment: str = None, file_url: str = None, timeout: float = 30.0):
+    """Attach a reviewer comment and/or Drive URL to a result stored by the service."""
+    request = urllib.request.Request(
+        f"{base_url.rstrip('/')}/transcripts/{urllib.parse.quote(sha256)}/annotations",
+        data=json.dumps({"comment": comment, "file_url": file_url}).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    with _call(request, timeout) as response:
+        return json.load(response)
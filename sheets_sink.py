@@ -0,0 +1,234 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import telemetry
+
+_UPDATED_RANGE_ROW = re.compile(r"![A-Z]+(\d+)")
+# Google Sheets rejects cells longer than this many characters
+SHEETS_CELL_LIMIT = 50000
+
+
+def sheet_row(file_url, json_data, comment, cell_limit: int = SHEETS_CELL_LIMIT) -> list:
+    """Build a [file_url, json, comment] row that fits the per-cell limit.
+
+    The JSON is written without whitespace. If it is still too long, the first
+    part stays in the JSON column and the rest continues in the columns after
+    the comment; joining those cells in order restores the JSON.
+    """
+    json_str = json.dumps(json_data, separators=(",", ":"))
+    parts = [json_str[i:i + cell_limit] for i in range(0, len(json_str), cell_limit)] or [""]
+    return [file_url, parts[0], comment] + parts[1:]
+
+
+def first_row_from_append(response) -> int:
+    """Return the first sheet row written by a values.append response, or None."""
+    updated_range = (response or {}).get("updates", {}).get("updatedRange", "")
+    match = _UPDATED_RANGE_ROW.search(updated_range)
+    return int(match.group(1)) if match else None
+
+
+class SheetsWriteBehind:
+    """Buffer rows for a worksheet and append them in batches from a background thread.
+
+    Rows are written to a local SQLite journal as soon as they are enqueued, so
+    nothing is lost if a flush fails or the process restarts; unwritten rows
+    are retried on the next flush. A flush happens as soon as ``max_batch`` rows
+    are pending and otherwise every ``flush_interval`` seconds, using a single
+    ``append_rows`` call per batch. Sheet row numbers come from the append
+    response, so the sheet is never read back.
+
+    After a failed append, rows are sent one at a time until one succeeds, so
+    a row the sheet keeps rejecting (e.g. an oversized cell) is isolated from
+    the rest. Once it has failed ``max_attempts`` times it is dead-lettered:
+    ``failed`` reports its error and later rows go through.
+    """
+
+    def __init__(self, worksheet_getter, journal_path: str, max_batch: int = 50, flush_interval: float = 5.0,
+                 max_retry_delay: float = 300.0, retention_seconds: float = 7 * 24 * 3600, max_attempts: int = 8):
+        self.worksheet_getter = worksheet_getter
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+        self.retention_seconds = retention_seconds
+        self.last_error = None
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+        self._conn = sqlite3.connect(journal_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sheet_rows (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                row_json TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                sheet_row INTEGER,
+                written_at REAL,
+                dedupe_key TEXT,
+                dead_at REAL
+            )
+            """
+        )
+        columns = [info[1] for info in self._conn.execute("PRAGMA table_info(sheet_rows)")]
+        if "dedupe_key" not in columns:
+            self._conn.execute("ALTER TABLE sheet_rows ADD COLUMN dedupe_key TEXT")
+        if "dead_at" not in columns:
+            self._conn.execute("ALTER TABLE sheet_rows ADD COLUMN dead_at REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sheet_rows_pending ON sheet_rows(written_at, id)")
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_sheet_rows_dedupe ON sheet_rows(dedupe_key)")
+        self._conn.commit()
+        self._thread = threading.Thread(target=self._run, name="sheets-write-behind", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, row, dedupe_key: str = None) -> int:
+        """Journal a row for appending and return its ticket id.
+
+        Enqueueing again with the same ``dedupe_key`` returns the original
+        ticket instead of adding a second row; a dead-lettered row is put back
+        in the queue.
+        """
+        with self._lock:
+            if dedupe_key is not None:
+                existing = self._conn.execute(
+                    "SELECT id FROM sheet_rows WHERE dedupe_key = ?", (dedupe_key,)
+                ).fetchone()
+                if existing:
+                    self._conn.execute(
+                        "UPDATE sheet_rows SET dead_at = NULL, attempts = 0 WHERE id = ? AND dead_at IS NOT NULL",
+                        (existing[0],),
+                    )
+                    self._conn.commit()
+                    return existing[0]
+            cursor = self._conn.execute(
+                "INSERT INTO sheet_rows (row_json, enqueued_at, dedupe_key) VALUES (?, ?, ?)",
+                (json.dumps(row), time.time(), dedupe_key),
+            )
+            self._conn.commit()
+            ticket = cursor.lastrowid
+            pending = self._pending_count()
+        if pending >= self.max_batch:
+            self._wakeup.set()
+        return ticket
+
+    def row_number(self, ticket: int):
+        """Return the sheet row a ticket was written to, or None while pending."""
+        with self._lock:
+            row = self._conn.execute("SELECT sheet_row FROM sheet_rows WHERE id = ?", (ticket,)).fetchone()
+        return row[0] if row else None
+
+    def written(self, ticket: int) -> bool:
+        """True once a ticket's row has been appended to the sheet."""
+        with self._lock:
+            row = self._conn.execute("SELECT written_at FROM sheet_rows WHERE id = ?", (ticket,)).fetchone()
+        return row is not None and row[0] is not None
+
+    def failed(self, ticket: int):
+        """Return the last error of a dead-lettered ticket, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_error FROM sheet_rows WHERE id = ? AND dead_at IS NOT NULL", (ticket,)
+            ).fetchone()
+        return (row[0] or "unknown error") if row else None
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._pending_count()
+
+    def _pending_count(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM sheet_rows WHERE written_at IS NULL AND dead_at IS NULL"
+        ).fetchone()[0]
+
+    def flush(self) -> int:
+        """Append up to ``max_batch`` pending rows now; return how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._conn.execute(
+                    "SELECT id, row_json FROM sheet_rows WHERE written_at IS NULL AND dead_at IS NULL "
+                    "ORDER BY id LIMIT ?",
+                    # Isolate the oldest row while appends are failing
+                    (1 if self._failures else self.max_batch,),
+                ).fetchall()
+            if not batch:
+                return 0
+            ids = [row_id for row_id, _ in batch]
+            placeholders = ",".join("?" * len(ids))
+            try:
+                with telemetry.stage("sheets_write"):
+                    worksheet = self.worksheet_getter()
+                    response = worksheet.append_rows([json.loads(row_json) for _, row_json in batch])
+                telemetry.increment("sheets_rows_written_total", len(batch))
+            except Exception as e:
+                self.last_error = str(e)
+                self._failures += 1
+                with self._lock:
+                    self._conn.execute(
+                        f"UPDATE sheet_rows SET attempts = attempts + 1, last_error = ? WHERE id IN ({placeholders})",
+                        [self.last_error, *ids],
+                    )
+                    if len(ids) == 1:
+                        cursor = self._conn.execute(
+                            "UPDATE sheet_rows SET dead_at = ? WHERE id = ? AND attempts >= ?",
+                            (time.time(), ids[0], self.max_attempts),
+                        )
+                        if cursor.rowcount:
+                            telemetry.increment("sheets_rows_dead_lettered_total")
+                    self._conn.commit()
+                raise
+            self.last_error = None
+            self._failures = 0
+            first_row = first_row_from_append(response)
+            now = time.time()
+            with self._lock:
+                for offset, row_id in enumerate(ids):
+                    sheet_row = first_row + offset if first_row is not None else None
+                    self._conn.execute(
+                        "UPDATE sheet_rows SET written_at = ?, sheet_row = ?, attempts = attempts + 1, last_error = NULL "
+                        "WHERE id = ?",
+                        (now, sheet_row, row_id),
+                    )
+                self._conn.execute(
+                    "DELETE FROM sheet_rows WHERE written_at IS NOT NULL AND written_at < ?",
+                    (now - self.retention_seconds,),
+                )
+                self._conn.commit()
+            return len(ids)
+
+    def _next_delay(self) -> float:
+        if self._failures:
+            return min(self.max_retry_delay, self.flush_interval * (2 ** self._failures))
+        return self.flush_interval
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self._next_delay())
+            self._wakeup.clear()
+            try:
+                # Keep draining while full batches are waiting
+                while self.flush() >= self.max_batch:
+                    pass
+            except Exception:
+                # Rows stay in the journal; retry after the backoff delay
+                pass
+
+    def close(self, flush: bool = True):
+        """Stop the background thread, optionally flushing what is pending."""
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        if flush:
+            try:
+                while self.flush():
+                    pass
+            except Exception:
+                pass
@@ -0,0 +1,288 @@
+"""Per-stage timing, token and cost metrics.
+
+Pipeline code wraps each stage in ``stage(name)``; every call records a
+latency observation (and an error count on failure) in the process-wide
+registry and emits one JSON log line on the ``transcriptiq.telemetry``
+logger. ``record_usage`` adds token counts and dollar cost per model. The
+registry renders as Prometheus text (``render_prometheus``) or a JSON
+snapshot with estimated percentiles (``snapshot``), and ``serve_metrics``
+exposes both over HTTP at /metrics and /metrics.json. ``dump`` and ``merge``
+combine the registries of several processes.
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from usage import compute_cost
+
+# Histogram bucket upper bounds in seconds, from fast local stages to long Claude calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+PREFIX = "transcriptiq"
+TOKEN_TYPES = {
+    "input_tokens": "input",
+    "output_tokens": "output",
+    "cache_creation_input_tokens": "cache_write",
+    "cache_read_input_tokens": "cache_read",
+}
+HELP = {
+    "stage_duration_seconds": ("histogram", "Time spent in each pipeline stage."),
+    "stage_errors_total": ("counter", "Stage failures by error code."),
+    "api_calls_total": ("counter", "Claude API calls that returned a message."),
+    "tokens_total": ("counter", "Claude tokens by type (cache_read are prompt-cache hits)."),
+    "cost_dollars_total": ("counter", "Claude spend in dollars."),
+    "cache_savings_dollars_total": ("counter", "Dollars saved by prompt caching."),
+    "extractions_total": ("counter", "Completed transcript extractions by method."),
+    "drive_dedup_hits_total": ("counter", "Drive uploads skipped because the content was already stored."),
+    "sheets_rows_written_total": ("counter", "Rows appended to the results sheet."),
+    "api_retries_total": ("counter", "Claude requests retried after a transient failure."),
+    "model_fallbacks_total": ("counter", "Requests moved to the fallback model during overload."),
+    "top_up_requests_total": ("counter", "Follow-up requests for terms missing from a response."),
+    "catalog_lookups_total": ("counter", "Extracted courses found (hit) or not found (miss) in the course catalog."),
+}
+
+logger = logging.getLogger("transcriptiq.telemetry")
+
+
+def error_code(e: Exception) -> str:
+    """Short label for an exception: the HTTP status if it has one, else its class name."""
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "resp", None), "status", None)
+    return str(status) if status else type(e).__name__
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float):
+        """Estimate a quantile by linear interpolation within its bucket (capped at the max seen)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return self.max
+                return min(self.max, lower + (self.buckets[index] - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+
+def _label_key(labels: dict):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = [*key, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Telemetry:
+    """Thread-safe registry of counters and latency histograms."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, stage_name: str, seconds: float, error=None, **labels):
+        """Record one stage duration; ``error`` is an error code for failed runs."""
+        key = ("stage_duration_seconds", _label_key({"stage": stage_name, **labels}))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        if error is not None:
+            self.increment("stage_errors_total", stage=stage_name, code=error, **labels)
+        if logger.isEnabledFor(logging.INFO):
+            event = {"event": "stage", "stage": stage_name, "seconds": round(seconds, 6),
+                     "status": "error" if error is not None else "ok", **labels}
+            if error is not None:
+                event["error_code"] = error
+            logger.info(json.dumps(event))
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        """Time the enclosed block as pipeline stage ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.observe(name, time.perf_counter() - start, error=error_code(e), **labels)
+            raise
+        self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_usage(self, usage: dict, model: str):
+        """Add one Claude call's tokens and cost."""
+        cost = compute_cost(usage)
+        self.increment("api_calls_total", model=model)
+        for field, token_type in TOKEN_TYPES.items():
+            self.increment("tokens_total", usage.get(field, 0), model=model, type=token_type)
+        self.increment("cost_dollars_total", cost["total_cost"], model=model)
+        self.increment("cache_savings_dollars_total", cost["cache_savings"], model=model)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({"event": "usage", "model": model, **usage,
+                                    "cost_dollars": round(cost["total_cost"], 8)}))
+
+    def snapshot(self) -> dict:
+        """Counters plus per-stage count, mean and p50/p95/p99 latency."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (h.count, h.sum, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99))
+                          for key, h in self._histograms.items()}
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+            "stages": [
+                {"labels": dict(labels), "count": count, "sum_seconds": total,
+                 "mean_seconds": total / count if count else None,
+                 "p50_seconds": p50, "p95_seconds": p95, "p99_seconds": p99}
+                for (_, labels), (count, total, p50, p95, p99) in sorted(histograms.items())
+            ],
+        }
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items()
+            )
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, text = HELP.get(name, ("untyped", name))
+                lines.append(f"# HELP {PREFIX}_{name} {text}")
+                lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                lines.append(f"{PREFIX}_{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{PREFIX}_{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{PREFIX}_{name}_count{_format_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{PREFIX}_{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self) -> dict:
+        """Raw counters and histograms as JSON-ready data, to ``merge`` into another registry."""
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [
+                    [name, list(labels), list(h.counts), h.sum, h.count, h.max]
+                    for (name, labels), h in self._histograms.items()
+                ],
+            }
+
+    def merge(self, state: dict):
+        """Add the counters and histograms of another registry's ``dump`` (e.g. another process's)."""
+        with self._lock:
+            for name, labels, value in state.get("counters", []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, labels, counts, total, count, maximum in state.get("histograms", []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(self.buckets)
+                if len(counts) != len(histogram.counts):
+                    # Recorded with different buckets
+                    continue
+                histogram.counts = [mine + theirs for mine, theirs in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+                histogram.max = max(histogram.max, maximum)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Process-wide registry used by the pipeline, UI and persistence workers
+REGISTRY = Telemetry()
+stage = REGISTRY.stage
+observe = REGISTRY.observe
+increment = REGISTRY.increment
+record_usage = REGISTRY.record_usage
+snapshot = REGISTRY.snapshot
+render_prometheus = REGISTRY.render_prometheus
+
+
+def configure_json_log(path: str = None):
+    """Write telemetry events as JSON lines to ``path`` (stderr when empty or "-")."""
+    handler = logging.StreamHandler(sys.stderr) if path in (None, "", "-") else logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return handler
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1", registry: Telemetry = REGISTRY):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body = registry.render_prometheus().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body = json.dumps(registry.snapshot()).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -2,17 +2,57 @@ import streamlit as st
 import os
 import json
 import pandas as pd
-import base64
-import anthropic
-import re
-from io import BytesIO
-import io
-import shutil
-import tempfile
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+import uuid
+from course_catalog import CourseCatalog
+from drive_upload import upload_pdf
+from extraction_cache import ExtractionCache, sha256_hex
+from gpa import flatten_courses, score_courses, term_summary
+from jobs import DONE, JobLimitError, JobManager
+from pipeline import (
+    CATALOG_PATH,
+    EXTRACTION_CACHE_MAX_BYTES,
+    EXTRACTION_CACHE_PATH,
+    EXTRACTION_CACHE_TTL_SECONDS,
+    MODEL,
+    PROMPT,
+    RESULTS_DB_PATH,
+    ExtractionError,
+    course_table,
+    describe_api_error,
+    extract_transcript,
+)
+from outbox import DELIVERED, FAILED, QUEUED, PersistenceOutbox
+from results_store import ResultsStore
+from service_client import ServiceError, annotate_remote, extract_remote
+from sheets_sink import SheetsWriteBehind, sheet_row
+import telemetry
+from resources import get_anthropic_client, get_drive_service, get_worksheet
+from upload_store import UploadQuotaError, UploadStore
+from usage import UsageTotals, format_token_usage
 SCOPES = ["https://www.googleapis.com/auth/drive"]
+DRIVE_FOLDER_ID = "1z_N8QcDkRLbMjqvDDZtO1UX3sxCzx2Os"
+SPREADSHEET_ID = "15HvKDTzxiXueIGluwMQPKcZvess7QYSzda2yWmTZiwI"
+# Sheet rows are journaled locally and appended in batches
+SHEETS_JOURNAL_PATH = os.environ.get("TRANSCRIPTIQ_SHEETS_JOURNAL_PATH", ".cache/sheets_journal.sqlite3")
+SHEETS_BATCH_SIZE = int(os.environ.get("TRANSCRIPTIQ_SHEETS_BATCH_SIZE", 50))
+SHEETS_FLUSH_INTERVAL = float(os.environ.get("TRANSCRIPTIQ_SHEETS_FLUSH_INTERVAL", 5.0))
+# Drive/Sheets persistence intents, delivered by a background worker
+OUTBOX_PATH = os.environ.get("TRANSCRIPTIQ_OUTBOX_PATH", ".cache/outbox.sqlite3")
+# Background extraction workers shared by all sessions, and per-session cap
+JOB_WORKERS = int(os.environ.get("TRANSCRIPTIQ_JOB_WORKERS", 4))
+JOBS_PER_SESSION = int(os.environ.get("TRANSCRIPTIQ_JOBS_PER_SESSION", 2))
+# Uploaded PDFs are shared by content hash; past the memory budget they spill to mmapped files
+UPLOAD_SPILL_DIR = os.environ.get("TRANSCRIPTIQ_UPLOAD_SPILL_DIR", ".cache/uploads")
+UPLOAD_MEMORY_BUDGET = int(os.environ.get("TRANSCRIPTIQ_UPLOAD_MEMORY_BUDGET", 256 * 1024 * 1024))
+UPLOAD_SESSION_QUOTA = int(os.environ.get("TRANSCRIPTIQ_UPLOAD_SESSION_QUOTA", 64 * 1024 * 1024))
+UPLOAD_MAX_TOTAL_BYTES = int(os.environ.get("TRANSCRIPTIQ_UPLOAD_MAX_TOTAL_BYTES", 4 * 1024 * 1024 * 1024))
+UPLOAD_IDLE_SECONDS = float(os.environ.get("TRANSCRIPTIQ_UPLOAD_IDLE_SECONDS", 3600))
+# Prometheus /metrics and /metrics.json endpoint (off unless a port is set) and JSON event log ("-" for stderr)
+METRICS_PORT = int(os.environ.get("TRANSCRIPTIQ_METRICS_PORT", 0))
+METRICS_HOST = os.environ.get("TRANSCRIPTIQ_METRICS_HOST", "127.0.0.1")
+TELEMETRY_LOG = os.environ.get("TRANSCRIPTIQ_TELEMETRY_LOG", "-")
+# Extraction service (service.py) to send transcripts to; empty runs the pipeline in this process
+SERVICE_URL = os.environ.get("TRANSCRIPTIQ_SERVICE_URL", "")
 
 def check_password():
     """Returns True if the user entered the correct password."""
@@ -34,149 +74,137 @@ def check_password():
     else:
         return True
 
-def grade_to_points(grade):
-    """Convert letter grade to numerical points."""
-    grade = grade.upper().strip()
-    # Handle plus/minus modifiers
-    base_grade = grade[0]
-    modifier = grade[1:] if len(grade) > 1 else ""
-    # Base grade values
-    grade_values = {
-        'A': 4.0,
-        'B': 3.0,
-        'C': 2.0,
-        'D': 1.0,
-        'F': 0.0
-    }
-    
-    # Get base value
-    if base_grade not in grade_values:
-        return None  # Handle non-standard grades like P, W, etc.
-    
-    base_value = grade_values[base_grade]
-    # Apply modifiers
-    if modifier == '+' and base_grade != 'A':  # A+ is still 4.0 at most schools
-        base_value += 0.3
-    elif modifier == '-':
-        base_value -= 0.3
-        
-    return base_value
-
-def analyze_pdf(pdf_data_bytes, user_prompt: str):
-    # Initialize Anthropic client - consider using st.secrets for API key in production
-    client = anthropic.Anthropic(api_key=st.secrets["anthropic_api_key"])
-    # Encode PDF data
-    pdf_data = base64.b64encode(pdf_data_bytes).decode("utf-8")
-    messages_payload = [
-        {
-            "role": "user",
-            "content": [
-                {
-                    "type": "document",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "application/pdf",
-                        "data": pdf_data
-                    }
-                },
-                {
-                    "type": "text",
-                    "text": user_prompt
-                }
-            ]
-        }
-    ]
+@st.cache_resource
+def get_cumulative_usage():
+    """Return token usage totals shared by all sessions of this server."""
+    return UsageTotals()
+
+def get_session_usage():
+    """Return token usage totals for the current Streamlit session."""
+    if "usage_totals" not in st.session_state:
+        st.session_state["usage_totals"] = UsageTotals()
+    return st.session_state["usage_totals"]
 
+@st.cache_resource
+def get_extraction_cache():
+    """Return the process-wide extraction cache shared by all sessions."""
+    return ExtractionCache(
+        EXTRACTION_CACHE_PATH,
+        max_bytes=EXTRACTION_CACHE_MAX_BYTES,
+        ttl_seconds=EXTRACTION_CACHE_TTL_SECONDS,
+    )
+
+@st.cache_resource
+def get_course_catalog():
+    """Return the process-wide course catalog shared by all sessions."""
+    return CourseCatalog(CATALOG_PATH)
+
+@st.cache_resource
+def get_results_store():
+    """Return the process-wide store of normalized transcript results."""
+    return ResultsStore(RESULTS_DB_PATH)
+
+@st.cache_resource
+def get_job_manager():
+    """Return the process-wide background job manager."""
+    return JobManager(max_workers=JOB_WORKERS, max_active_per_owner=JOBS_PER_SESSION)
+
+@st.cache_resource
+def start_telemetry():
+    """Start the JSON event log and the metrics endpoint once per server."""
+    telemetry.configure_json_log(TELEMETRY_LOG)
+    if not METRICS_PORT:
+        return None
     try:
-        with st.spinner("Analyzing transcript... This may take a moment."):
-            message = client.messages.create(
-                model="claude-3-7-sonnet-latest",
-                max_tokens=4000,
-                messages=messages_payload
-            )
+        return telemetry.serve_metrics(METRICS_PORT, METRICS_HOST)
+    except OSError:
+        # Port taken (e.g. another app process); the JSON log still records every stage
+        return None
 
-        # Calculate and display token usage
-        cache_creation_input_tokens = message.usage.cache_creation_input_tokens
-        cache_read_input_tokens = message.usage.cache_read_input_tokens
-        input_tokens = message.usage.input_tokens
-        output_tokens = message.usage.output_tokens
-        # Calculate pricing based on tokens usage (price per million tokens)
-        base_input_cost = input_tokens * 3.00 / 1e6
-        cache_writes_cost = cache_creation_input_tokens * 3.75 / 1e6
-        cache_hits_cost = cache_read_input_tokens * 0.30 / 1e6
-        output_cost = output_tokens * 15.00 / 1e6
-        total_cost = base_input_cost + cache_writes_cost + cache_hits_cost + output_cost
-
-        # Create token usage message for display in an expander
-        token_usage = f"""
-        **Tokens Used:** {input_tokens + output_tokens}
-        
-        **Pricing Breakdown:**
-        - Base Input Cost: ${base_input_cost:.6f}
-        - Cache Writes Cost: ${cache_writes_cost:.6f}
-        - Cache Hits Cost: ${cache_hits_cost:.6f}
-        - Output Cost: ${output_cost:.6f}
-        - **Total Cost:** ${total_cost:.6f}
-        """
-
-        return message.content[0].text, token_usage
-    
-    except anthropic.APIStatusError as e:
-        # Handle specific HTTP status codes
-        if e.status_code == 529:
-            st.error("⚠️ Claude is currently experiencing high demand. Please try again in a few minutes.")
-        elif e.status_code == 429:
-            st.error("⚠️ API rate limit exceeded. Please wait a moment before trying again.")
-        elif e.status_code >= 500:
-            st.error("⚠️ Claude service is temporarily unavailable. Please try again later.")
+@st.cache_resource
+def get_upload_store():
+    """Return the process-wide store of uploaded PDF bytes."""
+    return UploadStore(
+        UPLOAD_SPILL_DIR,
+        memory_budget=UPLOAD_MEMORY_BUDGET,
+        session_quota=UPLOAD_SESSION_QUOTA,
+        max_total_bytes=UPLOAD_MAX_TOTAL_BYTES,
+        idle_seconds=UPLOAD_IDLE_SECONDS,
+    )
+
+def store_upload(uploaded_file):
+    """Put an uploaded file in the shared store once and return its content hash."""
+    digests = st.session_state.setdefault("upload_digests", {})
+    file_id = getattr(uploaded_file, "file_id", None) or uploaded_file.name
+    digest = digests.get(file_id)
+    store = get_upload_store()
+    if digest is None or digest not in store:
+        digest = store.put(get_session_owner(), uploaded_file.getvalue())
+        digests[file_id] = digest
+    return digest
+
+def annotate_result(results, digest, comment=None, file_url=None):
+    """Attach a comment or Drive URL to the stored result, in ``results`` or (when None) through the service.
+
+    Takes the store rather than calling get_results_store so the outbox
+    worker thread can use it outside a Streamlit script run.
+    """
+    if results is not None:
+        results.annotate(digest, file_url=file_url, comment=comment)
+        return
+    try:
+        annotate_remote(SERVICE_URL, digest, comment=comment, file_url=file_url)
+    except (ServiceError, ExtractionError):
+        # The results store is best-effort; Drive and Sheets keep the feedback either way
+        pass
+
+def get_session_owner():
+    """Return a stable id for this session, used to bound its jobs."""
+    if "session_owner" not in st.session_state:
+        st.session_state["session_owner"] = uuid.uuid4().hex
+    return st.session_state["session_owner"]
+
+def run_extraction_job(job, pdf_bytes, api_key, cache, cumulative_usage, stream=True, results=None,
+                       pdf_digest=None, filename=None, catalog=None, service_url=None):
+    """Background job: extract transcript data. Must not call Streamlit APIs.
+
+    With ``service_url`` the extraction service runs the pipeline and records the result.
+    """
+    try:
+        if service_url:
+            result = extract_remote(
+                service_url, pdf_bytes, filename, progress=job.update, on_term=job.add_partial if stream else None
+            )
         else:
-            st.error(f"⚠️ API Error: {str(e)}")
-        return None, None
-        
-    except anthropic.APIConnectionError:
-        st.error("⚠️ Connection to Claude API failed. Please check your internet connection and try again.")
-        return None, None
-        
-    except anthropic.APITimeoutError:
-        st.error("⚠️ The request to Claude timed out. This PDF may be too complex or the service is busy. Please try again later.")
-        return None, None
-        
-    except anthropic.AuthenticationError:
-        st.error("⚠️ Authentication to Claude API failed. Please contact the administrator to check API credentials.")
-        return None, None
-        
+            result = extract_transcript(
+                get_anthropic_client(api_key), pdf_bytes, PROMPT, MODEL, cache=cache, progress=job.update,
+                on_term=job.add_partial if stream else None, catalog=catalog
+            )
+    except ExtractionError as e:
+        return {"json_data": None, "raw_response": e.raw_response, "error": str(e)}
+    except ServiceError as e:
+        raise RuntimeError(f"⚠️ {e}") from e
     except Exception as e:
-        st.error(f"⚠️ An unexpected error occurred: {str(e)}")
-        return None, None
-
-def extract_json(text):
-    match = re.search(r'```json\n(.*?)\n```', text, re.DOTALL)
-
-    if match:
-        json_str = match.group(1).strip()
-        try:
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            st.error("Failed to parse JSON output from Claude.")
-            return None
-    st.error("Could not find JSON data in Claude's response.")
-    return None
-
-def post_process_transcript_data(json_data):
-    """Post-process the JSON data to ensure credits are correctly calculated."""
-    for term in json_data:
-        for course in term.get("courses", []):
-            # If credits are missing but points and grade are available
-            if (not course.get("credits") or course["credits"] == "") and course.get("points") and course.get("grade"):
-                grade_value = grade_to_points(course["grade"])
-                if grade_value:  # Only calculate if we have a valid grade value
-                    try:
-                        points = float(course["points"])
-                        course["credits"] = round(points / grade_value, 1)
-                    except (ValueError, ZeroDivisionError):
-                        # Handle cases where conversion fails
-                        pass
-    return json_data
+        raise RuntimeError(describe_api_error(e)) from e
+    if result["usage"]:
+        cumulative_usage.add(result["usage"])
+    if results is not None and result["json_data"]:
+        results.record(pdf_digest or sha256_hex(pdf_bytes), result["json_data"], filename, result["method"],
+                       result["scale"])
+    return result
+
+@st.fragment(run_every=0.5)
+def show_job_progress(job_id):
+    """Poll a running job, render terms streamed so far, and rerun the app once it finishes."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return
+    if job.finished:
+        st.rerun()
+    snapshot = job.snapshot()
+    st.progress(snapshot["progress"], text=snapshot["message"])
+    for term_data in snapshot["partial"]:
+        display_term(term_data)
 
 def get_term_code(term):
     """Convert term name to code."""
@@ -196,31 +224,39 @@ def display_transcript_data(json_data):
         return
         
     for term_data in json_data:
-        term = term_data.get("term", "")
-        year = term_data.get("year", "")
-        term_code = get_term_code(term)
-        # Create header for each term
-        st.subheader(f"{term} - {year} [{term_code}]")
-        courses = term_data.get("courses", [])
-        if not courses:
-            st.write("No courses found for this term")
-            continue
-            
-        # Create DataFrame for this term's courses
-        df = pd.DataFrame([
-            {
-                "Course Code": course.get("course_code", ""),
-                "Division": course.get("division", ""),
-                "Title": course.get("title", ""),
-                "Short Title": course.get("short_title", ""),
-                "Credit": course.get("credits", ""),
-                "Grade": course.get("grade", "")
-            }
-            for course in courses
-        ])
+        display_term(term_data)
+
+def display_term(term_data):
+    """Display one term's courses as a table."""
+    term = term_data.get("term", "")
+    year = term_data.get("year", "")
+    term_code = get_term_code(term)
+    # Create header for each term
+    st.subheader(f"{term} - {year} [{term_code}]")
+    courses = term_data.get("courses", [])
+    if not courses:
+        st.write("No courses found for this term")
+        return
         
-        # Display the data as a table
-        st.table(df)
+    # Display this term's courses as a table
+    st.table(course_table(courses))
+
+def display_gpa_summary(json_data, scale: str = "default"):
+    """Display term and cumulative GPA and credit totals."""
+    summary = term_summary(score_courses(flatten_courses(json_data), scale))
+    if summary.empty:
+        return
+    st.subheader("GPA Summary")
+    st.table(summary.rename(columns={
+        "term": "Term",
+        "year": "Year",
+        "courses": "Courses",
+        "gpa_credits": "GPA Credits",
+        "earned_credits": "Earned Credits",
+        "term_gpa": "Term GPA",
+        "cumulative_earned_credits": "Cumulative Credits",
+        "cumulative_gpa": "Cumulative GPA",
+    })[["Term", "Year", "Courses", "GPA Credits", "Earned Credits", "Term GPA", "Cumulative Credits", "Cumulative GPA"]])
 
 def show_feedback_dialog():
     """Show feedback dialog and validate input."""
@@ -241,191 +277,167 @@ def show_feedback_dialog():
                 return True, feedback
     return False, None
 
-def save_pdf_to_drive(pdf_bytes: bytes, filename: str):
-    temp_file = None
-    temp_file_path = None
-    try:
-        # ==== CONFIGURATION ====
-        SCOPES = ['https://www.googleapis.com/auth/drive']
-        
-        # ==== AUTHENTICATION ====
-        credentials = service_account.Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"], scopes=SCOPES
+@st.cache_resource
+def get_sheets_sink():
+    """Return the process-wide write-behind sink for the results sheet."""
+    service_account_info = dict(st.secrets["gcp_service_account"])
+    return SheetsWriteBehind(
+        lambda: get_worksheet(service_account_info, SPREADSHEET_ID),
+        SHEETS_JOURNAL_PATH,
+        max_batch=SHEETS_BATCH_SIZE,
+        flush_interval=SHEETS_FLUSH_INTERVAL,
+    )
+
+@st.cache_resource
+def get_outbox():
+    """Return the process-wide persistence outbox and start its worker."""
+    service_account_info = dict(st.secrets["gcp_service_account"])
+    sink = get_sheets_sink()
+    # Resolved here, in the script run: the deliveries below run on the outbox's worker thread
+    results = None if SERVICE_URL else get_results_store()
+
+    def deliver_drive(filename, pdf_bytes):
+        file, _ = upload_pdf(get_drive_service(service_account_info), pdf_bytes, filename, DRIVE_FOLDER_ID)
+        annotate_result(results, sha256_hex(pdf_bytes), file_url=file.get("webViewLink"))
+        return file.get("webViewLink", "")
+
+    def deliver_sheet(key, file_url, json_data, comment):
+        return sink.enqueue(sheet_row(file_url, json_data, comment), dedupe_key=key)
+
+    return PersistenceOutbox(
+        OUTBOX_PATH, deliver_drive, deliver_sheet, sheet_written=sink.written, sheet_failed=sink.failed
+    )
+
+@st.fragment(run_every=2.0)
+def show_persistence_status(key):
+    """Show background Drive/Sheets delivery status for a submitted transcript."""
+    status = get_outbox().status(key)
+    if status is None:
+        return
+    if status["status"] == DELIVERED:
+        st.success("PDF and results were saved to Google Drive and Google Sheets.")
+        row_number = get_sheets_sink().row_number(status["sheet_ticket"])
+        if row_number:
+            st.write(f"Data saved to Google Sheet in row {row_number}")
+        if status["drive_url"]:
+            st.markdown(f"[View the file in Google Drive]({status['drive_url']})")
+        # Clear the status to avoid showing it repeatedly
+        st.session_state["outbox_key"] = None
+    elif status["status"] == FAILED:
+        st.error(f"Failed to save to Google Drive/Sheets: {status['last_error']}")
+        if st.button("Retry saving"):
+            get_outbox().retry(key)
+    elif status["status"] == QUEUED:
+        sink = get_sheets_sink()
+        message = (
+            "PDF saved to Google Drive; results are waiting to be written to Google Sheets "
+            f"({sink.pending_count()} rows pending)."
         )
-        drive_service = build('drive', 'v3', credentials=credentials)
+        if sink.last_error:
+            st.warning(f"{message} The last sheet write failed and will be retried: {sink.last_error}")
+        else:
+            st.info(message)
+    else:
+        message = "Saving to Google Drive and Google Sheets in the background..."
+        if status["last_error"]:
+            message += f" (retrying after: {status['last_error']})"
+        st.info(message)
 
-        # Create a temporary file with a unique name
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp:
-            temp.write(pdf_bytes)
-            temp_file_path = temp.name
-        
-        # ==== FILE METADATA ====
-        file_metadata = {
-            'name': filename,
-            'mimeType': 'application/pdf',
-            'parents': ['1z_N8QcDkRLbMjqvDDZtO1UX3sxCzx2Os']
+def display_stage_latency():
+    """Show per-stage latency percentiles recorded by this server."""
+    stages = telemetry.snapshot()["stages"]
+    if not stages:
+        return
+    st.markdown("**Pipeline stage latency (this server):**")
+    st.table(pd.DataFrame([
+        {
+            "Stage": stage["labels"]["stage"],
+            "Calls": stage["count"],
+            "Mean (s)": round(stage["mean_seconds"], 3),
+            "p50 (s)": round(stage["p50_seconds"], 3),
+            "p95 (s)": round(stage["p95_seconds"], 3),
         }
-        
-        # ==== FILE UPLOAD ====
-        media = MediaFileUpload(temp_file_path, mimetype='application/pdf', resumable=True)
-        
-        file = drive_service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields="id, name, webViewLink",
-            supportsAllDrives=True
-        ).execute()
-        
-        # Get the web view link (URL)
-        file_url = file.get('webViewLink', '')
-        
-        # Give the system a moment before trying to delete the file
-        import time
-        time.sleep(0.5)
-        
-        return True, f"PDF uploaded successfully: {file.get('name')}", file_url
-    
-    except Exception as e:
-        return False, f"Failed to save PDF to Google Drive: {str(e)}"
-    
-    finally:
-        # Clean up in finally block to ensure it runs even if there's an exception
-        if temp_file and os.path.exists(temp_file_path):
-            try:
-                # Try to close and delete the file
-                os.close(os.open(temp_file_path, os.O_RDONLY))
-                os.remove(temp_file_path)
-            except Exception as e:
-                # If deletion fails, log it but don't fail the whole operation
-                print(f"Warning: Could not delete temporary file: {str(e)}")
-                
-def save_to_google_sheet(file_url, json_data, user_comment):
-    try:
-        # Import gspread
-        import gspread
-        # Log debugging information
-        st.write(f"File URL: {file_url}")
-        st.write(f"JSON data type: {type(json_data)}")
-        st.write(f"User comment length: {len(user_comment)}")
-        # Use service account info from secrets
-        credentials = service_account.Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=[
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive'
-            ]
-        )
-        # Create gspread client
-        gc = gspread.authorize(credentials)
-        # Open the spreadsheet by ID
-        spreadsheet_id = "15HvKDTzxiXueIGluwMQPKcZvess7QYSzda2yWmTZiwI"
-        sheet = gc.open_by_key(spreadsheet_id).sheet1  # Using the first sheet
-        # Convert JSON data to string
-        json_str = json.dumps(json_data)
-        # Prepare row data
-        row_data = [file_url, json_str, user_comment]
-        # Append the row to the sheet
-        sheet.append_row(row_data)
-        # Get the row number that was just added
-        next_row = len(sheet.get_all_values())
-        return True, f"Data saved to Google Sheet in row {next_row}"
-    
-    except Exception as e:
-        return False, f"Failed to save to Google Sheet: {str(e)}"
-                    
-# Prompt template for Claude
-PROMPT = """
-# Transcript Data Extraction Prompt
-
-## **Objective**
-Extract the following information from the provided PDF transcript file.
-
-## **Instructions**
-
-### **Step 1: Check for a "Transcript Explanation" Page**
-- If the document contains a "Transcript Explanation" page, refer to it before extracting any data.
-- Use this page to correctly interpret the structure, grading system, and any special formatting rules in the transcript.
-
-### **Step 2: Check for sections titled "TRANSFER CREDIT ACCEPTED BY THE INSTITUTION", "Transfer Coursework", "Transfer Credit", "Transferred Courses", or any similar wording that indicates transfer credits**.
-- These are NOT part of the student's earned credits at this institution and must not be included in the extracted data.
-- Do not extract courses from these sections even if they look like normal course listings.
-- Only extract courses that were taken and completed **at the issuing institution**.
-
-### **Step 3: Extract the Required Information**
-For each term, extract the following details:
-
-- **Term:** Identify the academic term (Fall, Summer, Spring).
-- **Year:** Extract the 4-digit academic year.
-- **Courses:** A list of courses within that term, with the following attributes:
-  - **Course Code:** Extract exactly as shown under "COURSE."
-  - **Division:** Determine the division based on the first digit(s) of the "Course Code":
-    - **0xxx - 4xxx** → **UNDG (Undergraduate)**
-    - **5xxx - 6xxx** → **GRAD (Graduate)**
-  - **Title:** Extract exactly as shown under "COURSE TITLE."
-  - **Short Title:** Provide a shortened version of the course title.
-            - If the full title is already under 40 characters, use it as is.
-            - If it's longer, create a meaningful short version (<= 40 characters) while preserving essential context.
-  - **Credits:** 
-            - If "CRED" or "CREDIT" column exists, extract directly from there.
-            - If missing, calculate credits by dividing "GRADE POINTS" or "POINTS" by the numerical value of the grade.
-            - Example: If Points = 12 and Grade = A (4.0), then Credits = 12/4 = 3.
-  - **Grade:** Extract what is listed under "GRADE."
-  - **Points:** Extract what is listed under "GRADE POINTS" or "POINTS" if available.
-
-### **Step 4: Output Format**
-Return the extracted data in the following **JSON structure**:
-
-```json
-[
-  {
-    "term": "Fall",
-    "year": "2023",
-    "courses": [
-      {
-        "course_code": "CS101",
-        "division": "UNDG",
-        "title": "Real-Time Text and voice output enabled traffic sign detection system using deep learning",
-        "short_title: "Real-Time Traffic Sign Detection",
-        "credits": 3,
-        "grade": "A"
-      },
-      {
-        "course_code": "MATH202",
-        "division": "UNDG",
-        "title": "Calculus II",
-        "short_title": "Calculus II",
-        "credit_hours": 4,
-        "grade": "B+"
-      }
-    ]
-  },
-  {
-    "term": "Spring",
-    "year": "2024",
-    "courses": [
-      {
-        "course_code": "MATH5001",
-        "division": "GRAD",
-        "title": "Advanced Calculus",
-        "short_title": "Advanced Calculus",
-        "credits": 4,
-        "grade": "A-"
-      }
-    ]
-  }
-]
-
-## **Additional Considerations**
-- If "CRED" is missing, calculate credits using: CRED = Points/Grade where grade values are A=4.0, B=3.0, C=2.0, D=1.0, F=0.0
-- Plus/minus modifiers adjust by 0.3 (e.g., A- = 3.7, B+ = 3.3)
-- Ensure that each course is correctly associated with its respective term and year.
-- Make sure to extract and include the "points" field in the output as it's needed for credit calculation.
-- If any required information is missing from a course, leave the value as an empty string ("") rather than omitting the field.
-"""
+        for stage in stages
+    ]))
+
+def show_job_result(snapshot):
+    """Display a finished extraction job and prompt for feedback."""
+    if snapshot["status"] != DONE:
+        st.error(snapshot["error"] or "Processing was cancelled.")
+        return
+    result = snapshot["result"]
+    json_data = result["json_data"]
+    if not json_data:
+        st.error(result.get("error", "Could not find JSON data in Claude's response."))
+        st.error("Failed to extract data from the transcript.")
+        st.write("Raw response from Claude:")
+        st.text(result.get("raw_response"))
+        return
+
+    file_name = st.session_state.get("job_file_name") or "transcript.pdf"
+    st.session_state["pdf_digest"] = st.session_state.get("job_pdf_digest")
+    st.session_state["uploaded_file_name"] = file_name
+    st.session_state["json_data"] = json_data
+    st.session_state["transcript_key"] = f"{snapshot['owner']}:{snapshot['id']}"
+    if result["cached"]:
+        token_usage = "**Served from extraction cache** - no API tokens used."
+    elif result["usage"] is None:
+        token_usage = f"**{result['raw_response']}** - no API tokens used."
+    else:
+        session_usage = get_session_usage()
+        session_usage.add(result["usage"])
+        token_usage = format_token_usage(result["usage"], session_usage, get_cumulative_usage())
+
+    # Display the data
+    st.success("Transcript processed successfully!")
+    if result.get("missing"):
+        st.warning("Some terms could not be extracted and are missing below: " + ", ".join(result["missing"]))
+    # Add download button for JSON
+    st.download_button(
+        label="Download JSON Data",
+        data=json.dumps(json_data, indent=4),
+        file_name=f"{file_name.split('.')[0]}_processed.json",
+        mime="application/json"
+    )
+
+    # Display token usage details in an expander
+    with st.expander("API Token Usage Details"):
+        st.markdown(token_usage)
+        if not SERVICE_URL:
+            # With the extraction service these live (and are reported) in its workers
+            stats = get_extraction_cache().stats()
+            st.markdown(
+                f"**Extraction cache:** {stats['hits']} hits / {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries"
+            )
+            catalog_stats = get_course_catalog().stats()
+            st.markdown(
+                f"**Course catalog:** {catalog_stats['hits']} of {catalog_stats['hits'] + catalog_stats['misses']} "
+                f"courses known ({catalog_stats['hit_rate']:.0%} hit rate), {catalog_stats['entries']} entries"
+            )
+            display_stage_latency()
+
+    # Display the transcript data in tables
+    with telemetry.stage("render"):
+        display_transcript_data(json_data)
+        display_gpa_summary(json_data, result.get("scale") or "default")
+    # Show raw JSON in an expander
+    with st.expander("View Raw JSON Data"):
+        st.json(json_data)
+
+    # Set the state to show that a PDF has been processed
+    st.session_state["pdf_processed"] = True
+    st.session_state["feedback_submitted"] = False
+    # Show feedback dialog after displaying results
+    st.markdown("---")
+    show_feedback_dialog()
+
 # Streamlit app
 def main():
     st.set_page_config(page_title="Transcript Analyzer", layout="wide")
     st.title("🔍 Academic Transcript Analyzer")
+    start_telemetry()
+    get_upload_store().touch(get_session_owner())
     
     # Initialize session state variables if they don't exist
     if "pdf_processed" not in st.session_state:
@@ -434,10 +446,10 @@ def main():
         st.session_state["feedback_submitted"] = False
     if "uploaded_file_name" not in st.session_state:
         st.session_state["uploaded_file_name"] = None
-    if "pdf_bytes" not in st.session_state:
-        st.session_state["pdf_bytes"] = None
-    if "drive_upload_status" not in st.session_state:
-        st.session_state["drive_upload_status"] = None
+    if "pdf_digest" not in st.session_state:
+        st.session_state["pdf_digest"] = None
+    if "outbox_key" not in st.session_state:
+        st.session_state["outbox_key"] = None
     
     # Step 1: Ask for password
     if not check_password():
@@ -451,93 +463,79 @@ def main():
         feedback_submitted, feedback_text = show_feedback_dialog()
         if feedback_submitted:
             st.session_state["feedback_submitted"] = True
-            # After feedback is submitted, save the PDF to Google Drive
-        if st.session_state.get("pdf_bytes") and st.session_state.get("uploaded_file_name"):
-            success, message,file_url = save_pdf_to_drive(
-                st.session_state["pdf_bytes"], 
-                st.session_state["uploaded_file_name"]
-            )
-            
-            if success:
-                st.session_state["drive_upload_status"] = "success"
-                st.success(f"PDF successfully saved to Google Drive!")
-                sheet_success = False
-                sheet_message = ""
-                
-                if "json_data" in st.session_state and file_url:
-                    st.write("Attempting to save data to Google Sheet...")
-                    sheet_success, sheet_message = save_to_google_sheet(
-                        file_url, 
-                        st.session_state["json_data"], 
-                        feedback_text
-                    )
-                    
-                if sheet_success:
-                    st.success(sheet_message)
-                else:
-                    st.error(sheet_message)
-                    st.error("Failed to save data to Google Sheet. Please check the logs for details.")
-                if file_url:
-                    st.markdown(f"[View the file in Google Drive]({file_url})")
-            else:
-                st.session_state["drive_upload_status"] = "error"
-                st.error(f"Failed to save PDF to Google Drive: {message}")
+            # After feedback is submitted, record the Drive/Sheets save once; the outbox
+            # worker delivers it in the background so the page never waits on Google APIs
+            if st.session_state.get("pdf_digest") and st.session_state.get("uploaded_file_name"):
+                key = st.session_state["transcript_key"]
+                try:
+                    pdf_view = get_upload_store().view(st.session_state["pdf_digest"], get_session_owner())
+                except KeyError:
+                    st.error("The uploaded PDF has expired from the server. Please upload it again to save it.")
+                    st.stop()
+                annotate_result(None if SERVICE_URL else get_results_store(), st.session_state["pdf_digest"],
+                                comment=feedback_text)
+                get_outbox().record(
+                    key,
+                    st.session_state["uploaded_file_name"],
+                    pdf_view,
+                    st.session_state["json_data"],
+                    feedback_text
+                )
+                st.session_state["outbox_key"] = key
+            st.rerun()
     else:
-        # Show upload status from previous submission if available
-        if st.session_state.get("drive_upload_status") == "success":
-            st.success("Previous PDF was successfully saved to Google Drive.")
-            # Clear the status to avoid showing it repeatedly
-            st.session_state["drive_upload_status"] = None
+        # Show save status from previous submission if available
+        if st.session_state.get("outbox_key"):
+            show_persistence_status(st.session_state["outbox_key"])
         
         st.write("Upload a PDF transcript to extract course information.")
         uploaded_file = st.file_uploader("Choose a transcript PDF file", type="pdf")
         
         if uploaded_file is not None:
-            # Save uploaded file contents to session state
-            pdf_bytes = uploaded_file.getvalue()
-            st.session_state["pdf_bytes"] = pdf_bytes
+            # Keep only the content hash in session state; the bytes live in the shared upload store
+            try:
+                pdf_digest = store_upload(uploaded_file)
+            except UploadQuotaError as e:
+                st.error(str(e))
+                st.stop()
+            st.session_state["pdf_digest"] = pdf_digest
             st.session_state["uploaded_file_name"] = uploaded_file.name
             
-            # Process the transcript
+            stream_results = st.toggle("Show terms as they are extracted", value=True)
+            # Process the transcript in the background so reruns don't lose the work
             if st.button("Process Transcript"):
-                # Call Claude API to analyze the PDF
-                claude_response, token_usage = analyze_pdf(pdf_bytes, PROMPT)
-                # Extract JSON from Claude's response
-                json_data = extract_json(claude_response)
-                # Post-process the data
-                if json_data:
-                    json_data = post_process_transcript_data(json_data)
-                    st.session_state["json_data"] = json_data
-                    # Display the data
-                    st.success("Transcript processed successfully!")
-                    # Add download button for JSON
-                    st.download_button(
-                        label="Download JSON Data",
-                        data=json.dumps(json_data, indent=4),
-                        file_name=f"{uploaded_file.name.split('.')[0]}_processed.json",
-                        mime="application/json"
+                try:
+                    st.session_state["active_job_id"] = get_job_manager().submit(
+                        get_session_owner(),
+                        run_extraction_job,
+                        get_upload_store().view(pdf_digest, get_session_owner()),
+                        None if SERVICE_URL else st.secrets["anthropic_api_key"],
+                        None if SERVICE_URL else get_extraction_cache(),
+                        get_cumulative_usage(),
+                        stream=stream_results,
+                        results=None if SERVICE_URL else get_results_store(),
+                        pdf_digest=pdf_digest,
+                        filename=uploaded_file.name,
+                        catalog=None if SERVICE_URL else get_course_catalog(),
+                        service_url=SERVICE_URL or None,
+                        label=uploaded_file.name
                     )
-                    
-                    # Display token usage details in an expander
-                    with st.expander("API Token Usage Details"):
-                        st.markdown(token_usage)
-                    
-                    # Display the transcript data in tables
-                    display_transcript_data(json_data)
-                    # Show raw JSON in an expander
-                    with st.expander("View Raw JSON Data"):
-                        st.json(json_data)
-                    
-                    # Set the state to show that a PDF has been processed
-                    st.session_state["pdf_processed"] = True
-                    st.session_state["feedback_submitted"] = False
-                    # Show feedback dialog after displaying results
-                    st.markdown("---")
-                    show_feedback_dialog()
-                else:
-                    st.error("Failed to extract data from the transcript.")
-                    st.write("Raw response from Claude:")
-                    st.text(claude_response)
+                    st.session_state["job_pdf_digest"] = pdf_digest
+                    st.session_state["job_file_name"] = uploaded_file.name
+                except JobLimitError as e:
+                    st.warning(str(e))
+
+        job_id = st.session_state.get("active_job_id")
+        if job_id:
+            job = get_job_manager().get(job_id)
+            if job is None:
+                st.error("The processing job is no longer available. Please process the transcript again.")
+                del st.session_state["active_job_id"]
+            elif not job.finished:
+                show_job_progress(job_id)
+            else:
+                del st.session_state["active_job_id"]
+                show_job_result(job.snapshot())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
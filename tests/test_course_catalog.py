@@ -0,0 +1,77 @@
+import pytest
+
+from course_catalog import CourseCatalog, catalog_hint, institution_for
+
+LONG = "Introduction to Computational Thinking and Programming"
+OTHER = "Introduction to Data Structures and Algorithm Analysis"
+
+
+def transcript(*courses):
+    return [{"term": "Fall", "year": "2023", "courses": [
+        {"course_code": code, "title": title, "short_title": short, "credits": 3, "grade": "A"}
+        for code, title, short in courses
+    ]}]
+
+
+def layout_line(code, title):
+    return f"{code:<10}{title:<60}3.00   A    12.00"
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = CourseCatalog(str(tmp_path / "catalog.sqlite3"))
+    yield catalog
+    catalog.close()
+
+
+def test_apply_fills_short_titles_of_learned_courses(catalog):
+    catalog.learn(transcript(("CS 101", LONG, "Intro to Comp Thinking")), "state university")
+    data = transcript(("CS-101", LONG.upper(), ""), ("CS 102", OTHER, ""))
+    assert catalog.apply(data, "state university") == 1
+    assert data[0]["courses"][0]["short_title"] == "Intro to Comp Thinking"
+    assert data[0]["courses"][0]["division"] == "UNDG"
+    assert data[0]["courses"][1]["short_title"] == ""
+    assert catalog.apply(transcript(("CS 101", LONG, "")), "other college") == 0
+    assert catalog.stats()["hits"] == 1 and catalog.stats()["misses"] == 2
+
+
+def test_first_short_title_is_kept(catalog):
+    catalog.learn(transcript(("CS 101", LONG, "Intro to Comp Thinking")))
+    catalog.learn(transcript(("CS 101", LONG, "Computational Thinking")))
+    data = transcript(("CS 101", LONG, ""))
+    catalog.apply(data)
+    assert data[0]["courses"][0]["short_title"] == "Intro to Comp Thinking"
+
+
+def test_override_beats_learn(catalog):
+    catalog.learn(transcript(("CS 101", LONG, "Intro to Comp Thinking")))
+    catalog.override("", "CS 101", LONG, "Comp Thinking & Programming")
+    catalog.learn(transcript(("CS 101", LONG, "Something Else")))
+    data = transcript(("CS 101", LONG, ""))
+    catalog.apply(data)
+    assert data[0]["courses"][0]["short_title"] == "Comp Thinking & Programming"
+
+
+def test_known_codes_needs_the_catalogued_title_in_the_text(catalog):
+    catalog.learn(transcript(("CS 101", LONG, "Intro to Comp Thinking"), ("CS 102", "Data Structures", "")))
+    text = "\n".join([layout_line("CS 101", LONG), layout_line("CS 102", "Data Structures")])
+    assert catalog.known_codes("", text) == ["CS 101"]
+    # A wrapped title leaves only its first part next to the code
+    assert catalog.known_codes("", layout_line("CS 101", "Introduction to Computational")) == ["CS 101"]
+    assert catalog.known_codes("", layout_line("CS 101", OTHER)) == []
+    assert catalog.known_codes("", "CS 101 " + LONG + " 3.00 A 12.00") == []
+    assert catalog.known_codes("", "") == []
+
+
+def test_known_codes_skips_codes_with_several_titles(catalog):
+    # A code reused for two courses: hinting it would leave the wrong one's short title empty
+    catalog.learn(transcript(("HIST 300", "Topics: Medieval Europe and the Mediterranean World", "Topics: Medieval Europe")))
+    catalog.learn(transcript(("HIST 300", "Topics: Modern Latin American Revolutions and Reform", "Topics: Modern Latin Am")))
+    text = layout_line("HIST 300", "Topics: Medieval Europe and the Mediterranean World")
+    assert catalog.known_codes("", text) == []
+
+
+def test_catalog_hint_and_institution():
+    assert catalog_hint([]) == ""
+    assert "CS 101, CS 102." in catalog_hint(["CS 101", "CS 102"])
+    assert institution_for("OFFICIAL TRANSCRIPT\nState University of Example    Page 1\n") == "state university of example"
@@ -0,0 +1,56 @@
+import copy
+import json
+
+import gpa
+from gpa import fill_credits, flatten_courses, load_scales, scale_for, score_courses, summarize_many
+
+TRANSCRIPT = [
+    {"term": "Fall", "year": "2023", "courses": [
+        {"course_code": "CS 101", "grade": "A", "credits": "", "points": "12.0"},
+        {"course_code": "CS 102", "grade": "B+R", "credits": None, "points": "9.9"},
+        {"course_code": "CS 103", "grade": "F", "credits": "", "points": "0"},
+        {"course_code": "CS 104", "grade": "B", "credits": 0, "points": 9},
+        {"course_code": "CS 105", "grade": "P", "credits": "", "points": "3"},
+        {"course_code": "CS 106", "grade": "a-", "credits": 3, "points": "11.1"},
+        {"course_code": "CS 107", "grade": "C", "credits": "", "points": ""},
+    ]},
+]
+
+
+def test_fill_credits_back_fills_only_missing_credits():
+    filled = fill_credits(copy.deepcopy(TRANSCRIPT))
+    # B+R counts as B; F, Pass and a missing points value cannot be divided
+    assert [course["credits"] for course in filled[0]["courses"]] == [3.0, 3.3, "", 3.0, "", 3, ""]
+    assert fill_credits(copy.deepcopy(filled)) == filled
+
+
+def test_gpa_credits_agree_with_fill_credits():
+    filled = fill_credits(copy.deepcopy(TRANSCRIPT))
+    scored = score_courses(flatten_courses(TRANSCRIPT))
+    expected = [_number_or_none(course["credits"]) for course in filled[0]["courses"]]
+    assert [None if credits != credits else credits for credits in scored["credits_num"]] == expected
+
+
+def _number_or_none(value):
+    return float(value) if value != "" else None
+
+
+def test_scales_are_picked_by_institution(tmp_path, monkeypatch):
+    monkeypatch.setattr(gpa, "GRADE_SCALES", dict(gpa.GRADE_SCALES))
+    monkeypatch.setattr(gpa, "INSTITUTION_SCALES", {})
+    path = tmp_path / "scales.json"
+    path.write_text(json.dumps({"five_point": {
+        "points": {"A": 5.0, "B": 4.0, "C": 3.0, "F": 0.0},
+        "institutions": ["State University - Main Campus"],
+    }}))
+    load_scales(str(path))
+    assert scale_for("state university main campus") == "five_point"
+    assert scale_for("other college") == "default"
+
+    transcript = [{"term": "Fall", "year": "2023", "courses": [
+        {"course_code": "CS 101", "grade": "A", "credits": "", "points": "15"},
+    ]}]
+    assert fill_credits(copy.deepcopy(transcript), "five_point")[0]["courses"][0]["credits"] == 3.0
+
+    summary = summarize_many({"a": transcript, "b": transcript}, scales={"a": "five_point"})
+    assert summary.set_index("transcript_id")["term_gpa"].to_dict() == {"a": 5.0, "b": 4.0}
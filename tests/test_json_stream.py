@@ -0,0 +1,77 @@
+import json
+
+from json_stream import TermStreamParser, repair_object, term_label
+
+FALL = {"t": "Fall", "y": "2023", "c": [["CS101", "Intro", "", 3, "A", "12.0"]]}
+SPRING = {"t": "Spring", "y": "2024", "c": [["CS102", "Data {Structures}", "", 3, "B", "9.0"]]}
+
+
+def feed_in_pieces(parser, text, size=7):
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return completed
+
+
+def test_terms_are_returned_as_their_objects_close():
+    parser = TermStreamParser()
+    assert parser.feed('Here you go:\n```json\n[\n  {"t": "Fall", "y": "2023", "c": [') == []
+    assert parser.found and parser.pending is not None
+    assert parser.feed('["CS101", "Intro", "", 3, "A", "12.0"]]},\n') == [FALL]
+    assert parser.feed(json.dumps(SPRING) + "\n]\n```") == [SPRING]
+    assert parser.complete and parser.pending is None
+    assert parser.terms == [FALL, SPRING]
+
+
+def test_piecewise_feed_matches_whole_feed():
+    text = "```json\n" + json.dumps([FALL, SPRING], indent=2) + "\n```"
+    parser = TermStreamParser()
+    assert feed_in_pieces(parser, text) == [FALL, SPRING]
+    assert parser.complete
+
+
+def test_no_array_is_not_found():
+    parser = TermStreamParser()
+    assert parser.feed("I could not read this transcript.") == []
+    assert not parser.found
+
+
+def test_trailing_commas_are_repaired():
+    parser = TermStreamParser()
+    text = '[{"t": "Fall", "y": "2023", "c": [["CS101", "Intro", "", 3, "A", "12.0"],],}, ' + json.dumps(SPRING) + "]"
+    assert feed_in_pieces(parser, text, size=5) == [FALL, SPRING]
+    assert parser.rejected == []
+
+
+def test_values_ending_in_a_colon_are_left_alone():
+    topics = {"t": "Fall", "y": "2023", "c": [["HIST300", "Topics:", "", 3, "A", "12.0"],
+                                              ["HIST301", "Seminar:", "Seminar:", 3, "B", "9.0"]]}
+    parser = TermStreamParser()
+    assert feed_in_pieces(parser, "```json\n" + json.dumps([topics, SPRING]) + "\n```", size=3) == [topics, SPRING]
+    assert parser.complete and parser.rejected == []
+
+
+def test_missing_key_quote_is_repaired_in_a_broken_object():
+    assert repair_object('{"t: "Spring", "y": "2024", "c": [],}') == {"t": "Spring", "y": "2024", "c": []}
+
+
+def test_unparseable_objects_are_rejected_with_their_position():
+    parser = TermStreamParser()
+    parser.feed("[" + json.dumps(FALL) + ', {"t": "Summer", "y": "2023", "c": [[oops]]}, ' + json.dumps(SPRING) + "]")
+    assert parser.terms == [FALL, SPRING]
+    assert parser.rejected_at == [1]
+    assert term_label(parser.rejected[0]) == ("Summer", "2023")
+
+
+def test_truncated_object_is_pending():
+    parser = TermStreamParser()
+    parser.feed("[" + json.dumps(FALL) + ', {"t": "Spring", "y": "2024", "c": [["CS1')
+    assert parser.terms == [FALL]
+    assert not parser.complete
+    assert term_label(parser.pending) == ("Spring", "2024")
+
+
+def test_repair_object_gives_up_on_garbage():
+    assert repair_object('{"t": "Fall", "y": 2023,}') == {"t": "Fall", "y": 2023}
+    assert repair_object('{"t": "Fall" "y"}') is None
+    assert term_label("no label here") is None
@@ -0,0 +1,25 @@
+from pdf_triage import merge_terms, section_context
+
+
+def course(code, grade="A"):
+    return {"course_code": code, "title": "Independent Study", "grade": grade, "credits": 1}
+
+
+def test_terms_split_across_chunks_keep_every_course_in_page_order():
+    first = [{"term": "Fall", "year": "2023", "courses": [course("CS 101"), course("CS 499")]}]
+    second = [
+        {"term": "Fall", "year": "2023", "courses": [course("CS 499"), course("CS 201")]},
+        {"term": "Spring", "year": "2024", "courses": [course("CS 301")]},
+    ]
+    merged = merge_terms([first, second])
+    assert [(term["term"], [c["course_code"] for c in term["courses"]]) for term in merged] == [
+        ("Fall", ["CS 101", "CS 499", "CS 499", "CS 201"]),
+        ("Spring", ["CS 301"]),
+    ]
+
+
+def test_section_context_ignores_term_headings_inside_transfer_sections():
+    pages = ["STATE UNIVERSITY\nFall 2022\nCS 101", "TRANSFER CREDIT ACCEPTED\nFall 2019\nENG 101"]
+    assert section_context(pages[:1]) == {"term": "Fall 2022", "transfer": False}
+    assert section_context(pages) == {"term": None, "transfer": True}
+    assert section_context([*pages, "INSTITUTION CREDIT\nSpring 2023"]) == {"term": "Spring 2023", "transfer": False}
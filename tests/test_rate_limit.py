@@ -0,0 +1,32 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limit import RateLimiter, RetryPolicy, call_with_retries
+
+
+def test_max_in_flight_bounds_concurrent_calls():
+    limiter = RateLimiter(max_in_flight=2)
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def call(model):
+        with lock:
+            active.append(model)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.remove(model)
+        return "ok", 0
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: call_with_retries(call, "m", 0, limiter, RetryPolicy()), range(8)))
+    assert results == [("ok", "m")] * 8
+    assert max(peak) == 2
+
+
+def test_no_in_flight_bound_by_default():
+    limiter = RateLimiter()
+    with limiter.slot(), limiter.slot():
+        pass
@@ -0,0 +1,32 @@
+import pytest
+
+from results_store import COURSE_EXPORT_QUERY, ResultsStore
+
+
+def transcript(*terms):
+    return [{"term": term, "year": year, "courses": [{"course_code": "MATH 101", "grade": "A", "credits": 3}]}
+            for term, year in terms]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.sqlite3"))
+    store.record("a", transcript(("Spring", "2023"), ("Fall", "2023")), "a.pdf")
+    store.record("b", transcript(("Fall", "2022"), ("Summer", "2023"), ("Winter", "2023")), "b.pdf")
+    yield store
+    store.close()
+
+
+def test_transcripts_with_course_are_in_calendar_order(store):
+    rows = store.transcripts_with_course("math-101")
+    assert list(zip(rows["filename"], rows["term"], rows["year"])) == [
+        ("b.pdf", "Fall", "2022"), ("b.pdf", "Winter", "2023"), ("a.pdf", "Spring", "2023"),
+        ("b.pdf", "Summer", "2023"), ("a.pdf", "Fall", "2023"),
+    ]
+
+
+def test_term_filter_ignores_case_and_uses_the_index(store):
+    assert list(store.courses(term="FALL", year=2023)["filename"]) == ["a.pdf"]
+    plan = store.query(f"EXPLAIN QUERY PLAN {COURSE_EXPORT_QUERY} WHERE tm.year = ? AND tm.term = ? COLLATE NOCASE",
+                       ["2023", "fall"])
+    assert plan["detail"].str.contains("idx_terms_year_term_nocase").any()
@@ -0,0 +1,74 @@
+import pytest
+
+from fakes import FakeWorksheet
+from outbox import FAILED, QUEUED, PersistenceOutbox
+from sheets_sink import SheetsWriteBehind
+
+
+class RejectingWorksheet(FakeWorksheet):
+    """Rejects any batch containing a row whose comment is "bad"."""
+
+    def append_rows(self, rows, **kwargs):
+        if any(row[2] == "bad" for row in rows):
+            raise ValueError("Your input contains more than the maximum of 50000 characters in a single cell.")
+        return super().append_rows(rows, **kwargs)
+
+
+@pytest.fixture
+def sink(tmp_path):
+    worksheet = RejectingWorksheet()
+    sink = SheetsWriteBehind(lambda: worksheet, str(tmp_path / "journal.sqlite3"), flush_interval=3600, max_attempts=3)
+    sink.worksheet = worksheet
+    yield sink
+    sink.close(flush=False)
+
+
+def flush_until_idle(sink, rounds=10):
+    for _ in range(rounds):
+        try:
+            if not sink.flush():
+                return
+        except ValueError:
+            pass
+
+
+def test_rejected_row_is_dead_lettered_and_later_rows_are_written(sink):
+    good_before = sink.enqueue(["url", "{}", "ok"])
+    bad = sink.enqueue(["url", "{}", "bad"])
+    good_after = sink.enqueue(["url", "{}", "ok"])
+    flush_until_idle(sink)
+    assert sink.written(good_before) and sink.written(good_after)
+    assert not sink.written(bad)
+    assert "maximum of 50000 characters" in sink.failed(bad)
+    assert sink.failed(good_after) is None
+    assert sink.pending_count() == 0
+    assert len(sink.worksheet.rows) == 2
+
+
+def test_enqueueing_a_dead_letter_again_requeues_it(sink):
+    bad = sink.enqueue(["url", "{}", "bad"], dedupe_key="k")
+    flush_until_idle(sink)
+    assert sink.failed(bad)
+    assert sink.enqueue(["url", "{}", "bad"], dedupe_key="k") == bad
+    assert sink.failed(bad) is None and sink.pending_count() == 1
+
+
+def test_outbox_fails_intents_whose_row_was_dead_lettered(sink, tmp_path):
+    outbox = PersistenceOutbox(
+        str(tmp_path / "outbox.sqlite3"), lambda filename, pdf_bytes: "https://drive.example/1",
+        lambda key, url, json_data, comment: sink.enqueue(["url", "{}", comment], dedupe_key=key),
+        poll_interval=3600, sheet_written=sink.written, sheet_failed=sink.failed,
+    )
+    try:
+        outbox.record("k", "t.pdf", b"%PDF", [], "bad")
+        outbox.deliver_due()
+        assert outbox.status("k")["status"] == QUEUED
+        flush_until_idle(sink)
+        outbox.deliver_due()
+        status = outbox.status("k")
+        assert status["status"] == FAILED and "Google Sheets rejected the row" in status["last_error"]
+        outbox.retry("k")
+        outbox.deliver_due()
+        assert outbox.status("k")["status"] == QUEUED and sink.pending_count() == 1
+    finally:
+        outbox.close()
@@ -0,0 +1,115 @@
+from text_layer import COLUMNAR_LAYOUT, parse_known_layout, parse_with_layout
+
+HEADER = f"{'COURSE':<10}  {'COURSE TITLE':<40}  {'CRED':>5}  GRADE  POINTS"
+
+
+def course_line(code, title, credits, grade, points=""):
+    return f"{code:<10}  {title:<40}  {credits:>5.2f}  {grade:<5}  {points}".rstrip()
+
+
+def transcript(*lines):
+    return "\n".join(["STATE UNIVERSITY - OFFICIAL ACADEMIC TRANSCRIPT", HEADER, *lines])
+
+
+def test_parses_terms_and_courses():
+    text = transcript(
+        "Fall 2023",
+        course_line("CS 101", "Intro to Programming", 3, "A", "12.0"),
+        course_line("MATH 202", "Calculus II", 4, "B+", "13.2"),
+        "Spring 2024",
+        course_line("MATH 5001", "Advanced Calculus", 4, "A-"),
+    )
+    assert parse_known_layout(text) == ("columnar", [
+        {"term": "Fall", "year": "2023", "courses": [
+            {"course_code": "CS 101", "division": "UNDG", "title": "Intro to Programming",
+             "short_title": "Intro to Programming", "credits": 3, "grade": "A", "points": "12.0"},
+            {"course_code": "MATH 202", "division": "UNDG", "title": "Calculus II",
+             "short_title": "Calculus II", "credits": 4, "grade": "B+", "points": "13.2"},
+        ]},
+        {"term": "Spring", "year": "2024", "courses": [
+            {"course_code": "MATH 5001", "division": "GRAD", "title": "Advanced Calculus",
+             "short_title": "Advanced Calculus", "credits": 4, "grade": "A-", "points": ""},
+        ]},
+    ])
+
+
+def test_transfer_section_spans_its_own_term_headers():
+    terms = parse_with_layout(transcript(
+        "TRANSFER CREDIT ACCEPTED BY THE INSTITUTION",
+        "Fall 2019",
+        course_line("ENG 101", "Composition I", 3, "A"),
+        "Spring 2020",
+        course_line("ENG 102", "Composition II", 3, "B"),
+        "INSTITUTION CREDIT",
+        "Fall 2020",
+        course_line("CS 101", "Intro to Programming", 3, "A"),
+    ), COLUMNAR_LAYOUT)
+    assert [(term["term"], term["year"]) for term in terms] == [("Fall", "2020")]
+    assert [course["course_code"] for course in terms[0]["courses"]] == ["CS 101"]
+
+
+def test_transfer_section_without_end_marker_drops_everything_after_it():
+    assert parse_with_layout(transcript(
+        "Fall 2020",
+        course_line("CS 101", "Intro to Programming", 3, "A"),
+        "Transfer Coursework",
+        "Spring 2021",
+        course_line("ENG 101", "Composition I", 3, "A"),
+    ), COLUMNAR_LAYOUT) == [{"term": "Fall", "year": "2020", "courses": [
+        {"course_code": "CS 101", "division": "UNDG", "title": "Intro to Programming",
+         "short_title": "Intro to Programming", "credits": 3, "grade": "A", "points": ""},
+    ]}]
+
+
+def test_wrapped_title_is_joined_to_its_course():
+    terms = parse_with_layout(transcript(
+        "Fall 2023",
+        course_line("CS 499", "Real-Time Text and voice output enabled", 3, "A"),
+        f"{'':<10}  traffic sign detection using deep learning",
+        course_line("MATH 202", "Calculus II", 4, "B"),
+    ), COLUMNAR_LAYOUT)
+    first, second = terms[0]["courses"]
+    assert first["title"] == (
+        "Real-Time Text and voice output enabled traffic sign detection using deep learning"
+    )
+    assert len(first["short_title"]) <= 40
+    assert second["title"] == "Calculus II"
+
+
+def test_unreadable_continuation_falls_back_to_claude():
+    assert parse_with_layout(transcript(
+        "Fall 2023",
+        course_line("CS 499", "Independent Study", 3, "A"),
+        f"{'':<10}  Repeated: original grade replaced                         3.00",
+    ), COLUMNAR_LAYOUT) is None
+
+
+def test_lines_outside_the_title_column_are_ignored():
+    terms = parse_with_layout(transcript(
+        "Fall 2023",
+        course_line("CS 101", "Intro to Programming", 3, "A"),
+        "Term GPA 4.00",
+    ), COLUMNAR_LAYOUT)
+    assert terms[0]["courses"][0]["title"] == "Intro to Programming"
+
+
+def test_unknown_layout_is_not_parsed():
+    assert parse_known_layout("CS 101 / Intro to Programming / grade A / 3 credit hours") is None
+
+
+def test_autumn_terms_are_read():
+    terms = parse_with_layout(transcript(
+        "Autumn Quarter 2023",
+        course_line("CS 101", "Intro to Programming", 3, "A"),
+    ), COLUMNAR_LAYOUT)
+    assert [(term["term"], term["year"]) for term in terms] == [("Autumn", "2023")]
+
+
+def test_unreadable_term_heading_falls_back_to_claude():
+    # Parsing on would file CS 102 under Fall 2023
+    assert parse_with_layout(transcript(
+        "Fall 2023",
+        course_line("CS 101", "Intro to Programming", 3, "A"),
+        "Spring 2024 Semester",
+        course_line("CS 102", "Data Structures", 3, "B"),
+    ), COLUMNAR_LAYOUT) is None
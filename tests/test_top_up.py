@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+import pipeline
+from fakes import FakeAnthropic
+from pipeline import ExtractionError, TopUp, complete_extraction, recover_response
+from rate_limit import RateLimiter
+
+
+def term(season, year, code="CS101"):
+    return {"t": season, "y": year, "c": [[code, "Intro", "", 3, "A", "12.0"]]}
+
+
+def response(*objects, close=True):
+    body = ",\n".join(obj if isinstance(obj, str) else json.dumps(obj) for obj in objects)
+    return "```json\n[\n" + body + ("\n]\n```" if close else "")
+
+
+def labels(terms):
+    return [(t["term"], t["year"]) for t in terms]
+
+
+def test_recover_response_keeps_valid_terms_and_labels_the_rest():
+    recovered = recover_response(response(
+        term("Fall", "2022"),
+        {"t": "Spring", "y": "20x3", "c": []},
+        '{"t": "Summer", "y": "2023", "c": [[oops]]}',
+        term("Fall", "2023"),
+        '{"t": "Spring", "y": "2024", "c": [["CS1',
+        close=False,
+    ))
+    assert labels(recovered["terms"]) == [("Fall", "2022"), ("Fall", "2023")]
+    assert recovered["redo"] == [("Spring", "20x3"), ("Summer", "2023"), ("Spring", "2024")]
+    assert recovered["truncated"]
+    assert recovered["order"] == [("fall", "2022"), ("spring", "20x3"), ("summer", "2023"), ("fall", "2023"),
+                                  ("spring", "2024")]
+
+
+def test_redone_terms_return_to_their_original_position():
+    top_up = TopUp(response(
+        term("Fall Semester", "2023"),
+        '{"t": "Spring Semester", "y": "2024", "c": [[oops]]}',
+        term("Autumn Quarter", "2024"),
+    ), {}, "Extract.")
+    assert top_up.needed and top_up.redo == [("Spring Semester", "2024")]
+    instruction = top_up.next_instruction()
+    assert "Spring Semester 2024" in instruction and "Fall Semester 2023, Autumn Quarter 2024" in instruction
+
+    top_up.add(response(term("Spring Semester", "2024")), {})
+    assert labels(top_up.terms) == [("Fall Semester", "2023"), ("Spring Semester", "2024"),
+                                    ("Autumn Quarter", "2024")]
+    assert not top_up.needed
+
+
+def test_terms_after_a_truncation_are_appended_in_arrival_order():
+    top_up = TopUp(response(term("Fall", "2023"), '{"t": "Spring", "y": "2024", "c": [["CS1', close=False),
+                   {}, "Extract.")
+    assert top_up.truncated and top_up.redo == [("Spring", "2024")]
+    top_up.next_instruction()
+    top_up.add(response(term("Spring", "2024"), term("Summer", "2024"), term("Fall", "2024"),
+                        term("Fall", "2023")), {})
+    assert labels(top_up.terms) == [("Fall", "2023"), ("Spring", "2024"), ("Summer", "2024"), ("Fall", "2024")]
+    assert not top_up.truncated and not top_up.redo
+
+
+def test_a_follow_up_that_adds_nothing_stops_the_loop():
+    top_up = TopUp(response(term("Fall", "2023"), '{"t": "Spring", "y": "2024", "c": [[oops]]}'), {}, "Extract.")
+    top_up.next_instruction()
+    top_up.add(response(term("Fall", "2023")), {})
+    assert top_up.stalled and not top_up.needed
+    _, _, terms, missing = top_up.result()
+    assert labels(terms) == [("Fall", "2023")]
+    assert missing == ["Spring 2024"]
+
+
+def test_complete_extraction_requests_only_missing_terms(monkeypatch):
+    monkeypatch.setattr(pipeline, "TOP_UP_ROUNDS", 2)
+    requests = []
+
+    def respond(kwargs):
+        requests.append(kwargs["messages"][0]["content"][-1]["text"])
+        return response(term("Spring", "2024"))
+
+    client = FakeAnthropic(respond, base_latency=0)
+    first = response(term("Fall", "2023"), '{"t": "Spring", "y": "2024", "c": [["CS1', close=False)
+    _, _, terms, missing = complete_extraction(client, first, {}, b"%PDF-", "prompt", limiter=RateLimiter(0, 0))
+    assert labels(terms) == [("Fall", "2023"), ("Spring", "2024")]
+    assert missing == []
+    assert len(requests) == 1 and "Spring 2024" in requests[0]
+
+
+def test_no_json_at_all_is_an_extraction_error():
+    with pytest.raises(ExtractionError):
+        TopUp("Sorry, I cannot read this.", {}, "Extract.").result()
+
+
+def test_titles_ending_in_a_colon_need_no_top_up():
+    recovered = recover_response(response({"t": "Fall", "y": "2023", "c": [["HIST300", "Topics:", "", 3, "A", "12.0"]]}))
+    assert labels(recovered["terms"]) == [("Fall", "2023")]
+    assert recovered["terms"][0]["courses"][0]["title"] == "Topics:"
+    assert recovered["redo"] == [] and not recovered["truncated"]
@@ -0,0 +1,169 @@
+import re
+from dataclasses import dataclass
+
+# A page needs at least this much text, mostly letters/digits, to count as born-digital
+MIN_PAGE_CHARS = 80
+MIN_ALNUM_RATIO = 0.4
+TRANSFER_MARKERS = ("transfer credit", "transfer coursework", "transferred courses")
+# A term heading anywhere in a line ("Fall 2023", "Spring Semester 2024")
+TERM_HEADING = re.compile(r"\b(Fall|Spring|Summer|Winter|Autumn)\s+(?:(?:Term|Semester|Quarter)\s+)?(\d{4})\b", re.I)
+# Headings that close a transfer section (checked before TRANSFER_MARKERS: "Total Transfer Credits")
+TRANSFER_END_MARKERS = (
+    "institution credit",
+    "institutional credit",
+    "end of transfer",
+    "total transfer",
+    "beginning of undergraduate record",
+    "beginning of graduate record",
+)
+# Words a shortened title should not end on
+TRAILING_STOPWORDS = {"a", "an", "and", "for", "in", "of", "on", "or", "the", "to", "with", "&"}
+
+
+def page_layout_text(page) -> str:
+    """Extract a page's text preserving column layout where pypdf supports it."""
+    try:
+        return page.extract_text(extraction_mode="layout") or ""
+    except TypeError:
+        # Older pypdf without layout mode
+        return page.extract_text() or ""
+    except Exception:
+        return ""
+
+
+def is_usable_text(text: str) -> bool:
+    """True if a page's text layer looks complete enough to send instead of the PDF."""
+    stripped = "".join(text.split())
+    if len(stripped) < MIN_PAGE_CHARS or "(cid:" in text:
+        return False
+    alnum = sum(1 for char in stripped if char.isalnum())
+    return alnum / len(stripped) >= MIN_ALNUM_RATIO
+
+
+def division_for(course_code: str) -> str:
+    """Derive UNDG/GRAD from the first digit of the course number."""
+    match = re.search(r"\d", course_code or "")
+    if not match:
+        return ""
+    return "GRAD" if match.group(0) in "56" else "UNDG" if match.group(0) in "01234" else ""
+
+
+def short_title_for(title: str, limit: int = 40) -> str:
+    """Use the title as-is under ``limit`` characters, else cut it at a word boundary."""
+    title = (title or "").strip()
+    if len(title) < limit:
+        return title
+    words = title[:limit + 1].split()[:-1]
+    while words and words[-1].lower().strip(",-:;") in TRAILING_STOPWORDS:
+        words.pop()
+    return " ".join(words).rstrip(",-:;") or title[:limit]
+
+
+def _number(value: str):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+@dataclass
+class TranscriptLayout:
+    """Regexes describing one text-layer transcript layout (a column format, not a particular institution)."""
+
+    name: str
+    signature: re.Pattern
+    term_header: re.Pattern
+    course_line: re.Pattern
+    course_start: re.Pattern
+
+
+# Column layout the extraction prompt is written for:
+# COURSE  COURSE TITLE  CRED  GRADE  POINTS, grouped under "Fall 2023"-style headers
+COLUMNAR_LAYOUT = TranscriptLayout(
+    name="columnar",
+    signature=re.compile(r"^\s*COURSE\s+(?:COURSE\s+)?TITLE\s+CRED(?:IT)?S?\s+GRADE\s+(?:GRADE\s+)?POINTS\b", re.M | re.I),
+    term_header=re.compile(r"^\s*(Fall|Spring|Summer|Winter|Autumn)\s+(?:(?:Term|Semester|Quarter)\s+)?(\d{4})\s*$", re.I),
+    course_line=re.compile(
+        r"^\s*(?P<code>[A-Z]{2,5}\s?-?\d{3,4}[A-Z]?)\s+(?P<title>\S.*?)\s{2,}(?P<credits>\d+(?:\.\d+)?)"
+        r"\s+(?P<grade>[A-F][+-]?|P|NP|S|U|W|I|IP)(?:\s+(?P<points>\d+(?:\.\d+)?))?\s*$"
+    ),
+    course_start=re.compile(r"^\s*[A-Z]{2,5}\s?-?\d{3,4}[A-Z]?\s"),
+)
+
+LAYOUTS = [COLUMNAR_LAYOUT]
+
+
+def parse_with_layout(text: str, layout: TranscriptLayout):
+    """Parse transcript text with one layout; None unless every course line is understood.
+
+    A transfer section lasts until one of TRANSFER_END_MARKERS (term headings
+    inside it belong to the transferred courses). A line directly below a
+    course that sits within its title column continues that title. A line
+    naming a term in a form ``term_header`` does not read gives None, since
+    its courses would otherwise land in the previous term.
+    """
+    if not layout.signature.search(text):
+        return None
+    terms = []
+    current = None
+    in_transfer = False
+    # The course on the line just above, with the span of its title column
+    previous = None
+    for line in text.splitlines():
+        if not line.strip():
+            previous = None
+            continue
+        lowered = line.lower()
+        if in_transfer and any(marker in lowered for marker in TRANSFER_END_MARKERS):
+            in_transfer, current, previous = False, None, None
+            continue
+        if any(marker in lowered for marker in TRANSFER_MARKERS):
+            in_transfer, current, previous = True, None, None
+            continue
+        if in_transfer:
+            continue
+        header = layout.term_header.match(line)
+        if header:
+            current = {"term": header.group(1).title(), "year": header.group(2), "courses": []}
+            terms.append(current)
+            previous = None
+            continue
+        if not layout.course_start.match(line):
+            if TERM_HEADING.search(line):
+                return None
+            if previous is not None:
+                entry, title_start, title_end = previous
+                indent = len(line) - len(line.lstrip())
+                if indent >= title_start - 2:
+                    if len(line.rstrip()) > title_end:
+                        # Indented like a title but running into the credit columns
+                        return None
+                    entry["title"] = f"{entry['title']} {line.strip()}"
+                    entry["short_title"] = short_title_for(entry["title"])
+                    continue
+            previous = None
+            continue
+        course = layout.course_line.match(line)
+        if course is None or current is None:
+            # A course-looking line we cannot read: let the LLM handle this transcript
+            return None
+        title = course.group("title").strip()
+        current["courses"].append({
+            "course_code": course.group("code"),
+            "division": division_for(course.group("code")),
+            "title": title,
+            "short_title": short_title_for(title),
+            "credits": _number(course.group("credits")),
+            "grade": course.group("grade"),
+            "points": course.group("points") or "",
+        })
+        previous = (current["courses"][-1], course.start("title"), course.start("credits"))
+    terms = [term for term in terms if term["courses"]]
+    return terms or None
+
+
+def parse_known_layout(text: str):
+    """Return (layout name, terms) for the first layout that fully parses the text, else None."""
+    for layout in LAYOUTS:
+        terms = parse_with_layout(text, layout)
+        if terms:
+            return layout.name, terms
+    return None
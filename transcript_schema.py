@@ -0,0 +1,68 @@
+"""Validation of extracted transcript terms against the output schema in PROMPT."""
+COURSE_FIELDS = ("course_code", "division", "title", "short_title", "credits", "grade", "points")
+# Names the model sometimes uses instead of the schema's
+FIELD_ALIASES = {"credit_hours": "credits", "cred": "credits", "grade_points": "points", "code": "course_code"}
+
+
+def _is_number_like(value) -> bool:
+    if value is None or value == "":
+        return True
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    try:
+        float(str(value).strip())
+        return True
+    except ValueError:
+        return False
+
+
+def normalize_course(course):
+    """Return (course, problems) with aliases renamed and missing fields set to ""."""
+    if not isinstance(course, dict):
+        return None, ["course is not an object"]
+    course = dict(course)
+    for alias, field in FIELD_ALIASES.items():
+        if alias in course and field not in course:
+            course[field] = course.pop(alias)
+    for field in COURSE_FIELDS:
+        if course.get(field) is None:
+            course[field] = ""
+    problems = []
+    if not str(course["course_code"]).strip():
+        problems.append("course without a course_code")
+    if not isinstance(course["title"], str):
+        problems.append(f"{course['course_code']}: title is not a string")
+    if not isinstance(course["grade"], str):
+        course["grade"] = str(course["grade"])
+    for field in ("credits", "points"):
+        if not _is_number_like(course[field]):
+            problems.append(f"{course['course_code']}: {field} {course[field]!r} is not a number")
+    return course, problems
+
+
+def normalize_term(term):
+    """Return (term, problems); the term is usable only when problems is empty."""
+    if not isinstance(term, dict):
+        return None, ["term is not an object"]
+    term = dict(term)
+    problems = []
+    if not isinstance(term.get("term"), str) or not term["term"].strip():
+        problems.append("missing term name")
+    year = str(term.get("year", "")).strip()
+    if not (len(year) == 4 and year.isdigit()):
+        problems.append(f"invalid year {term.get('year')!r}")
+    term["year"] = year
+    courses = term.get("courses")
+    if not isinstance(courses, list):
+        problems.append("courses is not a list")
+        courses = []
+    normalized = []
+    for course in courses:
+        course, course_problems = normalize_course(course)
+        problems.extend(course_problems)
+        if course is not None:
+            normalized.append(course)
+    term["courses"] = normalized
+    return term, problems
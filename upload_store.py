@@ -0,0 +1,272 @@
+"""Shared, bounded store for uploaded PDF bytes.
+
+Sessions keep only the content hash of their upload. The bytes live here,
+once per distinct PDF. They stay in memory up to ``memory_budget`` bytes,
+and past that the least recently used blobs are written to disk and
+memory-mapped. ``view`` hands out zero-copy memoryviews that the encoding,
+PDF parsing and Drive upload stages read directly.
+"""
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from extraction_cache import sha256_hex
+
+
+class UploadQuotaError(Exception):
+    """Raised when an upload cannot fit in the store's quotas."""
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file over a bytes-like object, without copying it."""
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), len(self._view) - self._pos)
+        if count <= 0:
+            return 0
+        buffer[:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        try:
+            self._view.release()
+        except BufferError:
+            pass
+        super().close()
+
+
+def as_stream(data):
+    """Return a seekable binary stream over bytes, a memoryview or an mmap."""
+    if isinstance(data, bytes):
+        # BytesIO shares an immutable bytes buffer until it is written to
+        return io.BytesIO(data)
+    return BufferReader(data)
+
+
+class _Blob:
+    def __init__(self, digest: str, data: bytes):
+        self.digest = digest
+        self.size = len(data)
+        self.data = data
+        self.path = None
+        self.mapped = None
+        self.owners = set()
+        self.last_used = time.monotonic()
+
+    def view(self) -> memoryview:
+        return memoryview(self.data if self.mapped is None else self.mapped)
+
+
+class UploadStore:
+    """Content-addressed upload store with memory, per-session and total quotas.
+
+    ``put(owner, data)`` returns the content hash that identifies the upload.
+    A session over ``session_quota`` bytes gives up its least recently used
+    uploads first, and a single upload larger than the quota is refused. When
+    the store holds more than ``max_total_bytes`` across memory and disk, the
+    least recently used blobs are dropped. Sessions idle for longer than
+    ``idle_seconds`` are released by a background sweep. A blob with no
+    owners left is freed.
+    """
+
+    def __init__(self, spill_dir: str, memory_budget: int = 256 * 1024 * 1024,
+                 session_quota: int = 64 * 1024 * 1024, max_total_bytes: int = 4 * 1024 * 1024 * 1024,
+                 idle_seconds: float = 3600.0):
+        self.memory_budget = memory_budget
+        self.session_quota = session_quota
+        self.max_total_bytes = max_total_bytes
+        self.idle_seconds = idle_seconds
+        os.makedirs(spill_dir, exist_ok=True)
+        # One directory per process so several app processes can share spill_dir
+        self.spill_dir = tempfile.mkdtemp(prefix="uploads-", dir=spill_dir)
+        self._lock = threading.Lock()
+        self._blobs = {}
+        self._sessions = {}
+        self._closing = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="upload-store-sweeper", daemon=True)
+        self._thread.start()
+
+    def put(self, owner: str, data, digest: str = None) -> str:
+        """Store an upload for a session and return its content hash."""
+        size = len(data)
+        if size > self.session_quota:
+            raise UploadQuotaError(
+                f"This PDF is {size / 1e6:.1f} MB; uploads are limited to {self.session_quota / 1e6:.0f} MB."
+            )
+        digest = digest or sha256_hex(data)
+        with self._lock:
+            blob = self._blobs.get(digest)
+            if blob is None:
+                blob = self._blobs[digest] = _Blob(digest, bytes(data))
+            blob.owners.add(owner)
+            blob.last_used = time.monotonic()
+            self._sessions.setdefault(owner, {"digests": [], "last_seen": 0.0})
+            session = self._sessions[owner]
+            if digest in session["digests"]:
+                session["digests"].remove(digest)
+            session["digests"].append(digest)
+            session["last_seen"] = time.monotonic()
+            self._enforce_session_quota(owner)
+            self._enforce_total()
+            self._spill_over_budget()
+        return digest
+
+    def __contains__(self, digest) -> bool:
+        with self._lock:
+            return digest in self._blobs
+
+    def view(self, digest: str, owner: str = None) -> memoryview:
+        """Return a zero-copy view of an upload; KeyError if it was evicted."""
+        with self._lock:
+            blob = self._blobs[digest]
+            blob.last_used = time.monotonic()
+            if owner in self._sessions:
+                self._sessions[owner]["last_seen"] = blob.last_used
+            return blob.view()
+
+    def touch(self, owner: str):
+        """Mark a session as active so the idle sweep keeps its uploads."""
+        with self._lock:
+            if owner in self._sessions:
+                self._sessions[owner]["last_seen"] = time.monotonic()
+
+    def release(self, owner: str, digest: str):
+        with self._lock:
+            self._release(owner, digest)
+
+    def release_owner(self, owner: str):
+        """Drop every upload held by a session."""
+        with self._lock:
+            for digest in list(self._sessions.get(owner, {}).get("digests", [])):
+                self._release(owner, digest)
+            self._sessions.pop(owner, None)
+
+    def evict_idle(self) -> int:
+        """Release sessions idle for longer than ``idle_seconds``; return how many."""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [owner for owner, session in self._sessions.items() if session["last_seen"] < cutoff]
+        for owner in idle:
+            self.release_owner(owner)
+        with self._lock:
+            self._close_pending()
+        return len(idle)
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_memory = sum(blob.size for blob in self._blobs.values() if blob.mapped is None)
+            on_disk = sum(blob.size for blob in self._blobs.values() if blob.mapped is not None)
+            return {
+                "blobs": len(self._blobs),
+                "sessions": len(self._sessions),
+                "memory_bytes": in_memory,
+                "disk_bytes": on_disk,
+            }
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+        with self._lock:
+            for digest in list(self._blobs):
+                self._drop(digest)
+            self._close_pending()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def _release(self, owner: str, digest: str):
+        session = self._sessions.get(owner)
+        if session and digest in session["digests"]:
+            session["digests"].remove(digest)
+        blob = self._blobs.get(digest)
+        if blob is None:
+            return
+        blob.owners.discard(owner)
+        if not blob.owners:
+            self._drop(digest)
+
+    def _enforce_session_quota(self, owner: str):
+        digests = self._sessions[owner]["digests"]
+        while len(digests) > 1 and sum(self._blobs[d].size for d in digests) > self.session_quota:
+            self._release(owner, digests[0])
+
+    def _enforce_total(self):
+        total = sum(blob.size for blob in self._blobs.values())
+        for blob in sorted(self._blobs.values(), key=lambda blob: blob.last_used):
+            if total <= self.max_total_bytes:
+                break
+            total -= blob.size
+            for owner in list(blob.owners):
+                self._release(owner, blob.digest)
+
+    def _spill_over_budget(self):
+        resident = [blob for blob in self._blobs.values() if blob.mapped is None]
+        in_memory = sum(blob.size for blob in resident)
+        for blob in sorted(resident, key=lambda blob: blob.last_used):
+            if in_memory <= self.memory_budget:
+                break
+            self._spill(blob)
+            in_memory -= blob.size
+
+    def _spill(self, blob: _Blob):
+        blob.path = os.path.join(self.spill_dir, f"{blob.digest}.pdf")
+        with open(blob.path, "wb") as f:
+            f.write(blob.data)
+        if blob.size:
+            with open(blob.path, "rb") as f:
+                blob.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            blob.data = None
+
+    def _drop(self, digest: str):
+        blob = self._blobs.pop(digest)
+        for owner in blob.owners:
+            session = self._sessions.get(owner)
+            if session and digest in session["digests"]:
+                session["digests"].remove(digest)
+        if blob.mapped is not None:
+            self._closing.append(blob.mapped)
+        if blob.path:
+            # Open mappings keep the data readable after the file is unlinked
+            try:
+                os.remove(blob.path)
+            except OSError:
+                pass
+        blob.data = None
+        self._close_pending()
+
+    def _close_pending(self):
+        still_exported = []
+        for mapped in self._closing:
+            try:
+                mapped.close()
+            except BufferError:
+                # A running job still holds a view; try again on the next sweep
+                still_exported.append(mapped)
+        self._closing = still_exported
+
+    def _run(self):
+        interval = max(1.0, min(60.0, self.idle_seconds / 4))
+        while not self._stop.wait(interval):
+            self.evict_idle()
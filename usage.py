@@ -0,0 +1,125 @@
+import threading
+
+# Claude pricing in dollars per million tokens
+PRICE_INPUT = 3.00
+PRICE_CACHE_WRITE = 3.75
+PRICE_CACHE_READ = 0.30
+PRICE_OUTPUT = 15.00
+
+
+def usage_from_message(message) -> dict:
+    """Pull token counts out of an Anthropic message (missing counts become 0)."""
+    usage = message.usage
+    return {
+        "input_tokens": usage.input_tokens or 0,
+        "output_tokens": usage.output_tokens or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+    }
+
+
+def sum_usage(usages) -> dict:
+    """Add up several usage dicts (e.g. from parallel chunk requests)."""
+    total = {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+    }
+    for usage in usages:
+        for name in total:
+            total[name] += usage.get(name, 0)
+    return total
+
+
+def compute_cost(usage: dict) -> dict:
+    """Price a usage dict and work out what prompt caching saved."""
+    base_input_cost = usage["input_tokens"] * PRICE_INPUT / 1e6
+    cache_writes_cost = usage["cache_creation_input_tokens"] * PRICE_CACHE_WRITE / 1e6
+    cache_hits_cost = usage["cache_read_input_tokens"] * PRICE_CACHE_READ / 1e6
+    output_cost = usage["output_tokens"] * PRICE_OUTPUT / 1e6
+    # Savings versus sending every cached token as plain input
+    cache_savings = (
+        usage["cache_read_input_tokens"] * (PRICE_INPUT - PRICE_CACHE_READ)
+        - usage["cache_creation_input_tokens"] * (PRICE_CACHE_WRITE - PRICE_INPUT)
+    ) / 1e6
+    return {
+        "base_input_cost": base_input_cost,
+        "cache_writes_cost": cache_writes_cost,
+        "cache_hits_cost": cache_hits_cost,
+        "output_cost": output_cost,
+        "total_cost": base_input_cost + cache_writes_cost + cache_hits_cost + output_cost,
+        "cache_savings": cache_savings,
+    }
+
+
+def cache_hit_ratio(usage: dict) -> float:
+    """Share of prompt tokens that were read from the prompt cache."""
+    prompt_tokens = (
+        usage["input_tokens"] + usage["cache_creation_input_tokens"] + usage["cache_read_input_tokens"]
+    )
+    return usage["cache_read_input_tokens"] / prompt_tokens if prompt_tokens else 0.0
+
+
+class UsageTotals:
+    """Thread-safe running totals of token usage across API calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.cache_hit_calls = 0
+        self.usage = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
+
+    def add(self, usage: dict):
+        with self._lock:
+            self.calls += 1
+            if usage["cache_read_input_tokens"]:
+                self.cache_hit_calls += 1
+            for name in self.usage:
+                self.usage[name] += usage.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """Return totals, cost breakdown and cache-hit figures."""
+        with self._lock:
+            usage = dict(self.usage)
+            calls, cache_hit_calls = self.calls, self.cache_hit_calls
+        return {
+            "calls": calls,
+            "cache_hit_calls": cache_hit_calls,
+            **usage,
+            **compute_cost(usage),
+            "cache_hit_ratio": cache_hit_ratio(usage),
+        }
+
+
+def format_token_usage(usage: dict, session=None, cumulative=None) -> str:
+    """Render a usage dict (plus optional running totals) as markdown."""
+    cost = compute_cost(usage)
+    token_usage = f"""
+        **Tokens Used:** {usage['input_tokens'] + usage['output_tokens']}
+        (input {usage['input_tokens']}, output {usage['output_tokens']},
+        cache write {usage['cache_creation_input_tokens']}, cache read {usage['cache_read_input_tokens']})
+
+        **Pricing Breakdown:**
+        - Base Input Cost: ${cost['base_input_cost']:.6f}
+        - Cache Writes Cost: ${cost['cache_writes_cost']:.6f}
+        - Cache Hits Cost: ${cost['cache_hits_cost']:.6f}
+        - Output Cost: ${cost['output_cost']:.6f}
+        - **Total Cost:** ${cost['total_cost']:.6f}
+        - Prompt Cache Savings: ${cost['cache_savings']:.6f} ({cache_hit_ratio(usage):.0%} of prompt tokens cached)
+        """
+    for label, totals in (("This Session", session), ("All Sessions", cumulative)):
+        if totals is None:
+            continue
+        snap = totals.snapshot()
+        token_usage += f"""
+        **{label}:** {snap['calls']} calls, {snap['cache_hit_calls']} with prompt cache hits
+        - Cache Read Tokens: {snap['cache_read_input_tokens']} ({snap['cache_hit_ratio']:.0%} of prompt tokens)
+        - Total Cost: ${snap['total_cost']:.6f} (saved ${snap['cache_savings']:.6f} via prompt caching)
+        """
+    return token_usage